@@ -0,0 +1,426 @@
+"""ASGI entry point: the kiosk-facing /api routes served on an event loop.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Serves /api/login, /api/rides, /api/add_ride, /api/generate_plan and /api/health with the same park model,
+caches, validation and responses as tapp.py, whose Flask app (`python tapp.py`) stays the simple mode and keeps
+every other route. An idle or slow kiosk connection costs the loop a coroutine rather than a thread, so one
+process holds thousands of them.
+
+Nothing blocking runs on the loop. Database calls go through aiomysql when it is installed and DB_BACKEND is
+mysql; otherwise a stand-in runs tapp's pooled Database on a thread executor. Plans are CPU-bound and run on
+their own executor (ASGI_PLAN_WORKERS threads), with at most ASGI_MAX_PLANS_IN_FLIGHT admitted at once; cache
+hits are answered on the loop. Password checks keep going through tapp's bounded bcrypt pool."""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode
+
+import jwt
+import db
+import tapp
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+# ASGI Serving Configuration
+ASGI_PLAN_WORKERS = int(os.environ.get('ASGI_PLAN_WORKERS', os.cpu_count() or 1))  # threads computing plans
+ASGI_MAX_PLANS_IN_FLIGHT = int(os.environ.get('ASGI_MAX_PLANS_IN_FLIGHT', 64))  # plans admitted at once; the rest wait
+ASGI_BLOCKING_WORKERS = int(os.environ.get('ASGI_BLOCKING_WORKERS', 16))  # threads for the blocking database stand-in
+ASGI_MAX_BODY_BYTES = int(os.environ.get('ASGI_MAX_BODY_BYTES', 1024 * 1024))  # larger request bodies get a 413
+ASGI_DB_DRIVER = os.environ.get('ASGI_DB_DRIVER', 'auto').lower()  # 'auto', 'aiomysql' or 'threads'
+
+asgi_log = logging.getLogger('thrill_safari.asgi')
+
+# Database Access
+class AiomysqlDatabase:
+    # Non-blocking MySQL through an aiomysql pool; errors come back as mysql.connector errors
+    name = 'aiomysql'
+
+    def __init__(self):
+        self.pool = None
+
+    async def start(self):
+        self.pool = await aiomysql.create_pool(
+            host=db.DB_CONFIG['host'], port=int(db.DB_CONFIG['port']), user=db.DB_CONFIG['user'],
+            password=db.DB_CONFIG['password'], db=db.DB_CONFIG['database'],
+            minsize=1, maxsize=db.DB_POOL_SIZE, autocommit=True)
+
+    async def _run(self, query, params, fetch):
+        started = time.perf_counter()
+        try:
+            async with self.pool.acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(query, params)
+                    return await cursor.fetchone() if fetch else cursor.rowcount
+        except aiomysql.IntegrityError as e:
+            raise tapp.IntegrityError(msg=str(e)) from e
+        except aiomysql.Error as e:
+            raise tapp.Error(msg=str(e)) from e
+        finally:
+            db.db_query_seconds.observe(time.perf_counter() - started, (query.split(None, 1)[0].lower(),))
+
+    async def fetchone(self, query, params=()):
+        return await self._run(query, params, True)
+
+    async def execute(self, query, params=()):
+        return await self._run(query, params, False)
+
+    async def ping(self):
+        try:
+            await self.fetchone("SELECT 1")
+            return True
+        except tapp.Error:
+            return False
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+
+class ThreadedDatabase:
+    # Async stand-in without aiomysql: tapp's blocking Database, run on a thread executor
+    name = 'threads'
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    async def start(self):
+        pass
+
+    async def _call(self, method, *args):
+        if tapp.park_model.db is None:
+            raise tapp.Error(msg="Database connection not available.")
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, getattr(tapp.park_model.db, method), *args)
+
+    async def fetchone(self, query, params=()):
+        return await self._call('fetchone', query, params)
+
+    async def execute(self, query, params=()):
+        return await self._call('execute', query, params)
+
+    async def ping(self):
+        if tapp.park_model.db is None:
+            return False
+        return await asyncio.get_running_loop().run_in_executor(self.executor, tapp.park_model.db.ping)
+
+    async def close(self):
+        pass
+
+class Request:
+    # The parts of an ASGI HTTP request the routes read
+    __slots__ = ('method', 'path', 'base_url', 'query', 'headers', 'body')
+
+    def __init__(self, scope, body):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        self.body = body
+        host = self.headers.get('host') or '{}:{}'.format(*(scope.get('server') or ('localhost', 80)))
+        self.base_url = f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}{self.path}"
+
+    def json(self):
+        # Like Flask's get_json(): None for an empty or malformed body
+        try:
+            return json.loads(self.body) if self.body else None
+        except ValueError:
+            return None
+
+def json_response(data, status=200, headers=()):
+    # Serialized by the Flask app's JSON provider so both entry points send identical bodies
+    return status, [('content-type', 'application/json'), *headers], tapp.app.json.dumps(data).encode('utf-8')
+
+def body_response(body, status=200, headers=()):
+    # An already-serialized JSON body from one of the response caches
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    return status, [('content-type', 'application/json'), *headers], body
+
+class ThrillSafariASGI:
+    # Minimal ASGI application: lifespan startup/shutdown, exact-path routing, CORS, request metrics
+    def __init__(self):
+        self.routes = {
+            ('POST', '/api/login'): self.login,
+            ('GET', '/api/rides'): self.get_rides,
+            ('POST', '/api/add_ride'): self.add_ride,
+            ('POST', '/api/generate_plan'): self.generate_plan,
+            ('GET', '/api/health'): self.health_check,
+        }
+        self.database = None
+        self.blocking_executor = None
+        self.plan_executor = None
+        self.plan_slots = None
+        self.plans_in_flight = 0
+        self.ride_writes = None  # serializes add_ride's catalog check and insert on the aiomysql path
+        self._started = None
+
+    # Lifecycle
+    async def startup(self):
+        # Initializes the park model (connect, migrate, load) off the loop and opens the database driver
+        loop = asyncio.get_running_loop()
+        self.blocking_executor = ThreadPoolExecutor(max_workers=ASGI_BLOCKING_WORKERS, thread_name_prefix='asgi-blocking')
+        self.plan_executor = ThreadPoolExecutor(max_workers=ASGI_PLAN_WORKERS, thread_name_prefix='asgi-plan')
+        self.plan_slots = asyncio.Semaphore(ASGI_MAX_PLANS_IN_FLIGHT)
+        self.ride_writes = asyncio.Lock()
+        await loop.run_in_executor(self.blocking_executor, tapp.initialize_app)
+        use_aiomysql = ASGI_DB_DRIVER == 'aiomysql' or (ASGI_DB_DRIVER == 'auto' and db.DB_BACKEND == 'mysql')
+        if use_aiomysql and aiomysql is None:
+            asgi_log.warning("aiomysql is not installed; database calls run on the thread executor instead.")
+        database = AiomysqlDatabase() if use_aiomysql and aiomysql is not None else ThreadedDatabase(self.blocking_executor)
+        try:
+            await database.start()
+        except Exception as e:
+            asgi_log.error("Could not open the %s database driver (%s); using the thread executor.", database.name, e)
+            database = ThreadedDatabase(self.blocking_executor)
+        self.database = database
+        asgi_log.info("ASGI app ready: %d rides, database driver %s, %d plan workers.",
+                      tapp.park_model.ride_count, database.name, ASGI_PLAN_WORKERS)
+
+    async def shutdown(self):
+        if self.database is not None:
+            await self.database.close()
+        await self._run_blocking(tapp.queue_feed.flush)
+        for executor in (self.plan_executor, self.blocking_executor):
+            executor.shutdown(wait=False)
+        tapp.park_model.close_db_connection()
+
+    async def _ensure_started(self):
+        # Servers that skip the lifespan protocol get the same startup on their first request
+        if self._started is None:
+            self._started = asyncio.ensure_future(self.startup())
+        await asyncio.shield(self._started)
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.blocking_executor, func, *args)
+
+    # ASGI
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self._ensure_started()
+                except Exception as e:
+                    asgi_log.exception("ASGI startup failed: %s", e)
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        started = time.perf_counter()
+        method = scope['method']
+        handler = self.routes.get((method, scope['path']))
+        route = scope['path'] if handler is not None or method == 'OPTIONS' else 'unmatched'
+        if method == 'OPTIONS':
+            status, headers, body = 204, [('access-control-allow-methods', 'GET, POST, OPTIONS'),
+                                          ('access-control-allow-headers', 'Authorization, Content-Type'),
+                                          ('access-control-max-age', '600')], b''
+        elif handler is None:
+            status, headers, body = json_response({'error': 'Not found'}, 404)
+        else:
+            body = await self._read_body(receive)
+            if body is None:
+                status, headers, body = json_response({'error': 'Request body too large'}, 413)
+            else:
+                try:
+                    await self._ensure_started()
+                    tapp.park_model.refresh_shared()
+                    status, headers, body = await handler(Request(scope, body))
+                except Exception as e:
+                    asgi_log.exception("Unhandled error on %s %s: %s", method, scope['path'], e)
+                    status, headers, body = json_response({'error': 'Internal server error'}, 500)
+
+        headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        headers += [(b'access-control-allow-origin', b'*'), (b'content-length', str(len(body)).encode())]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        tapp.http_request_seconds.observe(time.perf_counter() - started, (route, method, str(status)))
+
+    async def _read_body(self, receive):
+        # Returns the request body, or None once it passes ASGI_MAX_BODY_BYTES
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > ASGI_MAX_BODY_BYTES:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    # Authentication
+    async def _authorize(self, request, roles):
+        # Returns (staff_id, None) for a valid bearer token with one of `roles`, else (None, error response)
+        token = None
+        authorization = request.headers.get('authorization', '')
+        if authorization:
+            try:
+                token = authorization.split(" ")[1]
+            except IndexError:
+                return None, json_response({'message': 'Token is malformed!'}, 401)
+        if not token:
+            return None, json_response({'message': 'Token is missing!'}, 401)
+        try:
+            current_user, current_role = tapp.verify_token(token)
+        except jwt.ExpiredSignatureError:
+            tapp.auth_rejections.inc(labels=('expired_token',))
+            return None, json_response({'message': 'Token has expired!'}, 401)
+        except jwt.InvalidTokenError:
+            tapp.auth_rejections.inc(labels=('invalid_token',))
+            return None, json_response({'message': 'Token is invalid!'}, 401)
+        if current_role not in roles:
+            tapp.auth_rejections.inc(labels=('forbidden',))
+            return None, json_response({'message': 'Access denied: Insufficient permissions!'}, 403)
+        return current_user, None
+
+    async def _get_user(self, staff_id):
+        # tapp's ParkModel.get_user_by_staff_id with the database read awaited
+        user = tapp.park_model.user_cache.get(staff_id)
+        if user is not None:
+            return user
+        try:
+            row = await self.database.fetchone(
+                "SELECT staff_id, password_hash, role FROM users WHERE staff_id = %s", (staff_id,))
+        except tapp.Error as e:
+            tapp.db_log.error("Error fetching user: %s", e)
+            return None
+        if row is None:
+            return None
+        user = {'staff_id': row[0], 'password_hash': row[1], 'role': row[2]}
+        tapp.park_model.user_cache.put(staff_id, user)
+        return user
+
+    # Routes
+    async def login(self, request):
+        data = request.json() or {}
+        staff_id = data.get('staff_id')
+        password = data.get('password')
+        if not staff_id or not password:
+            return json_response({'message': 'Staff ID and password are required.'}, 400)
+        started = time.perf_counter()
+        user = await self._get_user(staff_id)
+        tapp.auth_seconds.observe(time.perf_counter() - started, ('user_lookup',))
+        if not user:
+            tapp.auth_rejections.inc(labels=('bad_credentials',))
+            return json_response({'message': 'Invalid Staff ID or password.'}, 401)
+        verified = await self._run_blocking(tapp.check_password, user, password)
+        if verified is None:
+            return json_response({'message': 'Too many logins in progress. Please retry shortly.'}, 503,
+                                 [('retry-after', '1')])
+        if not verified:
+            return json_response({'message': 'Invalid Staff ID or password.'}, 401)
+        token = tapp.issue_token(user)
+        tapp.auth_seconds.observe(time.perf_counter() - started, ('login',))
+        return json_response({'message': 'Login successful!', 'token': token,
+                              'staff_id': user['staff_id'], 'role': user['role']})
+
+    async def get_rides(self, request):
+        # Same listing, ETag and pagination headers as tapp.get_rides; pages come from the shared rides cache
+        try:
+            snapshot = tapp.park_model.snapshot
+            query = tapp.parse_rides_query(request.query)
+            entry = tapp.cached_rides_page(snapshot, query)
+            if entry is None:
+                # Serializing a listing takes as long as the catalog is big; keep it off the loop
+                entry = await self._run_blocking(tapp.render_cached_rides_page, snapshot, query)
+            body, etag, next_cursor = entry
+        except ValueError as ve:
+            return json_response({'error': str(ve)}, 400)
+        headers = [('etag', etag), ('cache-control', 'no-cache')]
+        if next_cursor:
+            next_args = dict(request.query, cursor=next_cursor)
+            headers += [('x-next-cursor', next_cursor),
+                        ('link', f'<{request.base_url}?{urlencode(next_args)}>; rel="next"')]
+        if_none_match = request.headers.get('if-none-match', '')
+        tags = [tag.strip() for tag in if_none_match.split(',') if tag.strip()]
+        if '*' in tags or etag in tags or f'W/{etag}' in tags:
+            return 304, headers, b''
+        return body_response(body, 200, headers)
+
+    async def add_ride(self, request):
+        current_user, denied = await self._authorize(request, ['admin'])
+        if denied is not None:
+            return denied
+        try:
+            ride_data = tapp.validate_ride_data(request.json())
+            model = tapp.park_model
+            if isinstance(self.database, AiomysqlDatabase):
+                # Check and insert as one step, so two requests for one ID cannot both pass
+                async with self.ride_writes:
+                    if model.snapshot.has_ride(ride_data[0]):
+                        raise ValueError(f"Ride with ID {ride_data[0]} already exists.")
+                    try:
+                        await self.database.execute(tapp.ride_insert_query(tapp.RIDE_TABLES[ride_data[10]]),
+                                                    ride_data[:10] + ride_data[11:])
+                    except tapp.IntegrityError:
+                        raise ValueError(f"Ride with ID {ride_data[0]} already exists.") from None
+                    model.add_stored_ride(ride_data)
+            else:
+                # ParkModel.add_ride checks and inserts under its write lock
+                await self._run_blocking(lambda: model.add_ride(*ride_data))
+            return json_response({'message': f"Ride '{ride_data[1]}' added successfully by {current_user}!"}, 201)
+        except ValueError as ve:
+            return json_response({'error': str(ve)}, 400)
+        except Exception as e:
+            tapp.api_log.exception("Error in add_ride endpoint: %s", e)
+            return json_response({'error': f"Failed to add ride: {str(e)}"}, 500)
+
+    async def generate_plan(self, request):
+        try:
+            context = tapp.parse_plan_request(request.json())
+            cache_generation = tapp.plan_cache.generation
+            snapshot = tapp.park_model.snapshot
+
+            cache_key = context.cache_key(snapshot.plan_version)
+            cached_body = tapp.plan_cache.get(cache_key)
+            if cached_body is not None:
+                return body_response(cached_body, 200, [('x-plan-cache', 'HIT')])
+            if not snapshot.rides:
+                return json_response({'error': 'No rides available. Please add some rides first.'}, 400)
+
+            # Plans past the cap wait here as coroutines rather than queueing inside the executor
+            async with self.plan_slots:
+                self.plans_in_flight += 1
+                try:
+                    body = await asyncio.get_running_loop().run_in_executor(
+                        self.plan_executor, tapp.render_plan, context, snapshot, cache_key, cache_generation)
+                finally:
+                    self.plans_in_flight -= 1
+            return body_response(body, 200, [('x-plan-cache', 'MISS')])
+        except tapp.PlanRequestError as pe:
+            return json_response({'error': str(pe)}, 400)
+        except ValueError as ve:
+            return json_response({'error': f'Invalid input: {str(ve)}'}, 400)
+        except Exception as e:
+            tapp.api_log.exception("Error in generate_plan endpoint: %s", e)
+            return json_response({'error': f"Failed to generate plan: {str(e)}"}, 500)
+
+    async def health_check(self, request):
+        report = tapp.health_report(await self.database.ping())
+        report['serving'] = {'mode': 'asgi', 'db_driver': self.database.name, 'plan_workers': ASGI_PLAN_WORKERS,
+                             'plans_in_flight': self.plans_in_flight}
+        return json_response(report)
+
+app = ThrillSafariASGI()
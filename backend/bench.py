@@ -0,0 +1,269 @@
+"""Benchmark suite for the ride planner and the Flask routes.
+
+Times generate_optimal_plan over synthetic catalogs (50, 10k and 1M rides by default) for every
+ride_preference mode, total_time budget, VIP/weather combination and planning engine, then times
+/api/rides and /api/generate_plan through the Flask test client against an in-memory SQLite stand-in.
+Ride updates and deletes are timed on each catalog as well.
+
+    python bench.py                          # full run, compared against bench_baselines.json
+    python bench.py --sizes 50,10000         # skip the 1M catalog
+    python bench.py --save-baseline          # record this run as the new baseline
+    python bench.py --fail-on-regression     # exit 1 if any case is slower than baseline by > --tolerance
+
+Baselines are keyed by case name and hold median milliseconds; compare runs on the same machine."""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+from datetime import datetime
+
+# The route benchmarks run against a throwaway in-memory database and never touch the catalog file
+os.environ.setdefault('DB_BACKEND', 'sqlite')
+os.environ.setdefault('SQLITE_PATH', ':memory:')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('CATALOG_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), 'thrill_safari_bench_catalog.bin'))
+
+import numpy as np
+import tapp
+import planner  # after tapp, which loads .env before the planner reads its settings
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baselines.json')
+DEFAULT_SIZES = (50, 10_000, 1_000_000)
+TOTAL_TIME_BUDGETS = (30, 240, 720)
+GUESTS = ((9, 32), (25, 70), (52, 88))  # (age, weight): a child, an adult and an over-40 adult
+
+# Synthetic Catalogs
+# Per ride type: catalog share, then thrill, duration, age and weight ranges and the bad-weather chance
+RIDE_PROFILES = {
+    'land': (0.5, (3, 10), (2, 6), (8, 14), (60, 100), (20, 35), (110, 150), 0.3),
+    'water': (0.3, (4, 9), (3, 8), (6, 12), (65, 100), (20, 30), (120, 150), 0.9),
+    'kids': (0.2, (1, 5), (2, 5), (2, 4), (10, 14), (10, 15), (40, 60), 0.2),
+}
+
+def generate_catalog(size, seed=0):
+    # Builds `size` ride rows (RIDE_FIELDS order), drawing each attribute as a whole column
+    rng = np.random.default_rng(seed + size)
+    types = list(RIDE_PROFILES)
+    ride_types = rng.choice(len(types), size=size, p=[RIDE_PROFILES[t][0] for t in types])
+
+    def draw(slot):
+        # Per-ride integer drawn uniformly from the (low, high) range at RIDE_PROFILES[type][slot]
+        low = np.array([RIDE_PROFILES[t][slot][0] for t in types])[ride_types]
+        high = np.array([RIDE_PROFILES[t][slot][1] for t in types])[ride_types]
+        return rng.integers(low, high + 1)
+
+    thrill = draw(1)
+    duration = draw(2)
+    min_age, max_age = draw(3), draw(4)
+    min_weight, max_weight = draw(5), draw(6)
+    queue_time = rng.gamma(2.0, 4.0 + 3.0 * thrill).astype(int)  # thrill rides draw longer queues
+    weather_chance = np.array([RIDE_PROFILES[t][7] for t in types])[ride_types]
+    affected_by_weather = rng.random(size) < weather_chance
+    restricted = rng.random(size) < 0.05
+    vip_access = rng.random(size) < 0.4
+
+    rides = []
+    columns = zip(ride_types.tolist(), thrill.tolist(), duration.tolist(), queue_time.tolist(), restricted.tolist(),
+                  vip_access.tolist(), affected_by_weather.tolist(), min_weight.tolist(), max_weight.tolist(),
+                  min_age.tolist(), max_age.tolist())
+    for position, (type_index, *values) in enumerate(columns):
+        ride_type = types[type_index]
+        ride_thrill, ride_duration, ride_queue, is_restricted, has_vip, weather, low_kg, high_kg, low_age, high_age = values
+        rides.append((f'{ride_type[0].upper()}{position:07d}', f'Synthetic {ride_type} ride {position}',
+                      ride_thrill, ride_duration, ride_queue, ride_thrill // 2 + 1, False, is_restricted,
+                      has_vip, weather, ride_type, low_kg, high_kg, low_age, high_age))
+    return rides
+
+# Timing
+def time_call(func, repeat):
+    # Runs func `repeat` times and returns (median, p95) in milliseconds
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+def repeats_for(size, repeat):
+    # Large catalogs get fewer repetitions so a full run stays within a few minutes
+    if size >= 1_000_000:
+        return 1
+    if size >= 10_000:
+        return max(3, repeat // 3)
+    return repeat
+
+def bench_planner(size, snapshot, repeat, engines):
+    results = {}
+    runs = repeats_for(size, repeat)
+    for engine in engines:
+        entry_time = tapp.parse_clock_time(planner.PARK_OPENING_TIME) if engine == 'schedule' else None
+        for ride_preference in planner.RIDE_PREFERENCES:
+            for total_time in TOTAL_TIME_BUDGETS:
+                for is_vip in (False, True):
+                    for bad_weather in (False, True):
+                        samples = []
+                        for user_age, user_weight in GUESTS:
+                            context = planner.PlanningContext(total_time, is_vip, bad_weather, user_age, user_weight,
+                                                           ride_preference, engine, entry_time)
+                            samples.append(time_call(lambda: planner.generate_optimal_plan(context, snapshot), runs))
+                        name = (f'plan/size={size}/engine={engine}/pref={ride_preference or "mixed"}'
+                                f'/time={total_time}/vip={int(is_vip)}/weather={int(bad_weather)}')
+                        results[name] = summarize(samples)
+    return results
+
+def bench_mutations(size, snapshot, rows, repeat):
+    # One-ride updates and deletes through with_ride_changes; the cost should not grow with the catalog
+    results = {}
+    runs = max(repeat, 64)
+    state = {'snapshot': snapshot, 'next': 0}
+
+    def update():
+        row = list(rows[state['next'] % len(rows)])
+        state['next'] += 7
+        row[2] = row[2] % 10 + 1
+        state['snapshot'] = state['snapshot'].with_ride_changes(upserts=[row])
+
+    def delete():
+        ride_id = rows[state['next'] % len(rows)][0]
+        state['next'] += 7
+        state['snapshot'] = state['snapshot'].with_ride_changes(deletes=[ride_id])
+
+    results[f'mutate/size={size}/update'] = summarize([time_call(update, runs)])
+    results[f'mutate/size={size}/delete'] = summarize([time_call(delete, runs)])
+    return results
+
+def summarize(samples):
+    # Averages (median, p95) pairs gathered over the guest profiles
+    return {'median_ms': round(sum(s[0] for s in samples) / len(samples), 4),
+            'p95_ms': round(sum(s[1] for s in samples) / len(samples), 4)}
+
+def bench_routes(size, repeat):
+    # Drives the routes through the test client against the catalog already published into the app's model
+    tapp.rides_cache.clear()
+    tapp.plan_cache.clear()
+    client = tapp.app.test_client()
+    runs = repeats_for(size, repeat)
+    results = {}
+
+    def rides_cold():
+        tapp.rides_cache.clear()
+        assert client.get('/api/rides?limit=100').status_code == 200
+
+    def rides_warm():
+        assert client.get('/api/rides?limit=100').status_code == 200
+
+    etag = client.get('/api/rides?limit=100').headers['ETag']
+
+    def rides_not_modified():
+        assert client.get('/api/rides?limit=100', headers={'If-None-Match': etag}).status_code == 304
+
+    def rides_projected():
+        assert client.get('/api/rides?limit=100&fields=id,name,thrill&type=water').status_code == 200
+
+    results[f'route/size={size}/rides/cold'] = summarize([time_call(rides_cold, runs)])
+    results[f'route/size={size}/rides/warm'] = summarize([time_call(rides_warm, runs)])
+    results[f'route/size={size}/rides/not_modified'] = summarize([time_call(rides_not_modified, runs)])
+    results[f'route/size={size}/rides/projected'] = summarize([time_call(rides_projected, runs)])
+
+    for engine in ('heap', 'knapsack'):
+        for ride_preference in planner.RIDE_PREFERENCES:
+            payload = {'total_time': 240, 'user_age': 25, 'user_weight': 70, 'is_vip': True,
+                       'ride_preference': ride_preference, 'engine': engine}
+
+            def plan_miss():
+                tapp.plan_cache.clear()
+                assert client.post('/api/generate_plan', json=payload).status_code == 200
+
+            def plan_hit():
+                assert client.post('/api/generate_plan', json=payload).status_code == 200
+
+            label = ride_preference or 'mixed'
+            results[f'route/size={size}/generate_plan/engine={engine}/pref={label}/miss'] = \
+                summarize([time_call(plan_miss, runs)])
+            results[f'route/size={size}/generate_plan/engine={engine}/pref={label}/hit'] = \
+                summarize([time_call(plan_hit, runs)])
+    return results
+
+# Baselines
+def load_baseline(path):
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except (OSError, ValueError):
+        return None
+
+def save_baseline(path, results):
+    with open(path, 'w') as baseline_file:
+        json.dump({
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'machine': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'platform': platform.platform(), 'processor': platform.processor() or platform.machine()},
+            'results': results
+        }, baseline_file, indent=1, sort_keys=True)
+        baseline_file.write('\n')
+
+def compare(results, baseline, tolerance):
+    # Prints every case with its change against the baseline; returns the names of the regressions
+    previous = (baseline or {}).get('results', {})
+    regressions = []
+    width = max(len(name) for name in results)
+    for name, result in results.items():
+        line = f'{name:<{width}}  {result["median_ms"]:>11.4f} ms  (p95 {result["p95_ms"]:.4f})'
+        if name in previous and previous[name]['median_ms'] > 0:
+            ratio = result['median_ms'] / previous[name]['median_ms']
+            line += f'  {ratio:6.2f}x baseline'
+            if ratio > 1 + tolerance:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='comma-separated catalog sizes (default: %(default)s)')
+    parser.add_argument('--repeat', type=int, default=30, help='repetitions per case for small catalogs')
+    parser.add_argument('--engines', default=','.join(planner.PLANNING_ENGINES), help='planning engines to time')
+    parser.add_argument('--skip-routes', action='store_true', help='only time generate_optimal_plan')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='write this run to the baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a case is flagged')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 on any regression')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    tapp.initialize_app()
+    engines = [engine.strip() for engine in args.engines.split(',') if engine.strip()]
+    results = {}
+    for size in (int(size) for size in args.sizes.split(',')):
+        started = time.perf_counter()
+        rides = generate_catalog(size, args.seed)
+        with tapp.park_model._writing():
+            tapp.park_model._publish(rides)
+        snapshot = tapp.park_model.snapshot
+        print(f'# {size} rides: catalog and index built in {time.perf_counter() - started:.2f} s', file=sys.stderr)
+        results.update(bench_planner(size, snapshot, args.repeat, engines))
+        results.update(bench_mutations(size, snapshot, rides, args.repeat))
+        if not args.skip_routes:
+            results.update(bench_routes(size, args.repeat))
+        del rides, snapshot
+
+    regressions = compare(results, load_baseline(args.baseline), args.tolerance)
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f'# baseline written to {args.baseline}', file=sys.stderr)
+    if regressions:
+        print(f'# {len(regressions)} case(s) slower than baseline by more than {args.tolerance:.0%}', file=sys.stderr)
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
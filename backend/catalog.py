@@ -0,0 +1,806 @@
+"""The ride catalog: columnar ride arrays, their id index, the eligibility bitsets and immutable snapshots."""
+
+import os
+import time
+import itertools
+import numpy as np
+
+# Catalog Configuration
+CATALOG_COMPACT_RATIO = float(os.environ.get('CATALOG_COMPACT_RATIO', 0.25))  # tombstoned share that forces a rebuild
+CATALOG_INCREMENTAL_INDEX_MAX = int(os.environ.get('CATALOG_INCREMENTAL_INDEX_MAX', 64))  # more are indexed in one pass
+
+# Queue Curve Configuration
+QUEUE_SLOT_MINUTES = 15
+QUEUE_SLOTS_PER_DAY = 24 * 60 // QUEUE_SLOT_MINUTES
+# Crowd level by hour, in percent of a ride's listed queue time; rides without a stored curve follow it
+DEFAULT_QUEUE_PROFILE = np.repeat(np.array([
+    20, 20, 20, 20, 20, 20, 20, 20, 30, 50, 80, 100, 120, 130, 130, 120, 110, 100, 90, 80, 60, 40, 20, 20
+], dtype=np.int64), 60 // QUEUE_SLOT_MINUTES)
+
+RIDE_FIELDS = ['id', 'name', 'thrill', 'duration', 'queue_time', 'fatigue', 'mandatory', 'restricted', 'vip_access',
+               'affected_by_weather', 'type', 'min_weight', 'max_weight', 'min_age', 'max_age']
+
+RIDE_COLUMNS = ['id', 'name', 'thrill', 'duration', 'queue_time', 'fatigue', 'mandatory', 'restricted', 'vip_access',
+                'affected_by_weather', 'min_weight', 'max_weight', 'min_age', 'max_age']
+RIDE_TABLES = {'land': 'land_rides', 'water': 'water_rides', 'kids': 'kids_rides'}
+
+RIDE_TYPES = ('land', 'water', 'kids')  # the columnar catalog stores a ride's type as its position here
+RIDE_TYPE_CODES = {ride_type: code for code, ride_type in enumerate(RIDE_TYPES)}
+
+# Model Classes
+class Ride:
+    # Represents a single ride in the theme park with its attributes
+    def __init__(self, id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, vip_access,
+                  affected_by_weather, type, min_weight=0, max_weight=200, min_age=0, max_age=100):
+        self.id = id
+        self.name = name
+        self.thrill = thrill
+        self.duration = duration
+        self.queue_time = queue_time
+        self.fatigue = fatigue
+        self.mandatory = mandatory
+        self.restricted = restricted
+        self.vip_access = vip_access
+        self.affected_by_weather = affected_by_weather
+        self.type = type
+        self.min_weight = min_weight
+        self.max_weight = max_weight
+        self.min_age = min_age
+        self.max_age = max_age
+
+class Tombstones:
+    # Immutable set of tombstoned rows: a large settled set plus a small recent one merged every MERGE_SIZE rows
+    __slots__ = ('settled', 'recent')
+    MERGE_SIZE = 256
+
+    def __init__(self, settled=frozenset(), recent=frozenset()):
+        self.settled = settled
+        self.recent = recent
+
+    def __contains__(self, row):
+        return row in self.recent or row in self.settled
+
+    def __len__(self):
+        return len(self.settled) + len(self.recent)
+
+    def __iter__(self):
+        return itertools.chain(self.settled, self.recent)
+
+    def with_rows(self, rows):
+        recent = self.recent.union(rows)
+        if len(recent) > self.MERGE_SIZE:
+            return Tombstones(self.settled | recent)
+        return Tombstones(self.settled, recent)
+
+class RowIndex:
+    # ride_id -> catalog row shared by the snapshots of one catalog; the recent dict overrides the settled one
+    __slots__ = ('settled', 'recent')
+    MERGE_SIZE = 256
+
+    def __init__(self, settled=None, recent=None):
+        self.settled = {} if settled is None else settled
+        self.recent = {} if recent is None else recent
+
+    def get(self, ride_id, default=None):
+        if ride_id in self.recent:
+            row = self.recent[ride_id]
+            return default if row is None else row
+        return self.settled.get(ride_id, default)
+
+    def __contains__(self, ride_id):
+        return self.get(ride_id) is not None
+
+    def items(self):
+        for ride_id, row in self.settled.items():
+            if ride_id not in self.recent:
+                yield ride_id, row
+        for ride_id, row in self.recent.items():
+            if row is not None:
+                yield ride_id, row
+
+    def update(self, pairs):
+        # Adds rides that are not in this view (new or removed ones) in place
+        recent, settled = self.recent, self.settled
+        for ride_id, row in pairs:
+            if ride_id in recent or ride_id in settled or not isinstance(settled, dict):
+                recent[ride_id] = row
+            else:
+                settled[ride_id] = row
+
+    def without(self, ride_ids):
+        # A new view with `ride_ids` removed; this one is left as it is
+        recent = dict(self.recent)
+        recent.update(dict.fromkeys(ride_ids))
+        if len(recent) > self.MERGE_SIZE:
+            settled = dict(self.settled) if isinstance(self.settled, dict) else dict(self.settled.items())
+            for ride_id, row in recent.items():
+                if row is None:
+                    settled.pop(ride_id, None)
+                else:
+                    settled[ride_id] = row
+            return RowIndex(settled)
+        return RowIndex(self.settled, recent)
+
+class RideViews:
+    # Read-only sequence of Ride objects built on access from a catalog's columns, skipping tombstoned rows
+    __slots__ = ('catalog', 'size', 'dead')
+
+    def __init__(self, catalog, size, dead=frozenset()):
+        self.catalog = catalog
+        self.size = size
+        self.dead = dead
+
+    def __len__(self):
+        return self.size - len(self.dead)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.catalog.ride(row) for row in range(*position.indices(self.size))]
+        if position < 0:
+            position += self.size
+        if not 0 <= position < self.size:
+            raise IndexError('ride index out of range')
+        return self.catalog.ride(position)
+
+    def __iter__(self):
+        return (Ride(*row) for row in self.catalog.rows(self.size, self.dead))
+
+class RideCatalog:
+    # Columnar ride store: one append-only NumPy array per attribute, ids and names in lists, and an id index
+    NUMERIC_COLUMNS = ('thrill', 'duration', 'queue_time', 'fatigue', 'min_weight', 'max_weight', 'min_age', 'max_age')
+    FLAG_COLUMNS = ('mandatory', 'restricted', 'vip_access', 'affected_by_weather')
+    MIN_CAPACITY = 64
+    read_only = False  # True for catalogs mapped from a shared segment, which are never appended to
+
+    def __init__(self, capacity=0):
+        self.size = 0
+        self.columns = self._allocate(max(capacity, self.MIN_CAPACITY))
+        self.ids = []
+        self.names = []
+        self.rows_by_id = RowIndex()
+
+    def _allocate(self, capacity):
+        columns = {name: np.zeros(capacity, dtype=np.int32) for name in self.NUMERIC_COLUMNS}
+        columns.update({name: np.zeros(capacity, dtype=bool) for name in self.FLAG_COLUMNS})
+        columns['type'] = np.zeros(capacity, dtype=np.uint8)
+        return columns
+
+    @property
+    def capacity(self):
+        return len(self.columns['thrill'])
+
+    def _grow(self, needed):
+        # Copies the filled rows into arrays of at least double the capacity, then swaps them in at once
+        columns = self._allocate(max(needed, 2 * self.capacity))
+        for name, values in self.columns.items():
+            columns[name][:self.size] = values[:self.size]
+        self.columns = columns
+
+    def append(self, rows):
+        # Appends rows given in RIDE_FIELDS order; returns the new size. Raises ValueError on an unknown type.
+        rows = rows if isinstance(rows, list) else list(rows)
+        if not rows:
+            return self.size
+        values = list(zip(*rows))  # one tuple per RIDE_FIELDS entry
+        try:
+            type_codes = [RIDE_TYPE_CODES[ride_type] for ride_type in values[RIDE_FIELDS.index('type')]]
+        except KeyError:
+            raise ValueError("Invalid ride type specified.")
+        start, end = self.size, self.size + len(rows)
+        if end > self.capacity:
+            self._grow(end)
+        for position, field in enumerate(RIDE_FIELDS):
+            if field in self.columns and field != 'type':
+                self.columns[field][start:end] = values[position]
+        self.columns['type'][start:end] = type_codes
+        self.ids.extend(values[0])
+        self.names.extend(values[1])
+        self.rows_by_id.update(zip(values[0], range(start, end)))
+        self.size = end
+        return end
+
+    def with_columns(self, **columns):
+        # Catalog sharing every array and list with this one except the given replacement columns
+        clone = object.__new__(RideCatalog)
+        clone.__dict__.update(self.__dict__)
+        clone.columns = {**self.columns, **columns}
+        return clone
+
+    def with_rows_by_id(self, rows_by_id):
+        # Catalog sharing every array and list with this one except the id -> row mapping
+        clone = object.__new__(RideCatalog)
+        clone.__dict__.update(self.__dict__)
+        clone.rows_by_id = rows_by_id
+        return clone
+
+    def fork(self, size):
+        # Independent copy of the first `size` rows, for writers working from an older snapshot
+        clone = RideCatalog(size)
+        for name, values in self.columns.items():
+            clone.columns[name][:size] = values[:size]
+        if isinstance(self.rows_by_id, SharedIdIndex) and size == len(self.ids):
+            # A whole mapped segment: its ids, names and id index stay in the mapping and appends go after them
+            clone.ids, clone.names = AppendedStrings(self.ids), AppendedStrings(self.names)
+            clone.rows_by_id = RowIndex(self.rows_by_id)
+        else:
+            clone.ids = self.ids[:size]
+            clone.names = self.names[:size]
+            clone.rows_by_id = RowIndex({ride_id: row for ride_id, row in self.rows_by_id.items() if row < size})
+        clone.size = size
+        return clone
+
+    def rows(self, size, dead=frozenset()):
+        # The first `size` rides, less the rows in `dead`, as lists of plain Python values in RIDE_FIELDS order
+        columns = [self.ids[:size], self.names[:size]]
+        for field in RIDE_FIELDS[2:]:
+            if field == 'type':
+                columns.append([RIDE_TYPES[code] for code in self.columns['type'][:size].tolist()])
+            else:
+                columns.append(self.columns[field][:size].tolist())
+        if dead:
+            return [list(row) for position, row in enumerate(zip(*columns)) if position not in dead]
+        return [list(row) for row in zip(*columns)]
+
+    def ride(self, row):
+        values = [self.ids[row], self.names[row]]
+        for field in RIDE_FIELDS[2:]:
+            value = self.columns[field][row].item()
+            values.append(RIDE_TYPES[value] if field == 'type' else value)
+        return Ride(*values)
+
+    def nbytes(self):
+        return sum(values.nbytes for values in self.columns.values())
+
+class EligibilityIndex:
+    # Bitset index over the catalog rows: per-age, per-kg and flag masks, ANDed to find the eligible rides
+    MAX_AGE = 100
+    MAX_WEIGHT = 300
+    OVER_40_MAX_THRILL = 6
+    TAIL_MAX = 64  # appended rides matched one by one before they are folded into the masks (see add)
+
+    def __init__(self, columns, size, dead=()):
+        self.size = size
+        live = np.ones(size, dtype=bool)
+        live[list(dead)] = False
+        self.live = self._pack(live)  # rows not tombstoned (see CatalogSnapshot.with_ride_changes)
+        min_age, max_age = columns['min_age'][:size], columns['max_age'][:size]
+        min_weight, max_weight = columns['min_weight'][:size], columns['max_weight'][:size]
+        wet = columns['type'][:size] == RIDE_TYPE_CODES['water']
+        self.by_age = [self._pack((min_age <= age) & (max_age >= age)) for age in range(self.MAX_AGE + 1)]
+        self.by_weight = [self._pack((min_weight <= weight) & (max_weight >= weight))
+                          for weight in range(self.MAX_WEIGHT + 1)]
+        self.unrestricted = self._pack(~columns['restricted'][:size])
+        self.weather_safe = self._pack(~columns['affected_by_weather'][:size])
+        self.calm = self._pack(columns['thrill'][:size] <= self.OVER_40_MAX_THRILL)
+        self.wet = self._pack(wet)
+        self.dry = self._pack(~wet)
+        self.tail = []  # (row, ride) appended since the masks were last folded
+        self._tail_masks = {}  # eligible() arguments -> mask of the matching tail rides
+
+    @staticmethod
+    def _pack(flags):
+        # Packs a boolean array into a Python int, element i becoming bit i
+        return int.from_bytes(np.packbits(flags, bitorder='little').tobytes(), 'little')
+
+    def packed(self):
+        # Every mask as one row of little-endian bytes: ages, weights, then the flag masks (see from_packed)
+        by_age, by_weight, flags = self._with_tail()
+        masks = by_age + by_weight + flags + [self.live]
+        width = (self.size + 7) // 8
+        return np.frombuffer(b''.join(mask.to_bytes(width, 'little') for mask in masks),
+                             dtype=np.uint8).reshape(len(masks), width)
+
+    @classmethod
+    def from_packed(cls, packed, size):
+        masks = [int.from_bytes(row.tobytes(), 'little') for row in packed]
+        index = object.__new__(cls)
+        index.size = size
+        index.by_age = masks[:cls.MAX_AGE + 1]
+        index.by_weight = masks[cls.MAX_AGE + 1:cls.MAX_AGE + cls.MAX_WEIGHT + 2]
+        index.unrestricted, index.weather_safe, index.calm, index.wet, index.dry, index.live = \
+            masks[cls.MAX_AGE + cls.MAX_WEIGHT + 2:]
+        index.tail = []
+        index._tail_masks = {}
+        return index
+
+    def copy(self):
+        # Shallow copy; the masks are immutable ints, so only the per-age/per-kg lists and the tail are duplicated
+        clone = object.__new__(EligibilityIndex)
+        clone.__dict__.update(self.__dict__)
+        clone.by_age = list(self.by_age)
+        clone.by_weight = list(self.by_weight)
+        clone.tail = list(self.tail)
+        clone._tail_masks = {}
+        return clone
+
+    def add(self, index, ride):
+        # Indexes a ride appended at `index`; appended rides wait in `tail` until TAIL_MAX are folded in at once
+        self.live |= 1 << index
+        self.tail.append((index, ride))
+        self._tail_masks = {}
+        self.size = max(self.size, index + 1)
+        if len(self.tail) >= self.TAIL_MAX:
+            self.by_age, self.by_weight, flags = self._with_tail()
+            self.unrestricted, self.weather_safe, self.calm, self.wet, self.dry = flags
+            self.tail = []
+            self._tail_masks = {}
+
+    def _with_tail(self):
+        # The masks with the tail rides' bits set: (by_age, by_weight, [unrestricted, weather_safe, calm, wet, dry])
+        flags = [self.unrestricted, self.weather_safe, self.calm, self.wet, self.dry]
+        if not self.tail:
+            return list(self.by_age), list(self.by_weight), flags
+        start = min(row for row, _ in self.tail)
+        age_bits = [0] * (self.MAX_AGE + 1)
+        weight_bits = [0] * (self.MAX_WEIGHT + 1)
+        flag_bits = [0] * len(flags)
+        for row, ride in self.tail:
+            bit = 1 << (row - start)
+            for age in range(max(ride.min_age, 0), min(ride.max_age, self.MAX_AGE) + 1):
+                age_bits[age] |= bit
+            for weight in range(max(ride.min_weight, 0), min(ride.max_weight, self.MAX_WEIGHT) + 1):
+                weight_bits[weight] |= bit
+            matches = (not ride.restricted, not ride.affected_by_weather, ride.thrill <= self.OVER_40_MAX_THRILL,
+                       ride.type == 'water', ride.type != 'water')
+            for position, match in enumerate(matches):
+                if match:
+                    flag_bits[position] |= bit
+
+        def fold(masks, bits):
+            return [mask | (extra << start) if extra else mask for mask, extra in zip(masks, bits)]
+        return fold(self.by_age, age_bits), fold(self.by_weight, weight_bits), fold(flags, flag_bits)
+
+    def _tail_mask(self, user_age, user_weight, bad_weather, ride_preference):
+        # Mask of the tail rides a guest may take, ignoring tombstones; memoized per index
+        key = (user_age, user_weight, bad_weather, ride_preference)
+        mask = self._tail_masks.get(key)
+        if mask is None:
+            start = min(row for row, _ in self.tail)
+            bits = 0
+            for row, ride in self.tail:
+                if ride.restricted or not (ride.min_age <= user_age <= ride.max_age) \
+                        or not (ride.min_weight <= user_weight <= ride.max_weight):
+                    continue
+                if (bad_weather and ride.affected_by_weather) or (user_age > 40 and ride.thrill > self.OVER_40_MAX_THRILL):
+                    continue
+                if (ride_preference == 'dry_only' and ride.type == 'water') or \
+                        (ride_preference == 'wet_only' and ride.type != 'water'):
+                    continue
+                bits |= 1 << (row - start)
+            mask = self._tail_masks[key] = bits << start
+        return mask
+
+    def remove(self, index):
+        # Tombstones the ride at position `index`: it matches no guest from now on
+        self.live &= ~(1 << index)
+
+    def remove_rows(self, rows):
+        # remove() for many rows at once, with a single pass over the live mask
+        dead = 0
+        for row in rows:
+            dead |= 1 << row
+        self.live &= ~dead
+
+    def extend(self, columns, end):
+        # Indexes the rows appended from self.size up to `end` with one shift-and-OR per mask
+        start = self.size
+        if end <= start:
+            return
+        block = EligibilityIndex({name: values[start:end] for name, values in columns.items()}, end - start)
+
+        def fold(masks, bits):
+            return [mask | (extra << start) if extra else mask for mask, extra in zip(masks, bits)]
+        self.by_age = fold(self.by_age, block.by_age)
+        self.by_weight = fold(self.by_weight, block.by_weight)
+        self.unrestricted, self.weather_safe, self.calm, self.wet, self.dry, self.live = fold(
+            [self.unrestricted, self.weather_safe, self.calm, self.wet, self.dry, self.live],
+            [block.unrestricted, block.weather_safe, block.calm, block.wet, block.dry, block.live])
+        self.size = end
+        self._tail_masks = {}
+
+    def eligible(self, user_age, user_weight, bad_weather, ride_preference=''):
+        # Returns the mask of rides a guest may take; ages/weights outside the index match nothing
+        if not (0 <= user_age <= self.MAX_AGE and 0 <= user_weight <= self.MAX_WEIGHT):
+            return 0
+        mask = self.unrestricted & self.by_age[user_age] & self.by_weight[user_weight]
+        if bad_weather:
+            mask &= self.weather_safe
+        if user_age > 40:
+            mask &= self.calm
+        if ride_preference == 'dry_only':
+            mask &= self.dry
+        elif ride_preference == 'wet_only':
+            mask &= self.wet
+        if self.tail:
+            mask |= self._tail_mask(user_age, user_weight, bad_weather, ride_preference)
+        return mask & self.live
+
+    def indices(self, mask):
+        # Positions of the set bits of `mask`, in ascending order, as an int64 array
+        if not mask:
+            return np.empty(0, dtype=np.int64)
+        raw = np.frombuffer(mask.to_bytes((self.size + 7) // 8, 'little'), dtype=np.uint8)
+        return np.flatnonzero(np.unpackbits(raw, bitorder='little'))
+
+class ParkLayout:
+    # Walkway graph of the park with all-pairs walking minutes, computed once per layout
+    UNREACHABLE = 1 << 30
+
+    def __init__(self, nodes, walkways, ride_locations, entrance):
+        self.nodes = [(str(node_id), int(x), int(y)) for node_id, x, y in nodes]
+        self.walkways = [(str(a), str(b), int(minutes)) for a, b, minutes in walkways]
+        self.ride_locations = {str(ride_id): str(node_id) for ride_id, node_id in ride_locations.items()}
+        self.entrance = entrance
+        self.node_index = {node_id: position for position, (node_id, _, _) in enumerate(self.nodes)}
+        if len(self.node_index) != len(self.nodes):
+            raise ValueError("Node IDs must be unique.")
+        if self.nodes and entrance not in self.node_index:
+            raise ValueError(f"Entrance '{entrance}' is not a node.")
+        pairs = set()
+        for a, b, minutes in self.walkways:
+            if a not in self.node_index or b not in self.node_index:
+                raise ValueError(f"Walkway {a} - {b} references an unknown node.")
+            if minutes < 0:
+                raise ValueError(f"Walkway {a} - {b} has a negative walking time.")
+            if (a, b) in pairs or (b, a) in pairs:
+                raise ValueError(f"Walkway {a} - {b} is listed twice.")
+            pairs.add((a, b))
+        for ride_id, node_id in self.ride_locations.items():
+            if node_id not in self.node_index:
+                raise ValueError(f"Ride {ride_id} is placed at unknown node '{node_id}'.")
+
+        started = time.perf_counter()
+        self.walk = self._all_pairs()
+        self.precompute_ms = round((time.perf_counter() - started) * 1000, 3)
+        self.entrance_node = self.node_index.get(entrance, -1)
+        self.ride_nodes = {ride_id: self.node_index[node_id] for ride_id, node_id in self.ride_locations.items()}
+        for ride_id, node in self.ride_nodes.items():
+            if self.walk[self.entrance_node, node] >= self.UNREACHABLE:
+                raise ValueError(f"Ride {ride_id} cannot be reached from the entrance.")
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], {}, None)
+
+    def __bool__(self):
+        return bool(self.ride_nodes)
+
+    def _all_pairs(self):
+        # Shortest walking minutes between every pair of nodes; UNREACHABLE where no path exists
+        count = len(self.nodes)
+        walk = np.full((count, count), self.UNREACHABLE, dtype=np.int64)
+        np.fill_diagonal(walk, 0)
+        for a, b, minutes in self.walkways:
+            i, j = self.node_index[a], self.node_index[b]
+            walk[i, j] = walk[j, i] = min(walk[i, j], minutes)
+        for k in range(count):
+            np.minimum(walk, walk[:, k:k + 1] + walk[k:k + 1, :], out=walk)
+        return walk
+
+    def stops_matrix(self, ride_ids, fallback):
+        # Walking minutes between the entrance (stop 0) and the given rides; unplaced rides cost `fallback`
+        nodes = np.array([self.entrance_node] + [self.ride_nodes.get(ride_id, -1) for ride_id in ride_ids])
+        placed = nodes >= 0
+        walk = np.full((len(nodes), len(nodes)), fallback, dtype=np.int64)
+        walk[np.ix_(placed, placed)] = self.walk[np.ix_(nodes[placed], nodes[placed])]
+        walk[0, ~placed] = walk[~placed, 0] = 0
+        np.fill_diagonal(walk, 0)
+        return walk
+
+    def without_rides(self, ride_ids):
+        # Same layout with the given rides no longer placed; the walking times are reused, not recomputed
+        ride_ids = set(ride_ids)
+        clone = object.__new__(ParkLayout)
+        clone.__dict__.update(self.__dict__)
+        clone.ride_locations = {ride_id: node for ride_id, node in self.ride_locations.items() if ride_id not in ride_ids}
+        clone.ride_nodes = {ride_id: node for ride_id, node in self.ride_nodes.items() if ride_id not in ride_ids}
+        return clone
+
+    def to_dict(self):
+        return {
+            'entrance': self.entrance,
+            'nodes': [{'id': node_id, 'x': x, 'y': y} for node_id, x, y in self.nodes],
+            'walkways': [{'from': a, 'to': b, 'minutes': minutes} for a, b, minutes in self.walkways],
+            'rides': dict(self.ride_locations),
+            'precompute_ms': self.precompute_ms
+        }
+
+class CatalogSnapshot:
+    # Immutable, versioned view of the first `size` rows of a RideCatalog; writers publish a new one
+    __slots__ = ('version', 'plan_version', 'catalog', 'size', 'dead', 'eligibility_index', 'queue_curves', 'layout',
+                 '_listing', '_listing_rows', '_costs')
+
+    def __init__(self, version, catalog, size=None, eligibility_index=None, plan_version=None, queue_curves=None,
+                 layout=None, dead=None):
+        self.version = version
+        # Part of every plan cache key. Live queue-time updates keep it and drop only the plans they affect.
+        self.plan_version = version if plan_version is None else plan_version
+        self.catalog = catalog
+        self.size = catalog.size if size is None else size
+        # Rows of updated or removed rides (tombstones); they stay in the columns but are never served
+        self.dead = dead if dead is not None else Tombstones()
+        self.eligibility_index = eligibility_index if eligibility_index is not None else \
+            EligibilityIndex(catalog.columns, self.size, self.dead)
+        # ride_id -> int array of queue minutes per QUEUE_SLOT_MINUTES slot of the day; never modified in place
+        self.queue_curves = queue_curves if queue_curves is not None else {}
+        self.layout = layout if layout is not None else EMPTY_LAYOUT
+        self._listing = None
+        self._listing_rows = {}
+        self._costs = {}
+
+    @classmethod
+    def from_rows(cls, version, rows, queue_curves=None, layout=None):
+        # Snapshot over a fresh catalog holding `rows` (sequences in RIDE_FIELDS order)
+        rows = rows if isinstance(rows, list) else list(rows)
+        catalog = RideCatalog(len(rows))
+        catalog.append(rows)
+        return cls(version, catalog, queue_curves=queue_curves, layout=layout)
+
+    @property
+    def rides(self):
+        return RideViews(self.catalog, self.size, self.dead)
+
+    @property
+    def ride_count(self):
+        return self.size - len(self.dead)
+
+    def live_rows(self):
+        # Every ride as a list of plain values in RIDE_FIELDS order, tombstones left out
+        return self.catalog.rows(self.size, self.dead)
+
+    def has_ride(self, ride_id):
+        row = self.catalog.rows_by_id.get(ride_id)
+        return row is not None and row < self.size
+
+    def ride_record(self, ride_id):
+        # One ride as an /api/rides row, or None; a single id lookup
+        row = self.catalog.rows_by_id.get(ride_id)
+        if row is None or row >= self.size:
+            return None
+        ride = self.catalog.ride(row)
+        return {field: getattr(ride, field) for field in RIDE_FIELDS}
+
+    def column(self, name):
+        return self.catalog.columns[name][:self.size]
+
+    def ride_costs(self, is_vip):
+        # Minutes each ride takes: duration plus queue time, halved for VIP guests on VIP-access rides
+        costs = self._costs.get(is_vip)
+        if costs is None:
+            queue_time = self.column('queue_time')
+            if is_vip:
+                queue_time = np.where(self.column('vip_access'), queue_time // 2, queue_time)
+            costs = self._costs[is_vip] = (queue_time + self.column('duration')).astype(np.int64)
+        return costs
+
+    def listing(self, ride_type=None):
+        # /api/rides rows for this snapshot, optionally for one ride type; built on first use, then reused
+        listing = self._listing
+        if listing is None:
+            listing = {None: [dict(zip(RIDE_FIELDS, row)) for row in self.live_rows()]}
+            self._listing = listing
+        if ride_type not in listing:
+            listing[ride_type] = [row for row in listing[None] if row['type'] == ride_type]
+        return listing[ride_type]
+
+    def listing_position(self, ride_id, ride_type=None):
+        # Position of a ride in listing(ride_type), or None if it is not listed there
+        row = self.catalog.rows_by_id.get(ride_id)
+        if row is None or row >= self.size:
+            return None
+        rows = self._listing_rows.get(ride_type)
+        if rows is None:
+            listed = np.ones(self.size, dtype=bool)
+            listed[list(self.dead)] = False
+            if ride_type is not None:
+                listed &= self.column('type') == RIDE_TYPE_CODES[ride_type]
+            rows = self._listing_rows[ride_type] = np.flatnonzero(listed)
+        position = int(np.searchsorted(rows, row))
+        return position if position < len(rows) and rows[position] == row else None
+
+    def _catalog_for_append(self):
+        # Appends go to the shared catalog when this snapshot is its tip, otherwise to a private copy
+        if not self.catalog.read_only and self.catalog.size == self.size and len(self.catalog.ids) == self.size:
+            return self.catalog
+        return self.catalog.fork(self.size)
+
+    def with_rides(self, rows):
+        # Copy-on-write append of many rides; the index is extended by the new block
+        catalog = self._catalog_for_append()
+        catalog.append(rows)
+        index = self.eligibility_index.copy()
+        index.extend(catalog.columns, catalog.size)
+        return CatalogSnapshot(self.version + 1, catalog, catalog.size, index, queue_curves=self.queue_curves,
+                               layout=self.layout, dead=self.dead)
+
+    def with_ride(self, ride):
+        # Copy-on-write append: returns the next snapshot with `ride` added at the end
+        catalog = self._catalog_for_append()
+        catalog.append([[getattr(ride, field) for field in RIDE_FIELDS]])
+        index = self.eligibility_index.copy()
+        index.add(self.size, ride)
+        return CatalogSnapshot(self.version + 1, catalog, catalog.size, index, queue_curves=self.queue_curves,
+                               layout=self.layout, dead=self.dead)
+
+    def with_ride_changes(self, upserts=(), deletes=()):
+        # Copy-on-write update and removal of rides by id: changed rows are tombstoned and the new values appended
+        upserts = list({row[0]: row for row in upserts}.values())
+        deletes = set(deletes)
+        catalog = self._catalog_for_append()
+        removed = {}
+        for ride_id in list(deletes) + [row[0] for row in upserts]:
+            row = catalog.rows_by_id.get(ride_id)
+            if row is not None and row < self.size and row not in self.dead:
+                removed[ride_id] = row
+        if removed:
+            # Updated and removed rides leave this snapshot's id mapping untouched (see RowIndex)
+            catalog = catalog.with_rows_by_id(catalog.rows_by_id.without(removed))
+        removed = set(removed.values())
+        dead = self.dead.with_rows(removed)
+        queue_curves, layout = self.queue_curves, self.layout
+        if any(ride_id in queue_curves for ride_id in deletes):
+            queue_curves = {ride_id: curve for ride_id, curve in queue_curves.items() if ride_id not in deletes}
+        if any(ride_id in layout.ride_locations for ride_id in deletes):
+            layout = layout.without_rides(deletes)
+        if len(dead) > CATALOG_COMPACT_RATIO * (self.size + len(upserts)):
+            rows = catalog.rows(self.size, dead) + [list(row) for row in upserts]
+            return CatalogSnapshot.from_rows(self.version + 1, rows, queue_curves, layout)
+        catalog.append(upserts)
+        index = self.eligibility_index.copy()
+        index.remove_rows(removed)
+        if len(upserts) <= CATALOG_INCREMENTAL_INDEX_MAX:
+            for position, values in enumerate(upserts):
+                index.add(self.size + position, Ride(*values))
+        else:
+            index.extend(catalog.columns, catalog.size)
+        return CatalogSnapshot(self.version + 1, catalog, catalog.size, index, queue_curves=queue_curves,
+                               layout=layout, dead=dead)
+
+    def with_queue_times(self, rows, queue_times, version=None):
+        # Copy-on-write update of the queue times at catalog `rows`; the eligibility index carries over
+        base = self.catalog if self.catalog.read_only else self._catalog_for_append()
+        queue_time = base.columns['queue_time'].copy()
+        queue_time[rows] = queue_times
+        version = self.version + 1 if version is None else version
+        return CatalogSnapshot(version, base.with_columns(queue_time=queue_time), self.size,
+                               self.eligibility_index, self.plan_version, self.queue_curves, self.layout, self.dead)
+
+    def with_queue_curves(self, queue_curves):
+        # Same rides with a new set of queue curves; a new plan_version, since every timed plan may change
+        return CatalogSnapshot(self.version + 1, self.catalog, self.size, self.eligibility_index,
+                               queue_curves=queue_curves, layout=self.layout, dead=self.dead)
+
+    def with_layout(self, layout):
+        # Same rides on a new park layout; a new plan_version, since every route may change
+        return CatalogSnapshot(self.version + 1, self.catalog, self.size, self.eligibility_index,
+                               queue_curves=self.queue_curves, layout=layout, dead=self.dead)
+
+    def queue_table(self, rows, is_vip):
+        # Queue minutes per slot of the day for catalog `rows`: (len(rows), QUEUE_SLOTS_PER_DAY) int64
+        table = np.outer(self.column('queue_time')[rows].astype(np.int64), DEFAULT_QUEUE_PROFILE) // 100
+        if self.queue_curves:
+            ids = self.catalog.ids
+            for position, row in enumerate(rows.tolist()):
+                curve = self.queue_curves.get(ids[row])
+                if curve is not None:
+                    table[position] = curve
+        if is_vip:
+            vip = self.column('vip_access')[rows]
+            table[vip] //= 2
+        return table
+
+EMPTY_LAYOUT = ParkLayout.empty()
+
+# Mapped Columns
+class SharedStrings:
+    # Read-only sequence of strings stored as int64 offsets into a UTF-8 blob, both mapped from a segment
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    @staticmethod
+    def pack(strings):
+        encoded = [value.encode('utf-8') for value in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self[position] for position in range(*item.indices(len(self)))]
+        if item < 0:
+            item += len(self)
+        return self.blob[self.offsets[item]:self.offsets[item + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+class AppendedStrings:
+    # A mapped segment's SharedStrings followed by appended strings (see RideCatalog.fork)
+    __slots__ = ('base', 'extra')
+
+    def __init__(self, base, extra=None):
+        self.base = base
+        self.extra = [] if extra is None else extra
+
+    def pack(self):
+        # Offsets and blob as in SharedStrings.pack; only the appended strings are encoded
+        offsets, blob = SharedStrings.pack(self.extra)
+        return (np.concatenate([self.base.offsets, offsets[1:] + self.base.offsets[-1]]),
+                np.concatenate([self.base.blob, blob]))
+
+    def extend(self, values):
+        self.extra.extend(values)
+
+    def __len__(self):
+        return len(self.base) + len(self.extra)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if start == 0 and step == 1 and stop >= len(self.base):
+                return AppendedStrings(self.base, self.extra[:stop - len(self.base)])
+            return [self[position] for position in range(start, stop, step)]
+        if item < 0:
+            item += len(self)
+        return self.base[item] if item < len(self.base) else self.extra[item - len(self.base)]
+
+    def __iter__(self):
+        return itertools.chain(self.base, self.extra)
+
+class SharedIdIndex:
+    # Read-only ride_id -> row mapping over a segment's sorted fixed-width id keys (binary search)
+    def __init__(self, keys, rows):
+        self.keys = keys
+        self.rows = rows
+
+    @staticmethod
+    def pack(ids, dead=frozenset()):
+        # Tombstoned rows are left out, so an updated ride's id maps only to its live row
+        rows = np.array([row for row in range(len(ids)) if row not in dead] if dead else range(len(ids)), dtype=np.int64)
+        keys = np.array([ids[row].encode('utf-8') for row in rows.tolist()], dtype=bytes)
+        if not len(keys):
+            keys = keys.astype('S1')
+        order = np.argsort(keys, kind='stable')
+        return keys[order], rows[order]
+
+    def get(self, ride_id, default=None):
+        key = ride_id.encode('utf-8') if isinstance(ride_id, str) else ride_id
+        if len(key) > self.keys.dtype.itemsize or not len(self.keys):
+            return default
+        position = int(np.searchsorted(self.keys, key))
+        if position < len(self.keys) and self.keys[position] == key:
+            return int(self.rows[position])
+        return default
+
+    def __contains__(self, ride_id):
+        return self.get(ride_id) is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def items(self):
+        return ((key.decode('utf-8'), row) for key, row in zip(self.keys.tolist(), self.rows.tolist()))
+
+    def merged(self, changes, size):
+        # Sorted keys and rows for the next segment: this index with `changes` ({ride_id: row or None}) applied
+        if not changes:
+            return self.keys, self.rows
+        changed = np.array(sorted(ride_id.encode('utf-8') for ride_id in changes), dtype=bytes)
+        dtype = 'S%d' % max(self.keys.dtype.itemsize, changed.dtype.itemsize)
+        keys, changed = self.keys.astype(dtype), changed.astype(dtype)
+        positions = np.searchsorted(keys, changed)
+        found = positions < len(keys)
+        found[found] = keys[positions[found]] == changed[found]
+        keys, rows = np.delete(keys, positions[found]), np.delete(self.rows, positions[found])
+        added = sorted((ride_id.encode('utf-8'), row) for ride_id, row in changes.items()
+                       if row is not None and row < size)
+        if added:
+            added_keys = np.array([key for key, _ in added], dtype=dtype)
+            positions = np.searchsorted(keys, added_keys)
+            keys = np.insert(keys, positions, added_keys)
+            rows = np.insert(rows, positions, np.array([row for _, row in added], dtype=np.int64))
+        return keys, rows
@@ -0,0 +1,189 @@
+"""The ride change log: every ride write adds a ride_changes row, which other processes poll and apply."""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from mysql.connector import Error
+from catalog import RIDE_FIELDS, RIDE_TABLES, RIDE_COLUMNS
+
+# Catalog Change Configuration
+CATALOG_CHANGE_POLL_INTERVAL = float(os.environ.get('CATALOG_CHANGE_POLL_INTERVAL', 2))  # seconds; 0 disables polling
+CATALOG_CHANGE_BATCH = int(os.environ.get('CATALOG_CHANGE_BATCH', 5000))  # change-log rows read per poll
+# Seconds a skipped seq is re-read: its transaction may commit late, or may have rolled back
+CATALOG_CHANGE_GAP_TIMEOUT = float(os.environ.get('CATALOG_CHANGE_GAP_TIMEOUT', 60))
+CATALOG_CHANGE_RETENTION = float(os.environ.get('CATALOG_CHANGE_RETENTION', 86400))  # seconds log rows are kept
+CATALOG_CHANGE_PRUNE_INTERVAL = float(os.environ.get('CATALOG_CHANGE_PRUNE_INTERVAL', 300))  # seconds between prunes
+
+catalog_log = logging.getLogger('thrill_safari.catalog')
+
+
+class RideChangeLog:
+    # Change-log reader mixed into ParkModel; uses its db, snapshot, _writing() and _schedule_catalog_save()
+    def _init_change_log(self):
+        self.change_seq = 0  # highest ride_changes seq the catalog reflects
+        self.change_gaps = {}  # seqs below change_seq not seen yet -> monotonic time they were first missed
+        self.change_stats = {'polls': 0, 'rides_changed': 0, 'last_poll_ms': 0.0, 'last_change_at': None,
+                             'late_changes': 0, 'gaps_expired': 0, 'pruned': 0}
+        self._change_lock = threading.Lock()  # one change-log reader at a time (poller, restriction updates)
+        self._change_thread = None
+        self._last_prune = time.monotonic()
+
+    def _change_log_position(self):
+        # (latest seq, missing seqs just below it); the missing ones are tracked as gaps and read again later
+        try:
+            latest = self.db.fetchone("SELECT COALESCE(MAX(seq), 0) FROM ride_changes")[0]
+            low = max(0, latest - CATALOG_CHANGE_BATCH)
+            seen = {seq for seq, in self.db.fetchall("SELECT seq FROM ride_changes WHERE seq > %s", (low,))}
+            return latest, [seq for seq in range(low + 1, latest) if seq not in seen]
+        except Error as e:
+            catalog_log.warning("Ride change log unavailable (%s); edits made outside this process need a restart.", e)
+            return 0, []
+
+    def _advance_change_log(self, change_seq, change_gaps):
+        # Moves the log position up to one read by _change_log_position before a full catalog load
+        with self._change_lock:
+            if change_seq > self.change_seq:
+                self.change_seq = change_seq
+                now = time.monotonic()
+                for seq in change_gaps:
+                    self.change_gaps.setdefault(seq, now)
+
+    def apply_ride_changes(self):
+        # Re-reads the rides logged since change_seq and publishes them as one snapshot; returns the rides changed
+        if not self.db:
+            return 0
+        with self._change_lock:
+            return self._apply_ride_changes()
+
+    def _read_change_log(self):
+        # Log rows past change_seq plus any that filled a gap; seqs are handed out at insert time, not commit time
+        changes = self.db.fetchall("SELECT seq, ride_id FROM ride_changes WHERE seq > %s ORDER BY seq LIMIT %s",
+                                   (self.change_seq, CATALOG_CHANGE_BATCH))
+        now = time.monotonic()
+        late = []
+        if self.change_gaps:
+            expired = [seq for seq, missed_at in self.change_gaps.items() if now - missed_at > CATALOG_CHANGE_GAP_TIMEOUT]
+            for seq in expired:
+                del self.change_gaps[seq]
+            self.change_stats['gaps_expired'] += len(expired)
+            gaps = sorted(self.change_gaps)
+            for offset in range(0, len(gaps), 500):
+                chunk = gaps[offset:offset + 500]
+                late.extend(self.db.fetchall(
+                    f"SELECT seq, ride_id FROM ride_changes WHERE seq IN ({', '.join(['%s'] * len(chunk))})",
+                    tuple(chunk)))
+            for seq, _ in late:
+                del self.change_gaps[seq]
+            self.change_stats['late_changes'] += len(late)
+        expected = self.change_seq + 1
+        for seq, _ in changes:
+            for missing in range(expected, seq):
+                self.change_gaps[missing] = now
+            expected = seq + 1
+        return late + changes
+
+    def _apply_ride_changes(self):
+        started = time.perf_counter()
+        changes = self._read_change_log()
+        self.change_stats['polls'] += 1
+        if not changes:
+            self.change_stats['last_poll_ms'] = round((time.perf_counter() - started) * 1000, 3)
+            return 0
+        ride_ids = list(dict.fromkeys(ride_id for _, ride_id in changes))
+        current = {}
+        for offset in range(0, len(ride_ids), 500):
+            chunk = ride_ids[offset:offset + 500]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            select_query = " UNION ALL ".join(
+                f"SELECT {', '.join(RIDE_COLUMNS)}, '{ride_type}' FROM {table_name} WHERE id IN ({placeholders})"
+                for ride_type, table_name in RIDE_TABLES.items())
+            for row in self.db.fetchall(select_query, tuple(chunk) * len(RIDE_TABLES)):
+                current[row[0]] = row[:10] + (row[14],) + row[10:14]
+
+        queue_position = RIDE_FIELDS.index('queue_time')
+        with self._writing():
+            snapshot = self.snapshot
+            upserts, deletes = [], []
+            for ride_id in ride_ids:
+                values = current.get(ride_id)
+                known = snapshot.has_ride(ride_id)
+                if values is None:
+                    if known:
+                        deletes.append(ride_id)
+                    continue
+                if known:
+                    # The live feed owns queue times, so the catalog's value is kept
+                    ride = snapshot.catalog.ride(snapshot.catalog.rows_by_id.get(ride_id))
+                    values = values[:queue_position] + (ride.queue_time,) + values[queue_position + 1:]
+                    if tuple(getattr(ride, field) for field in RIDE_FIELDS) == values:
+                        continue  # written by this worker, or already applied through the shared catalog
+                upserts.append(values)
+            if upserts or deletes:
+                self.snapshot = snapshot.with_ride_changes(upserts, deletes)
+            self.change_seq = max(self.change_seq, max(seq for seq, _ in changes))
+        changed = len(upserts) + len(deletes)
+        self.change_stats['rides_changed'] += changed
+        self.change_stats['last_poll_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        if changed:
+            self.change_stats['last_change_at'] = datetime.utcnow().isoformat(timespec='seconds')
+            self._schedule_catalog_save()
+            catalog_log.info("Applied %d ride changes from the change log (%d updated, %d removed) in %s ms.",
+                             changed, len(upserts), len(deletes), self.change_stats['last_poll_ms'])
+        return changed
+
+    def _start_change_poller(self):
+        if CATALOG_CHANGE_POLL_INTERVAL <= 0 or not self.db:
+            return
+        if self._change_thread is None or not self._change_thread.is_alive():
+            self._change_thread = threading.Thread(target=self._poll_ride_changes, name='ride-change-poller',
+                                                   daemon=True)
+            self._change_thread.start()
+
+    def prune_ride_changes(self):
+        # Deletes applied log rows past CATALOG_CHANGE_RETENTION; reloads if another process pruned unread ones
+        if not self.db:
+            return 0
+        with self._change_lock:
+            oldest, latest = self.db.fetchone("SELECT MIN(seq), MAX(seq) FROM ride_changes")
+            if oldest is not None and oldest > self.change_seq + 1:
+                catalog_log.warning("Ride change log was pruned past position %d; reloading the catalog.",
+                                    self.change_seq)
+                self.change_gaps.clear()
+                reload = True
+            else:
+                reload = False
+                # The newest row is always kept, so a process that fell behind can tell that rows were pruned
+                safe = min([self.change_seq, (latest or 0) - 1] + [seq - 1 for seq in self.change_gaps])
+                cutoff = (f"datetime('now', '-{int(CATALOG_CHANGE_RETENTION)} seconds')" if self.db.backend == 'sqlite'
+                          else f"NOW() - INTERVAL {int(CATALOG_CHANGE_RETENTION)} SECOND")
+                with self.db.transaction() as tx:
+                    pruned = tx.execute(f"DELETE FROM ride_changes WHERE seq <= %s AND changed_at < {cutoff}",
+                                        (safe,)).rowcount
+                self.change_stats['pruned'] += pruned
+        if reload:
+            self.load_rides_from_db()
+            return 0
+        return pruned
+
+    def _poll_ride_changes(self):
+        # Polls every CATALOG_CHANGE_POLL_INTERVAL seconds, straight away after a full batch, and prunes now and then
+        while True:
+            try:
+                applied_from = self.change_seq
+                self.apply_ride_changes()
+                if time.monotonic() - self._last_prune > CATALOG_CHANGE_PRUNE_INTERVAL:
+                    self._last_prune = time.monotonic()
+                    self.prune_ride_changes()
+                if self.change_seq - applied_from < CATALOG_CHANGE_BATCH:
+                    time.sleep(CATALOG_CHANGE_POLL_INTERVAL)
+            except Error as e:
+                catalog_log.warning("Polling the ride change log failed: %s", e)
+                time.sleep(CATALOG_CHANGE_POLL_INTERVAL)
+            except Exception as e:
+                catalog_log.exception("Applying ride changes failed: %s", e)
+                time.sleep(CATALOG_CHANGE_POLL_INTERVAL)
+
+    def change_log_stats(self):
+        return {'applied_seq': self.change_seq, 'open_gaps': len(self.change_gaps), **self.change_stats}
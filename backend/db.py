@@ -0,0 +1,269 @@
+"""Pooled database access: MySQL, or SQLite as a local stand-in (DB_BACKEND=sqlite)."""
+
+import os
+import time
+import queue
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import IntegrityError, PoolError
+from metrics import metrics
+
+# DB Configuration
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'database': os.environ.get('DB_NAME', 'theme_park_db'),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', 'sql##123'),
+    'port': int(os.environ.get('DB_PORT', 3306))
+}
+
+# DB Pool Configuration
+DB_BACKEND = os.environ.get('DB_BACKEND', 'mysql').lower()  # 'mysql', or 'sqlite' as a local stand-in
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'theme_park.db')  # ':memory:' gives a shared in-memory database
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))  # seconds to wait for a free connection
+DB_POOL_PING_INTERVAL = float(os.environ.get('DB_POOL_PING_INTERVAL', 30))  # ping connections idle longer than this
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', 200))
+
+db_log = logging.getLogger('thrill_safari.db')
+db_query_seconds = metrics.histogram(
+    'thrill_safari_db_query_duration_seconds', 'Database statement latency by statement type.', ('operation',))
+
+class ConnectionPool:
+    # Fixed-size pool of lazily opened connections; ones idle longer than `ping_interval` are pinged before reuse
+    def __init__(self, connect, ping, size, checkout_timeout, ping_interval):
+        self._connect = connect
+        self._ping = ping
+        self.size = size
+        self.checkout_timeout = checkout_timeout
+        self.ping_interval = ping_interval
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()  # (connection, last_used); LIFO keeps the warmest connections busy
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reconnects = 0
+        self.checkout_timeouts = 0
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.checkout_timeout):
+            with self._lock:
+                self.checkout_timeouts += 1
+            raise PoolError(msg=f"No database connection free after {self.checkout_timeout}s (pool size {self.size}).")
+        try:
+            try:
+                connection, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+            if time.monotonic() - last_used > self.ping_interval and not self._ping(connection):
+                self._discard(connection)
+                with self._lock:
+                    self.reconnects += 1
+                return self._open()
+            return connection
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, connection, broken=False):
+        if broken:
+            # The next checkout opens a replacement
+            self._discard(connection)
+            with self._lock:
+                self.reconnects += 1
+        else:
+            self._idle.put((connection, time.monotonic()))
+        self._slots.release()
+
+    def _open(self):
+        connection = self._connect()
+        with self._lock:
+            self.opened += 1
+        return connection
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(connection)
+
+class Transaction:
+    # Cursor wrapper handed out by Database.transaction(); queries use %s placeholders on every backend
+    def __init__(self, database, cursor, connection):
+        self._database = database
+        self._cursor = cursor
+        self._connection = connection
+
+    def execute(self, query, params=()):
+        self._database._timed(self._cursor.execute, query, params)
+        return self._cursor
+
+    def executemany(self, query, seq_params):
+        self._database._timed(self._cursor.executemany, query, seq_params)
+        return self._cursor
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def commit(self):
+        # Commits what ran so far; the transaction carries on with the same connection
+        self._connection.commit()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def backend(self):
+        return self._database.backend
+
+class Database:
+    # Timed, pooled queries over MySQL or SQLite; SQLite errors are re-raised as mysql.connector errors
+    def __init__(self, backend=DB_BACKEND, pool_size=DB_POOL_SIZE, checkout_timeout=DB_POOL_TIMEOUT,
+                 ping_interval=DB_POOL_PING_INTERVAL):
+        if backend not in ['mysql', 'sqlite']:
+            raise ValueError(f"Unsupported DB_BACKEND '{backend}'. Must be 'mysql' or 'sqlite'.")
+        self.backend = backend
+        self.pool = ConnectionPool(self._connect, self._ping, pool_size, checkout_timeout, ping_interval)
+        self._stats_lock = threading.Lock()
+        self.query_count = 0
+        self.query_time_ms = 0.0
+        self.slowest_query_ms = 0.0
+        self.slow_queries = 0
+
+    def _connect(self):
+        if self.backend == 'sqlite':
+            try:
+                if SQLITE_PATH == ':memory:':
+                    # Named shared-cache database so every pooled connection sees the same data
+                    return sqlite3.connect('file:thrill_safari?mode=memory&cache=shared', uri=True,
+                                           check_same_thread=False)
+                return sqlite3.connect(SQLITE_PATH, check_same_thread=False)
+            except sqlite3.Error as e:
+                raise Error(msg=str(e)) from e
+        return mysql.connector.connect(**DB_CONFIG)
+
+    def _ping(self, connection):
+        try:
+            if self.backend == 'sqlite':
+                connection.execute("SELECT 1")
+            else:
+                # No reconnect in place: the pool replaces dead connections and counts them
+                connection.ping(reconnect=False)
+            return True
+        except (Error, sqlite3.Error):
+            return False
+
+    def _timed(self, run, query, params):
+        if self.backend == 'sqlite':
+            query = query.replace('%s', '?')
+        started = time.perf_counter()
+        try:
+            run(query, params)
+        except sqlite3.IntegrityError as e:
+            raise IntegrityError(msg=str(e)) from e
+        except sqlite3.Error as e:
+            raise Error(msg=str(e)) from e
+        finally:
+            elapsed = time.perf_counter() - started
+            elapsed_ms = elapsed * 1000
+            db_query_seconds.observe(elapsed, (query.split(None, 1)[0].lower(),))
+            with self._stats_lock:
+                self.query_count += 1
+                self.query_time_ms += elapsed_ms
+                self.slowest_query_ms = max(self.slowest_query_ms, elapsed_ms)
+                if elapsed_ms > DB_SLOW_QUERY_MS:
+                    self.slow_queries += 1
+            if elapsed_ms > DB_SLOW_QUERY_MS:
+                db_log.warning("Slow query (%.1f ms): %s", elapsed_ms, ' '.join(query.split())[:120],
+                               extra={'fields': {'elapsed_ms': round(elapsed_ms, 3)}})
+
+    @contextmanager
+    def transaction(self):
+        # Checks out a connection and yields a Transaction; commits on success, rolls back on error
+        connection = self.pool.acquire()
+        broken = False
+        cursor = None
+        try:
+            try:
+                cursor = connection.cursor()
+            except sqlite3.Error as e:
+                raise Error(msg=str(e)) from e
+            yield Transaction(self, cursor, connection)
+            connection.commit()
+        except BaseException as e:
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+            if isinstance(e, (Error, sqlite3.Error)) and (broken or not self._ping(connection)):
+                broken = True
+                e.connection_lost = True  # see _read
+            raise
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    broken = True
+            self.pool.release(connection, broken)
+
+    def _read(self, query, params, fetch):
+        # A read that failed on a connection found dead is retried once on a fresh connection
+        try:
+            with self.transaction() as tx:
+                return fetch(tx.execute(query, params))
+        except Error as e:
+            if not getattr(e, 'connection_lost', False):
+                raise
+            db_log.warning("Database connection lost (%s); retrying the read on a new connection.", e)
+        with self.transaction() as tx:
+            return fetch(tx.execute(query, params))
+
+    def fetchall(self, query, params=()):
+        return self._read(query, params, lambda cursor: cursor.fetchall())
+
+    def fetchone(self, query, params=()):
+        return self._read(query, params, lambda cursor: cursor.fetchone())
+
+    def execute(self, query, params=()):
+        with self.transaction() as tx:
+            return tx.execute(query, params).rowcount
+
+    def ping(self):
+        try:
+            self.fetchone("SELECT 1")
+            return True
+        except Error:
+            return False
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'backend': self.backend,
+                'pool_size': self.pool.size,
+                'connections_opened': self.pool.opened,
+                'reconnects': self.pool.reconnects,
+                'checkout_timeouts': self.pool.checkout_timeouts,
+                'queries': self.query_count,
+                'avg_query_ms': round(self.query_time_ms / self.query_count, 3) if self.query_count else 0.0,
+                'slowest_query_ms': round(self.slowest_query_ms, 3),
+                'slow_queries': self.slow_queries
+            }
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,183 @@
+"""Live queue times: updates are coalesced per ride, applied as catalog snapshots and saved in batches."""
+
+import os
+import time
+import atexit
+import logging
+import threading
+import numpy as np
+from mysql.connector import Error
+from catalog import RIDE_TABLES, RIDE_TYPES
+
+# Live Queue Feed Configuration
+QUEUE_APPLY_INTERVAL = float(os.environ.get('QUEUE_APPLY_INTERVAL', 1))  # seconds between applying coalesced updates
+QUEUE_PERSIST_INTERVAL = float(os.environ.get('QUEUE_PERSIST_INTERVAL', 15))  # seconds between batched DB writes
+
+db_log = logging.getLogger('thrill_safari.db')
+catalog_log = logging.getLogger('thrill_safari.catalog')
+
+
+class LiveQueueFeed:
+    # Coalesces live queue times per ride; applied as one snapshot every apply_interval, saved every persist_interval
+    def __init__(self, model, cache, apply_interval, persist_interval):
+        self.model = model
+        self.cache = cache
+        model.queue_time_listeners.append(self.invalidate)
+        model.reload_listeners.append(self.reapply_unsaved)
+        self.apply_interval = apply_interval
+        self.persist_interval = persist_interval
+        self._pending = {}  # ride_id -> newest queue time not yet in the catalog
+        self._unsaved = {}  # ride_id -> queue time in the catalog but not yet in the database
+        self._last_timestamp = {}  # ride_id -> timestamp of the newest accepted update
+        self._lock = threading.Lock()
+        self._thread = None
+        self.received = 0
+        self.stale = 0
+        self.applied = 0
+        self.batches = 0
+        self.persisted = 0
+        self.persist_failures = 0
+        self.plans_invalidated = 0
+        self.last_apply_ms = 0.0
+
+    def record(self, updates):
+        # Queues validated (ride_id, queue_time, timestamp) updates, dropping stale ones; returns (accepted, stale)
+        accepted = stale = 0
+        with self._lock:
+            for ride_id, queue_time, timestamp in updates:
+                if timestamp < self._last_timestamp.get(ride_id, 0):
+                    stale += 1
+                    continue
+                self._last_timestamp[ride_id] = timestamp
+                self._pending[ride_id] = queue_time
+                accepted += 1
+            self.received += accepted + stale
+            self.stale += stale
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='queue-feed', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+        return accepted, stale
+
+    def _run(self):
+        last_persist = time.monotonic()
+        while True:
+            time.sleep(self.apply_interval)
+            try:
+                self.apply_pending()
+                if time.monotonic() - last_persist >= self.persist_interval:
+                    last_persist = time.monotonic()
+                    self.persist_pending()
+            except Exception as e:
+                catalog_log.exception("Applying live queue times failed: %s", e)
+
+    def apply_pending(self):
+        # Publishes every pending update as one snapshot and invalidates the affected plans; returns rides changed
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        started = time.perf_counter()
+        with self.model._writing():
+            snapshot = self.model.snapshot
+            rows_by_id = snapshot.catalog.rows_by_id
+            rows, queue_times = [], []
+            for ride_id, queue_time in pending.items():
+                row = rows_by_id.get(ride_id)
+                if row is not None and row < snapshot.size:
+                    rows.append(row)
+                    queue_times.append(queue_time)
+            rows = np.array(rows, dtype=np.int64)
+            queue_times = np.array(queue_times, dtype=np.int32)
+            previous = snapshot.column('queue_time')[rows]
+            changed = previous != queue_times
+            rows, queue_times, previous = rows[changed], queue_times[changed], previous[changed]
+            if not len(rows):
+                return 0
+            # Queue times do not rewrite the catalog file; a warm start reconciles with the database anyway
+            self.model.apply_queue_times(rows, queue_times)
+        changed_ids = {snapshot.catalog.ids[row] for row in rows.tolist()}
+        with self._lock:
+            self._unsaved.update((ride_id, pending[ride_id]) for ride_id in changed_ids)
+        invalidated = self.invalidate(snapshot, rows, queue_times, previous)
+        self.applied += len(rows)
+        self.batches += 1
+        self.last_apply_ms = round((time.perf_counter() - started) * 1000, 3)
+        if catalog_log.isEnabledFor(logging.DEBUG):
+            catalog_log.debug("Applied %d live queue times; %d cached plans invalidated.", len(rows), invalidated)
+        return len(rows)
+
+    def reapply_unsaved(self):
+        # Re-applies queue times the reloaded catalog lacks because they were not persisted yet
+        with self._lock:
+            for ride_id, queue_time in self._unsaved.items():
+                self._pending.setdefault(ride_id, queue_time)
+        return self.apply_pending()
+
+    def invalidate(self, snapshot, rows, queue_times, previous):
+        # Drops cached plans that use a changed ride, or whose profile a ride with a shorter queue is eligible for
+        changed_ids = {snapshot.catalog.ids[row] for row in rows.tolist()}
+        shorter = 0
+        for row in rows[queue_times < previous].tolist():
+            shorter |= 1 << row
+        index = snapshot.eligibility_index
+
+        def affected(tag):
+            kind, value = tag
+            if kind == 'ride':
+                return value in changed_ids
+            return kind == 'eligibility' and bool(shorter and index.eligible(*value) & shorter)
+
+        invalidated = self.cache.invalidate(affected)
+        self.plans_invalidated += invalidated
+        return invalidated
+
+    def persist_pending(self):
+        # Writes the applied queue times to their ride tables in one transaction; returns rides written
+        with self._lock:
+            unsaved, self._unsaved = self._unsaved, {}
+        if not unsaved:
+            return 0
+        snapshot = self.model.snapshot
+        types = snapshot.column('type')
+        params_by_table = {}
+        for ride_id, queue_time in unsaved.items():
+            row = snapshot.catalog.rows_by_id.get(ride_id)
+            if row is not None and row < snapshot.size:
+                params_by_table.setdefault(RIDE_TABLES[RIDE_TYPES[types[row]]], []).append((queue_time, ride_id))
+        try:
+            if self.model.db is None:
+                raise Error(msg="Database connection not available.")
+            with self.model.db.transaction() as tx:
+                for table_name, params in params_by_table.items():
+                    tx.executemany(f"UPDATE {table_name} SET queue_time = %s WHERE id = %s", params)
+        except Error as e:
+            # Retried next round, unless a newer value has been applied in the meantime
+            with self._lock:
+                for ride_id, queue_time in unsaved.items():
+                    self._unsaved.setdefault(ride_id, queue_time)
+            self.persist_failures += 1
+            db_log.warning("Could not persist %d live queue times: %s", len(unsaved), e)
+            return 0
+        self.persisted += len(unsaved)
+        return len(unsaved)
+
+    def flush(self):
+        # Applies and persists everything outstanding right away (shutdown, simulator, tests)
+        self.apply_pending()
+        return self.persist_pending()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'received': self.received,
+                'stale': self.stale,
+                'pending': len(self._pending),
+                'applied': self.applied,
+                'batches': self.batches,
+                'unsaved': len(self._unsaved),
+                'persisted': self.persisted,
+                'persist_failures': self.persist_failures,
+                'plans_invalidated': self.plans_invalidated,
+                'last_apply_ms': self.last_apply_ms
+            }
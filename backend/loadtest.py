@@ -0,0 +1,353 @@
+"""Load test and traffic replay for the planner API.
+
+Sends a mix of /api/generate_plan, /api/rides and /api/login requests at a target rate from a pool of
+concurrent clients, then reports throughput, p50/p95/p99 latency and error rates per endpoint. Guests
+are drawn from age, weight, VIP, weather, preference, engine and time-budget distributions (see
+DEFAULT_MIX, overridable with --mix-file), or a recorded request log is replayed with --replay.
+
+    python loadtest.py --in-process --rate 200 --concurrency 8 --duration 30
+    python loadtest.py --in-process --db sqlite --catalog-size 10000 --output peak.json
+    python loadtest.py --url http://localhost:5000 --rate 500 --concurrency 32 --compare peak.json
+    python loadtest.py --in-process --record day.ndjson --duration 60     # keep the requests sent...
+    python loadtest.py --url http://staging:5000 --replay day.ndjson      # ...and send the same ones later
+
+--in-process drives the app through the Flask test client, on an in-memory SQLite stand-in by default
+(--db sqlite for a SQLite file, --db mysql for the DB_* settings). --catalog-size replaces its catalog
+with a synthetic one (bench.generate_catalog). With --url the server's own database is used.
+A --rate of 0 sends as fast as the clients can. With a rate, latency is measured from the moment each request
+was scheduled to go out, not from when a free client got to it. Otherwise a slow server would hold back the
+senders and hide its own queueing (coordinated omission). The time spent in the server alone is reported as
+service time. If the clients fall behind the schedule, the run reports the achieved rate against the target
+and warns, or fails with exit status 2 under --fail-behind. Recorded logs hold one {"method", "path", "body"}
+object per request sent."""
+
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import threading
+import http.client
+import urllib.parse
+from datetime import datetime
+
+# Request Mix
+# Guest groups are (share, ages, weights); the other tables map a value to its share of plan requests
+DEFAULT_MIX = {
+    'endpoints': {'generate_plan': 0.72, 'rides': 0.26, 'login': 0.02},
+    'guests': [[0.25, [4, 12], [15, 45]], [0.6, [13, 40], [45, 100]], [0.15, [41, 75], [55, 110]]],
+    'vip_rate': 0.15,
+    'bad_weather_rate': 0.2,
+    'preferences': {'': 0.55, 'dry_only': 0.15, 'wet_only': 0.1, 'dry_first': 0.2},
+    'engines': {'heap': 0.8, 'knapsack': 0.2},
+    'total_time': [60, 600],  # minutes, drawn in half-hour steps
+    'rides_paths': ['/api/rides?limit=100', '/api/rides?limit=100&type=water', '/api/rides?limit=100&type=kids',
+                    '/api/rides?limit=50&fields=id,name,thrill,queue_time']
+}
+PERCENTILES = (50, 95, 99)
+BEHIND_RATE = 0.95  # an achieved rate below this share of the target means the clients fell behind
+
+def load_mix(path):
+    # DEFAULT_MIX with the tables from `path` (JSON) replaced
+    mix = dict(DEFAULT_MIX)
+    if path:
+        with open(path) as mix_file:
+            overrides = json.load(mix_file)
+        unknown = set(overrides) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown mix key(s): {', '.join(sorted(unknown))}")
+        mix.update(overrides)
+    return mix
+
+def _pick(rng, shares):
+    # A key of `shares` ({value: share}) drawn in proportion to its share
+    values = list(shares)
+    return rng.choices(values, weights=[shares[value] for value in values])[0]
+
+def synthetic_requests(mix, seed, staff_id, password):
+    # Endless (method, path, body) stream drawn from `mix`
+    rng = random.Random(seed)
+    groups = mix['guests']
+    low, high = mix['total_time']
+    while True:
+        endpoint = _pick(rng, mix['endpoints'])
+        if endpoint == 'rides':
+            yield 'GET', rng.choice(mix['rides_paths']), None
+        elif endpoint == 'login':
+            yield 'POST', '/api/login', {'staff_id': staff_id, 'password': password}
+        else:
+            _, ages, weights = rng.choices(groups, weights=[group[0] for group in groups])[0]
+            yield 'POST', '/api/generate_plan', {
+                'total_time': rng.randrange(low, high + 1, 30),
+                'user_age': rng.randint(*ages),
+                'user_weight': rng.randint(*weights),
+                'is_vip': rng.random() < mix['vip_rate'],
+                'bad_weather': rng.random() < mix['bad_weather_rate'],
+                'ride_preference': _pick(rng, mix['preferences']),
+                'engine': _pick(rng, mix['engines'])
+            }
+
+def replayed_requests(path):
+    # Endless (method, path, body) stream cycling through a recorded NDJSON log
+    with open(path) as log_file:
+        entries = [json.loads(line) for line in log_file if line.strip()]
+    if not entries:
+        raise ValueError(f'{path} holds no requests')
+    while True:
+        for entry in entries:
+            yield entry.get('method', 'GET').upper(), entry['path'], entry.get('body')
+
+def endpoint_of(path):
+    # Results are grouped by route, without the query string
+    return path.split('?', 1)[0]
+
+def make_sender_factory(args):
+    # Returns a function that builds one sender per client thread; a sender maps (method, path, body) -> status
+    if args.in_process:
+        os.environ.setdefault('DB_BACKEND', 'mysql' if args.db == 'mysql' else 'sqlite')
+        if args.db == 'memory':
+            os.environ.setdefault('SQLITE_PATH', ':memory:')
+        elif args.db == 'sqlite':
+            os.environ.setdefault('SQLITE_PATH', args.sqlite_path)
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        os.environ.setdefault('CATALOG_SNAPSHOT_PATH',
+                              os.path.join(tempfile.gettempdir(), 'thrill_safari_loadtest_catalog.bin'))
+        import tapp
+        tapp.initialize_app()
+        # Let a warm start finish reconciling, so the run measures the steady state
+        reconcile = tapp.park_model._reconcile_thread
+        if reconcile is not None:
+            reconcile.join(args.timeout)
+        if args.catalog_size:
+            import bench
+            with tapp.park_model._writing():
+                tapp.park_model._publish(bench.generate_catalog(args.catalog_size, args.seed))
+
+        def sender_factory():
+            client = tapp.app.test_client()
+
+            def send(method, path, body):
+                return client.open(path, method=method, json=body).status_code
+            return send
+        return sender_factory
+
+    target = urllib.parse.urlsplit(args.url)
+    connection_class = http.client.HTTPSConnection if target.scheme == 'https' else http.client.HTTPConnection
+    prefix = target.path.rstrip('/')
+
+    def sender_factory():
+        # One keep-alive connection per client, reopened after any failure
+        state = {'connection': None}
+
+        def send(method, path, body):
+            if state['connection'] is None:
+                state['connection'] = connection_class(target.netloc, timeout=args.timeout)
+            data = json.dumps(body).encode() if body is not None else None
+            headers = {'Content-Type': 'application/json'} if data is not None else {}
+            try:
+                state['connection'].request(method, prefix + path, body=data, headers=headers)
+                response = state['connection'].getresponse()
+                response.read()
+                return response.status
+            except (OSError, http.client.HTTPException):
+                state['connection'].close()
+                state['connection'] = None
+                raise
+        return send
+    return sender_factory
+
+def run(args, requests, sender_factory, record_file=None):
+    # Sends requests on a fixed schedule (request i at i / rate); returns (samples, seconds)
+    lock = threading.Lock()
+    samples = []
+    position = [0]
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    started = time.perf_counter()
+    deadline = started + args.duration
+
+    def next_request():
+        with lock:
+            index = position[0]
+            if args.requests and index >= args.requests:
+                return None
+            position[0] += 1
+            method, path, body = next(requests)
+        return started + index * interval, method, path, body
+
+    def client():
+        send = sender_factory()
+        local = []
+        while True:
+            item = next_request()
+            if item is None:
+                break
+            send_at, method, path, body = item
+            delay = send_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            request_started = time.perf_counter()
+            if request_started >= deadline:
+                break
+            try:
+                status = send(method, path, body)
+            except Exception:
+                status = 0  # transport failure: refused, reset or timed out
+            finished = time.perf_counter()
+            intended = send_at if interval else request_started
+            local.append((endpoint_of(path), status, (finished - intended) * 1000,
+                          (finished - request_started) * 1000, max(0.0, request_started - intended) * 1000))
+            if record_file is not None:
+                with lock:
+                    record_file.write(json.dumps({'method': method, 'path': path, 'body': body}) + '\n')
+        with lock:
+            samples.extend(local)
+
+    clients = [threading.Thread(target=client, daemon=True) for _ in range(args.concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+def percentile(ordered, p):
+    # Nearest-rank percentile of an ascending list
+    return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * p // 100) - 1))]
+
+def summarize(samples, elapsed):
+    # Per-endpoint and overall throughput, latency percentiles, error rate and status counts
+    by_endpoint = {'all': samples}
+    for sample in samples:
+        by_endpoint.setdefault(sample[0], []).append(sample)
+    summary = {}
+    for endpoint, group in sorted(by_endpoint.items()):
+        latencies = sorted(sample[2] for sample in group)
+        service_times = sorted(sample[3] for sample in group)
+        statuses = {}
+        for sample in group:
+            statuses[str(sample[1])] = statuses.get(str(sample[1]), 0) + 1
+        errors = sum(1 for sample in group if sample[1] == 0 or sample[1] >= 400)
+        result = {'requests': len(group), 'errors': errors, 'error_rate': round(errors / len(group), 4),
+                  'throughput_rps': round(len(group) / elapsed, 2), 'statuses': statuses,
+                  'max_ms': round(latencies[-1], 3)}
+        for p in PERCENTILES:
+            result[f'p{p}_ms'] = round(percentile(latencies, p), 3)
+            result[f'service_p{p}_ms'] = round(percentile(service_times, p), 3)
+        summary[endpoint] = result
+    return summary
+
+def schedule_summary(args, samples, elapsed):
+    # Offered vs achieved rate and schedule lag; `missed` counts requests due but never sent
+    lags = sorted(sample[4] for sample in samples)
+    sent_span = min(elapsed, args.duration)
+    scheduled = len(samples)
+    if args.rate > 0:
+        scheduled = -(-args.rate * args.duration // 1)  # request i is due at i / rate
+        scheduled = int(min(scheduled, args.requests) if args.requests else scheduled)
+    return {'target_rps': args.rate, 'achieved_rps': round(len(samples) / sent_span, 2) if sent_span > 0 else 0.0,
+            'missed': max(0, scheduled - len(samples)), 'lag_p99_ms': round(percentile(lags, 99), 3),
+            'lag_max_ms': round(lags[-1], 3), 'behind': len(samples) < BEHIND_RATE * scheduled}
+
+def report(summary, previous=None):
+    # Prints one line per endpoint, with the change against a previous results file when given
+    earlier = (previous or {}).get('endpoints', {})
+    width = max(len(endpoint) for endpoint in summary)
+    for endpoint, result in summary.items():
+        line = (f'{endpoint:<{width}}  {result["requests"]:>7} req  {result["throughput_rps"]:>9.1f}/s  '
+                f'p50 {result["p50_ms"]:>8.2f}  p95 {result["p95_ms"]:>8.2f}  p99 {result["p99_ms"]:>8.2f} ms  '
+                f'errors {result["error_rate"]:.2%}')
+        if endpoint in earlier:
+            before = earlier[endpoint]
+            changes = [f'{key[:-3]} {result[key] / before[key]:.2f}x' for key in ('p50_ms', 'p95_ms', 'p99_ms')
+                       if before.get(key)]
+            if before.get('throughput_rps'):
+                changes.append(f'rps {result["throughput_rps"] / before["throughput_rps"]:.2f}x')
+            line += '  (' + ', '.join(changes) + ' vs previous)'
+        print(line)
+
+def save_results(path, args, summary, elapsed, schedule):
+    with open(path, 'w') as results_file:
+        json.dump({
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            'target': 'in-process' if args.in_process else args.url,
+            'settings': {'db': args.db if args.in_process else None, 'catalog_size': args.catalog_size,
+                         'rate': args.rate, 'concurrency': args.concurrency, 'duration': args.duration,
+                         'requests': args.requests, 'replay': args.replay, 'mix_file': args.mix_file,
+                         'seed': args.seed},
+            'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+            'elapsed_seconds': round(elapsed, 3),
+            'schedule': schedule,
+            'endpoints': summary
+        }, results_file, indent=1, sort_keys=True)
+        results_file.write('\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000', help='server base URL (default: %(default)s)')
+    parser.add_argument('--in-process', action='store_true', help='drive the app through the Flask test client')
+    parser.add_argument('--db', choices=('memory', 'sqlite', 'mysql'), default='memory',
+                        help='storage for --in-process runs (default: %(default)s)')
+    parser.add_argument('--sqlite-path', default=os.path.join(tempfile.gettempdir(), 'thrill_safari_loadtest.db'),
+                        help='database file for --db sqlite (default: %(default)s)')
+    parser.add_argument('--catalog-size', type=int, default=0, help='--in-process: plan against N synthetic rides')
+    parser.add_argument('--rate', type=float, default=100, help='target requests per second (0 = unthrottled)')
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run')
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests (0 = no limit)')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout in seconds for --url')
+    parser.add_argument('--mix-file', help='JSON object replacing parts of the synthetic request mix')
+    parser.add_argument('--replay', help='NDJSON request log to replay instead of the synthetic mix')
+    parser.add_argument('--record', help='write every request sent to this NDJSON file')
+    parser.add_argument('--output', help='save the results as JSON')
+    parser.add_argument('--compare', help='results JSON from an earlier run to compare against')
+    parser.add_argument('--fail-behind', action='store_true',
+                        help='exit with status 2 if the clients could not keep up with --rate')
+    parser.add_argument('--staff-id', default='admin')
+    parser.add_argument('--password', default=os.environ.get('LOADTEST_PASSWORD', 'password123'))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+
+    if args.replay:
+        requests = replayed_requests(args.replay)
+    else:
+        requests = synthetic_requests(load_mix(args.mix_file), args.seed, args.staff_id, args.password)
+    previous = None
+    if args.compare:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+    sender_factory = make_sender_factory(args)
+
+    record_file = open(args.record, 'w') if args.record else None
+    try:
+        samples, elapsed = run(args, requests, sender_factory, record_file)
+    finally:
+        if record_file is not None:
+            record_file.close()
+    if not samples:
+        print('No requests were sent.', file=sys.stderr)
+        return 1
+
+    summary = summarize(samples, elapsed)
+    schedule = schedule_summary(args, samples, elapsed)
+    target = f'{args.rate:.0f}/s' if args.rate > 0 else 'unthrottled'
+    print(f'# {len(samples)} requests in {elapsed:.2f} s from {args.concurrency} clients '
+          f'(target {target}, achieved {schedule["achieved_rps"]:.1f}/s)')
+    report(summary, previous)
+    if args.output:
+        save_results(args.output, args, summary, elapsed, schedule)
+        print(f'# results written to {args.output}', file=sys.stderr)
+    if schedule['behind']:
+        print(f'# WARNING: the clients fell behind the schedule: {schedule["achieved_rps"]:.1f}/s of {target}, '
+              f'{schedule["missed"]} requests never sent, sends up to {schedule["lag_max_ms"]:.0f} ms late. '
+              f'Raise --concurrency or lower --rate; latencies include the time requests waited to go out.',
+              file=sys.stderr)
+        if args.fail_behind:
+            return 2
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,685 @@
+"""Ride planning: eligibility filtering and the heap, knapsack, pareto, route and schedule engines."""
+
+import os
+import time
+import logging
+import numpy as np
+from metrics import metrics
+from catalog import RIDE_TYPE_CODES, QUEUE_SLOT_MINUTES, QUEUE_SLOTS_PER_DAY, DEFAULT_QUEUE_PROFILE
+
+# Planner Configuration
+# heap = fast approximate, knapsack = exact, schedule = timed itinerary, pareto = thrill vs fatigue alternatives
+PLANNING_ENGINES = ['heap', 'knapsack', 'schedule', 'pareto']
+RIDE_PREFERENCES = ['', 'dry_only', 'wet_only', 'dry_first']  # '' plans without a preference
+KNAPSACK_MAX_BUDGET = int(os.environ.get('KNAPSACK_MAX_BUDGET', 1440))  # minutes
+KNAPSACK_MAX_CELLS = int(os.environ.get('KNAPSACK_MAX_CELLS', 8_000_000))  # size of the DP choice table
+PARETO_DEFAULT_ALTERNATIVES = int(os.environ.get('PARETO_DEFAULT_ALTERNATIVES', 5))
+PARETO_MAX_ALTERNATIVES = int(os.environ.get('PARETO_MAX_ALTERNATIVES', 20))
+PARETO_MAX_CELLS = int(os.environ.get('PARETO_MAX_CELLS', 96_000_000))  # rides x fatigue x minutes before minutes coarsen
+
+# Scheduling Configuration
+PARK_OPENING_TIME = os.environ.get('PARK_OPENING_TIME', '09:00')  # default entry time for the schedule engine
+SCHEDULE_MAX_CANDIDATES = int(os.environ.get('SCHEDULE_MAX_CANDIDATES', 256))  # rides the schedule DP considers
+# Up to this many candidates the schedule is solved exactly over every ride subset (2^n states)
+SCHEDULE_EXACT_MAX_CANDIDATES = int(os.environ.get('SCHEDULE_EXACT_MAX_CANDIDATES', 16))
+
+# Park Layout Configuration
+ROUTE_SOLVER_DEADLINE_MS = float(os.environ.get('ROUTE_SOLVER_DEADLINE_MS', 15))  # time box for route improvement
+ROUTE_INSERT_CANDIDATES = int(os.environ.get('ROUTE_INSERT_CANDIDATES', 64))  # unplanned rides tried as insertions
+
+planner_log = logging.getLogger('thrill_safari.planner')
+
+# Metrics
+plan_stage_seconds = metrics.histogram(
+    'thrill_safari_plan_stage_duration_seconds',
+    'Time spent in each planning stage (filter, preference_sort, select, route, build, serialize).', ('stage',))
+plans_generated = metrics.counter('thrill_safari_plans_generated_total', 'Plans computed (cache misses).', ('engine',))
+plan_eligible_rides = metrics.counter(
+    'thrill_safari_plan_eligible_rides_total', 'Eligible rides summed over computed plans.')
+plan_selected_rides = metrics.counter(
+    'thrill_safari_plan_selected_rides_total', 'Selected rides summed over computed plans.')
+
+class PlanningContext:
+    # Request-scoped planning inputs for one guest; built per request so concurrent requests never share state
+    __slots__ = ('total_time', 'is_vip', 'bad_weather', 'user_age', 'user_weight', 'ride_preference', 'engine',
+                 'entry_time', 'alternatives', 'max_fatigue')
+
+    def __init__(self, total_time, is_vip, bad_weather, user_age=25, user_weight=70, ride_preference='', engine='heap',
+                 entry_time=None, alternatives=None, max_fatigue=None):
+        self.total_time = total_time
+        self.is_vip = is_vip
+        self.bad_weather = bad_weather
+        self.user_age = user_age
+        self.user_weight = user_weight
+        self.ride_preference = str(ride_preference or '')  # None and '' are the same request; key and body agree
+        self.engine = engine
+        self.entry_time = entry_time  # minutes after midnight; only the schedule engine uses it
+        self.alternatives = alternatives  # pareto engine only: how many plans to return from the front
+        self.max_fatigue = max_fatigue  # pareto engine only: no plan may add up to more fatigue than this
+
+    def eligibility_key(self):
+        # Inputs that decide which rides are eligible (and in what order); see find_eligible_rides
+        return (self.user_age, self.user_weight, self.bad_weather, self.ride_preference)
+
+    def cache_key(self, catalog_version):
+        # Normalized plan-cache key for these inputs against one catalog version
+        return (catalog_version, self.total_time, self.is_vip, self.bad_weather, self.user_age, self.user_weight,
+                self.ride_preference, self.engine, self.entry_time, self.alternatives, self.max_fatigue)
+
+    def cache_tags(self, plan_data):
+        # Plan-cache tags: the rides the plan uses and the profile it was filtered for (see LiveQueueFeed)
+        ride_ids = {ride['id'] for ride in plan_data['selected_rides']}
+        for alternative in plan_data.get('alternatives', ()):
+            ride_ids.update(alternative['ride_ids'])
+        return tuple(('ride', ride_id) for ride_id in sorted(ride_ids)) + (('eligibility', self.eligibility_key()),)
+
+class PlanModel:
+    # Represents the generated optimal ride plan
+    def __init__(self, selected_rides, total_thrill, remaining_time): 
+        self.selected_rides = selected_rides
+        self.selected_count = len(selected_rides)
+        self.total_thrill = total_thrill
+        self.remaining_time = remaining_time
+        self.engine = 'heap'
+        self.schedule = None  # schedule engine only: (start minute, expected queue, end minute) per selected ride
+        self.walks = None  # routed plans only: walking minutes to each selected ride from the previous stop
+        self.total_fatigue = None  # pareto engine only
+        self.alternatives = None  # pareto engine only: PlanModels from the thrill/fatigue front, this plan first
+
+# Heap Implementation
+def find_eligible_rides(context, snapshot):
+    # Eligible catalog rows from the bitset index, ordered for dry_first; depends only on eligibility_key()
+    started = time.perf_counter()
+    ride_preference = context.ride_preference
+    index = snapshot.eligibility_index
+    eligible_mask = index.eligible(context.user_age, context.user_weight, context.bad_weather, ride_preference)
+    eligible_rides = index.indices(eligible_mask)
+    plan_stage_seconds.observe(time.perf_counter() - started, ('filter',))
+    
+    if planner_log.isEnabledFor(logging.DEBUG):
+        planner_log.debug("Total eligible rides after filtering: %d", len(eligible_rides))
+    
+    return _preference_order(snapshot, eligible_rides, ride_preference)
+
+def _preference_order(snapshot, eligible_rides, ride_preference):
+    # ride preference ordering
+    if ride_preference == 'dry_first':
+        # Dry rides first, then wet ones, each by thrill (highest first); lexsort is stable, so ties keep catalog order
+        started = time.perf_counter()
+        thrills = snapshot.column('thrill')[eligible_rides]
+        wet = snapshot.column('type')[eligible_rides] == RIDE_TYPE_CODES['water']
+        eligible_rides = eligible_rides[np.lexsort((-thrills, wet))]
+        plan_stage_seconds.observe(time.perf_counter() - started, ('preference_sort',))
+    return eligible_rides
+
+def find_group_eligible_rides(context, snapshot, members, masks=None):
+    # Rides every member ([(age, weight), ...]) may take: the members' eligibility masks ANDed together
+    started = time.perf_counter()
+    index = snapshot.eligibility_index
+    masks = {} if masks is None else masks
+    group_mask = None
+    for member in set(members):
+        mask = masks.get(member)
+        if mask is None:
+            mask = masks[member] = index.eligible(member[0], member[1], context.bad_weather, context.ride_preference)
+        group_mask = mask if group_mask is None else group_mask & mask
+        if not group_mask:
+            break
+    eligible_rides = index.indices(group_mask or 0)
+    plan_stage_seconds.observe(time.perf_counter() - started, ('filter',))
+    if planner_log.isEnabledFor(logging.DEBUG):
+        planner_log.debug("Rides eligible for all %d group members: %d", len(members), len(eligible_rides))
+    return _preference_order(snapshot, eligible_rides, context.ride_preference)
+
+def generate_optimal_plan(context, snapshot, eligible_rides=None):
+    
+    """Generates an optimal ride plan based on available time,VIP status, weather conditions, user age, and weight.
+     Prioritizes rides by thrill in max-heap order (ties by catalog position) and includes a gap time between rides.
+     Supports ride preference (like dry_only, wet_only, or mixed), with age-based thrill filtering for adults over 40.
+     context.engine picks heap, knapsack, schedule or pareto selection; the engine that ran is recorded on the plan."""
+    
+    plan = PlanModel([], 0, context.total_time) 
+    ride_preference = context.ride_preference
+
+    # Determine the gap time based on total available time
+    ride_gap_time = 5 if context.total_time < 30 else 10
+    if planner_log.isEnabledFor(logging.DEBUG):
+        planner_log.debug("Calculated ride gap time: %d minutes.", ride_gap_time)
+
+    if eligible_rides is None:
+        eligible_rides = find_eligible_rides(context, snapshot)
+    
+    started = time.perf_counter()
+    if context.engine == 'schedule':
+        _schedule_select(context, snapshot, eligible_rides, ride_gap_time, plan)
+        plan.engine = 'schedule'
+        _record_plan_metrics(plan, eligible_rides, started)
+        if planner_log.isEnabledFor(logging.DEBUG):
+            planner_log.debug("Final plan (schedule): %d rides scheduled, total thrill: %d, remaining time: %d",
+                              len(plan.selected_rides), plan.total_thrill, plan.remaining_time)
+        return plan
+    if context.engine == 'knapsack':
+        if _knapsack_select(context, snapshot, eligible_rides, ride_gap_time, plan):
+            plan.engine = 'knapsack'
+            _record_plan_metrics(plan, eligible_rides, started)
+            _route_if_mapped(context, snapshot, eligible_rides, plan)
+            if planner_log.isEnabledFor(logging.DEBUG):
+                planner_log.debug("Final plan (knapsack): %d rides selected, total thrill: %d, remaining time: %d",
+                                  len(plan.selected_rides), plan.total_thrill, plan.remaining_time)
+            return plan
+        planner_log.warning("Knapsack budget too large (%d minutes), falling back to heap engine.", context.total_time)
+    if context.engine == 'pareto':
+        if _pareto_select(context, snapshot, eligible_rides, ride_gap_time, plan):
+            plan.engine = 'pareto'
+            _record_plan_metrics(plan, eligible_rides, started)
+            if planner_log.isEnabledFor(logging.DEBUG):
+                planner_log.debug("Final plan (pareto): %d alternatives, most thrilling has %d rides, thrill %d, "
+                                  "fatigue %d", len(plan.alternatives), len(plan.selected_rides), plan.total_thrill,
+                                  plan.total_fatigue)
+            return plan
+        planner_log.warning("Pareto budget too large (%d minutes), falling back to heap engine.", context.total_time)
+
+    # Vectorized per-ride thrill and VIP-adjusted cost (duration plus queue time)
+    thrills = snapshot.column('thrill')[eligible_rides]
+    costs = snapshot.ride_costs(context.is_vip)[eligible_rides]
+
+    # If no ride preference or mixed preference, take rides in max-heap order: highest thrill first, then catalog row
+    if ride_preference not in ['dry_only', 'wet_only', 'dry_first']:
+        order = np.lexsort((eligible_rides, -thrills))
+        eligible_rides, thrills, costs = eligible_rides[order], thrills[order], costs[order]
+    # Sequential selection for dry_first, dry_only, or wet_only keeps the filtered order
+    _greedy_select(eligible_rides, thrills, costs, ride_gap_time, plan)
+    plan.engine = 'heap'
+    _record_plan_metrics(plan, eligible_rides, started)
+    _route_if_mapped(context, snapshot, eligible_rides, plan)
+    if planner_log.isEnabledFor(logging.DEBUG):
+        planner_log.debug("Final plan: %d rides selected, total thrill: %d, remaining time: %d",
+                          len(plan.selected_rides), plan.total_thrill, plan.remaining_time)
+    return plan
+
+def _greedy_select(rows, thrills, costs, ride_gap_time, plan, chunk_size=4096):
+    # Takes each ride in order that still fits (plus the gap); stops once even the cheapest ride left won't
+    if len(rows) > chunk_size:
+        fits = costs <= plan.remaining_time
+        rows, thrills, costs = rows[fits], thrills[fits], costs[fits]
+        cheapest_left = np.minimum.accumulate(costs[::-1])[::-1]
+    else:
+        cheapest_left = np.zeros(len(rows), dtype=np.int64)
+    remaining = plan.remaining_time
+    selected = plan.selected_rides
+    for chunk_start in range(0, len(rows), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        for row, thrill, cost, cheapest in zip(rows[chunk].tolist(), thrills[chunk].tolist(),
+                                               costs[chunk].tolist(), cheapest_left[chunk].tolist()):
+            gap = ride_gap_time if selected else 0
+            if remaining <= 0 or cheapest + gap > remaining:
+                plan.remaining_time = remaining
+                return
+            if cost + gap <= remaining:
+                selected.append(row)
+                plan.total_thrill += thrill
+                remaining -= cost + gap
+    plan.remaining_time = remaining
+
+def _route_if_mapped(context, snapshot, eligible_rides, plan):
+    # Heap and knapsack plans are walked in route order once the park layout places any rides
+    if snapshot.layout:
+        started = time.perf_counter()
+        _route_plan(context, snapshot, eligible_rides, plan)
+        plan_stage_seconds.observe(time.perf_counter() - started, ('route',))
+
+def _record_plan_metrics(plan, eligible_rides, started):
+    plan_stage_seconds.observe(time.perf_counter() - started, ('select',))
+    plans_generated.inc(labels=(plan.engine,))
+    plan_eligible_rides.inc(len(eligible_rides))
+    plan_selected_rides.inc(len(plan.selected_rides))
+
+# Knapsack Implementation
+def _knapsack_select(context, snapshot, eligible_rides, ride_gap_time, plan):
+    """Fills `plan` with the maximum-thrill subset of `eligible_rides` that fits in context.total_time.
+     Every ride is charged its VIP-adjusted queue time, its duration and one gap; the gap the first ride
+     does not pay is handed back by growing the budget by one gap. Returns False (leaving `plan` untouched)
+     when the DP table would exceed KNAPSACK_MAX_BUDGET / KNAPSACK_MAX_CELLS."""
+    budget = context.total_time + ride_gap_time
+    if context.total_time > KNAPSACK_MAX_BUDGET:
+        return False
+    if not len(eligible_rides):
+        return True
+
+    indices = eligible_rides
+    thrills = snapshot.column('thrill')[indices].astype(np.int64)
+    costs = snapshot.ride_costs(context.is_vip)[indices] + ride_gap_time
+
+    # Keep only the budget // cost most thrilling rides of each cost; a plan cannot hold more of them
+    fits = costs <= budget
+    indices, thrills, costs = indices[fits], thrills[fits], costs[fits]
+    order = np.lexsort((-thrills, costs))
+    sorted_costs = costs[order]
+    rank = np.arange(len(order)) - np.searchsorted(sorted_costs, sorted_costs, side='left')
+    order = order[rank < budget // sorted_costs]
+    indices, thrills, costs = indices[order], thrills[order], costs[order]
+
+    if len(indices) * (budget + 1) > KNAPSACK_MAX_CELLS:
+        return False
+
+    # best[t] = highest thrill reachable using at most t minutes; took[k, t] records whether item k improved it
+    best = np.zeros(budget + 1, dtype=np.int64)
+    took = np.zeros((len(indices), budget + 1), dtype=bool)
+    for k in range(len(indices)):
+        cost = costs[k]
+        candidate = best[:budget + 1 - cost] + thrills[k]
+        improved = candidate > best[cost:]
+        best[cost:][improved] = candidate[improved]
+        took[k, cost:] = improved
+
+    # The first minute count reaching the maximum thrill is the cheapest optimal plan
+    used = int(np.argmax(best))
+    chosen = []
+    t = used
+    for k in range(len(indices) - 1, -1, -1):
+        if took[k, t]:
+            chosen.append(k)
+            t -= costs[k]
+
+    if context.ride_preference == 'dry_first':
+        wet = snapshot.column('type')[indices] == RIDE_TYPE_CODES['water']
+        chosen.sort(key=lambda k: (wet[k], -thrills[k]))
+    else:
+        chosen.sort(key=lambda k: -thrills[k])
+    plan.selected_rides = [int(indices[k]) for k in chosen]
+    plan.total_thrill = int(best[used])
+    plan.remaining_time = context.total_time - (used - ride_gap_time) if chosen else context.total_time
+    return True
+
+# Pareto Implementation
+def _pareto_select(context, snapshot, eligible_rides, ride_gap_time, plan):
+    """Fills `plan` with the most thrilling plan and plan.alternatives with up to context.alternatives plans
+     from the thrill/fatigue Pareto front: for every fatigue total the highest thrill that fits the time budget,
+     using the fewest minutes. Every point comes out of one DP sweep over (fatigue, minutes); the alternatives
+     are spread along the front from the most thrilling plan to the least tiring one. Costs and the first-ride
+     gap follow _knapsack_select. Returns False (leaving `plan` untouched) above KNAPSACK_MAX_BUDGET."""
+    if context.total_time > KNAPSACK_MAX_BUDGET:
+        return False
+    plan.total_fatigue = 0
+    plan.alternatives = []
+    budget = context.total_time + ride_gap_time
+    indices = eligible_rides
+    thrills = snapshot.column('thrill')[indices].astype(np.int64)
+    fatigues = snapshot.column('fatigue')[indices].astype(np.int64)
+    costs = snapshot.ride_costs(context.is_vip)[indices] + ride_gap_time
+    fits = costs <= budget
+    if context.max_fatigue is not None:
+        fits &= fatigues <= context.max_fatigue
+    indices, thrills, fatigues, costs = indices[fits], thrills[fits], fatigues[fits], costs[fits]
+    if not len(indices):
+        plan.alternatives.append(plan)
+        return True
+
+    keep = _pareto_candidates(thrills, np.maximum(fatigues, 0), costs, budget, budget // int(costs.min()))
+    indices, thrills, fatigues, costs = indices[keep], thrills[keep], fatigues[keep], costs[keep]
+
+    # A 1D knapsack over thrill * scale - fatigue bounds the fatigue axis at the most thrilling plan
+    scale = int(fatigues.sum()) + 1
+    best = np.zeros(budget + 1, dtype=np.int64)
+    for value, cost in zip((thrills * scale - fatigues).tolist(), costs.tolist()):
+        np.maximum(best[cost:], best[:budget + 1 - cost] + value, out=best[cost:])
+    top = int(best[budget])
+    max_fatigue = -top % scale
+    if context.max_fatigue is not None:
+        max_fatigue = min(max_fatigue, context.max_fatigue)
+
+    # Large tables count time in coarser steps; costs round up, so every plan still fits the real budget
+    step = -(-len(indices) * (max_fatigue + 1) * (budget + 1) // PARETO_MAX_CELLS)
+    slots = budget // step
+    steps = -(-costs // step)
+
+    # best[f, t] = highest thrill with fatigue <= f in t steps; took[k] holds where ride k improved it
+    best = np.zeros((max_fatigue + 1, slots + 1), dtype=np.int32)
+    took = []
+    for thrill, fatigue, cost in zip(thrills.tolist(), fatigues.tolist(), steps.tolist()):
+        if fatigue > max_fatigue or cost > slots:
+            took.append(None)
+            continue
+        candidate = best[:max_fatigue + 1 - fatigue, :slots + 1 - cost] + thrill
+        region = best[fatigue:, cost:]
+        improved = candidate > region
+        np.maximum(region, candidate, out=region)
+        took.append(np.packbits(improved, bitorder='little'))
+
+    # Front points: the fatigue totals that buy more thrill than one point less, each at its fewest minutes
+    full = best[:, slots]
+    front = [fatigue for fatigue in range(max_fatigue, 0, -1) if full[fatigue] > full[fatigue - 1]]
+    count = context.alternatives or PARETO_DEFAULT_ALTERNATIVES
+    if len(front) > count:
+        front = [front[position] for position in sorted(set(np.linspace(0, len(front) - 1, count).round().astype(int).tolist()))]
+    wet = snapshot.column('type')[indices] == RIDE_TYPE_CODES['water']
+    fatigue_list, step_list = fatigues.tolist(), steps.tolist()
+    for fatigue in front:
+        t = int(np.argmax(best[fatigue] == full[fatigue]))
+        f = fatigue
+        chosen = []
+        for k in range(len(indices) - 1, -1, -1):
+            bits = took[k]
+            if bits is None or f < fatigue_list[k] or t < step_list[k]:
+                continue
+            position = (f - fatigue_list[k]) * (slots + 1 - step_list[k]) + (t - step_list[k])
+            if bits[position >> 3] >> (position & 7) & 1:
+                chosen.append(k)
+                f -= fatigue_list[k]
+                t -= step_list[k]
+        if context.ride_preference == 'dry_first':
+            chosen.sort(key=lambda k: (wet[k], -thrills[k]))
+        else:
+            chosen.sort(key=lambda k: -thrills[k])
+        alternative = plan if not plan.alternatives else PlanModel([], 0, context.total_time)
+        alternative.engine = 'pareto'
+        alternative.selected_rides = [int(indices[k]) for k in chosen]
+        alternative.total_thrill = int(thrills[chosen].sum())
+        alternative.total_fatigue = int(fatigues[chosen].sum())
+        alternative.remaining_time = context.total_time - (int(costs[chosen].sum()) - ride_gap_time) if chosen \
+            else context.total_time
+        plan.alternatives.append(alternative)
+    if not plan.alternatives:
+        plan.alternatives.append(plan)
+    return True
+
+def _pareto_candidates(thrills, fatigues, costs, budget, max_rides):
+    # Mask of the rides not dominated on thrill, fatigue and cost by at least max_rides others
+    thrill_levels, fatigue_levels = int(thrills.max()) + 1, int(fatigues.max()) + 1
+    cells = (fatigues * thrill_levels + thrills) * (budget + 1) + costs
+    order = np.argsort(cells, kind='stable')
+    sorted_cells = cells[order]
+    earlier_equal = np.empty(len(cells), dtype=np.int64)  # identical rides earlier in the catalog
+    earlier_equal[order] = np.arange(len(order)) - np.searchsorted(sorted_cells, sorted_cells, side='left')
+    counts = np.bincount(cells, minlength=fatigue_levels * thrill_levels * (budget + 1))
+    counts = counts.reshape(fatigue_levels, thrill_levels, budget + 1)
+    # at_least[f, h, c]: rides with fatigue <= f, thrill >= h and cost <= c
+    at_least = counts.cumsum(axis=0)[:, ::-1].cumsum(axis=1)[:, ::-1].cumsum(axis=2)
+    dominating = at_least[fatigues, thrills, costs] - counts[fatigues, thrills, costs] + earlier_equal
+    return dominating < max_rides
+
+# Route Implementation
+def _route_plan(context, snapshot, eligible_rides, plan):
+    """Orders the plan's rides into a walking route through the park layout and re-fits it to the time budget.
+     The flat gap the selection engines charge between rides becomes the real walking time from the previous
+     stop (the entrance, for the first ride). Nearest-neighbour construction is improved by 2-opt; if the real
+     walk no longer fits, the rides saving the most minutes per thrill are dropped, and then the most thrilling
+     unplanned rides are inserted wherever they fit cheapest (orienteering-style). Improvement steps stop at
+     ROUTE_SOLVER_DEADLINE_MS, so latency stays bounded. For dry_first all dry rides still come first."""
+    deadline = time.perf_counter() + ROUTE_SOLVER_DEADLINE_MS / 1000
+    ride_gap_time = 5 if context.total_time < 30 else 10
+    costs = snapshot.ride_costs(context.is_vip)
+    thrills = snapshot.column('thrill')
+
+    # Stops 1..n are the planned rides, then the insertion candidates; stop 0 is the entrance
+    planned = set(plan.selected_rides)
+    spare = eligible_rides[costs[eligible_rides] <= context.total_time]
+    if len(spare) > ROUTE_INSERT_CANDIDATES + len(planned):
+        top = np.argpartition(-thrills[spare], ROUTE_INSERT_CANDIDATES + len(planned))
+        spare = spare[top[:ROUTE_INSERT_CANDIDATES + len(planned)]]
+    spare = spare[np.lexsort((spare, -thrills[spare]))]
+    spare = [row for row in spare.tolist() if row not in planned][:ROUTE_INSERT_CANDIDATES]
+    rows = list(plan.selected_rides) + spare
+    walk = snapshot.layout.stops_matrix([snapshot.catalog.ids[row] for row in rows], ride_gap_time).tolist()
+    stop_cost = [0] + costs[rows].tolist()
+    stop_thrill = [0] + thrills[rows].tolist()
+    if context.ride_preference == 'dry_first':
+        stop_group = [0] + (snapshot.column('type')[rows] == RIDE_TYPE_CODES['water']).astype(int).tolist()
+    else:
+        stop_group = [0] * (len(rows) + 1)
+
+    route = []
+    for group in sorted(set(stop_group[1:len(plan.selected_rides) + 1])):
+        route += _nearest_neighbour(walk, route[-1] if route else 0,
+                                    [stop for stop in range(1, len(plan.selected_rides) + 1) if stop_group[stop] == group])
+    _two_opt(walk, route, stop_group, deadline)
+
+    # Repair: drop rides until the real walk fits, cheapest thrill per minute saved first
+    def route_time():
+        stops = [0] + route
+        return sum(stop_cost[stop] for stop in route) + sum(walk[a][b] for a, b in zip(stops, stops[1:]))
+
+    total = route_time()
+    while route and total > context.total_time:
+        stops = [0] + route + [None]
+        savings = []
+        for position in range(1, len(stops) - 1):
+            before, stop, after = stops[position - 1], stops[position], stops[position + 1]
+            saved = stop_cost[stop] + walk[before][stop]
+            if after is not None:
+                saved += walk[stop][after] - walk[before][after]
+            savings.append((stop_thrill[stop] / max(saved, 1), position - 1))
+        del route[min(savings)[1]]
+        total = route_time()
+
+    # Insertion: the most thrilling unplanned rides, each at the cheapest position its group allows
+    for stop in range(len(plan.selected_rides) + 1, len(rows) + 1):
+        if time.perf_counter() > deadline:
+            break
+        best = None
+        stops = [0] + route + [None]
+        for position in range(1, len(stops)):
+            before, after = stops[position - 1], stops[position]
+            if stop_group[before] > stop_group[stop] or (after is not None and stop_group[after] < stop_group[stop]):
+                continue
+            added = stop_cost[stop] + walk[before][stop]
+            if after is not None:
+                added += walk[stop][after] - walk[before][after]
+            if total + added <= context.total_time and (best is None or added < best[0]):
+                best = (added, position - 1)
+        if best is not None:
+            route.insert(best[1], stop)
+            total += best[0]
+    _two_opt(walk, route, stop_group, deadline)
+    total = route_time()
+
+    plan.selected_rides = [rows[stop - 1] for stop in route]
+    plan.total_thrill = sum(stop_thrill[stop] for stop in route)
+    plan.remaining_time = context.total_time - total
+    plan.walks = [walk[a][b] for a, b in zip([0] + route, route)]
+
+def _nearest_neighbour(walk, start, stops):
+    # Visits `stops` from `start`, always walking to the closest unvisited one
+    route = []
+    left = set(stops)
+    current = start
+    while left:
+        current = min(left, key=lambda stop: (walk[current][stop], stop))
+        route.append(current)
+        left.remove(current)
+    return route
+
+def _two_opt(walk, route, stop_group, deadline):
+    # Reverses route[i..j] in place while that shortens the open walk; never mixes stop groups
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(len(route) - 1):
+            before = route[i - 1] if i else 0
+            for j in range(i + 1, len(route)):
+                if stop_group[route[i]] != stop_group[route[j]]:
+                    break
+                after = route[j + 1] if j + 1 < len(route) else None
+                delta = walk[before][route[j]] - walk[before][route[i]]
+                if after is not None:
+                    delta += walk[route[i]][after] - walk[route[j]][after]
+                if delta < 0:
+                    route[i:j + 1] = route[i:j + 1][::-1]
+                    improved = True
+            if time.perf_counter() > deadline:
+                return
+
+# Schedule Implementation
+def _schedule_select(context, snapshot, eligible_rides, ride_gap_time, plan):
+    """Fills `plan` with a timed itinerary: the rides in the order to take them, each with its start minute.
+     Queue times follow each ride's curve (queue minutes per QUEUE_SLOT_MINUTES slot of the day), so the same
+     ride costs more at 14:00 than at opening. Both solvers work on the same precomputed slot tables. With at
+     most SCHEDULE_EXACT_MAX_CANDIDATES candidates the itinerary is exact (_schedule_exact); above that a
+     label-setting DP over the minutes of the visit finds a good one (_schedule_labels). For dry_first, no dry
+     ride may follow a wet one."""
+    horizon = min(context.total_time, 24 * 60 - context.entry_time)
+    if not len(eligible_rides) or horizon <= 0:
+        plan.schedule = []
+        return
+
+    # Precomputed per-ride slot tables for the candidates: the whole cost of taking each ride in each slot
+    rows = _schedule_candidates(context, snapshot, eligible_rides, horizon, ride_gap_time)
+    thrills = snapshot.column('thrill')[rows].astype(np.int64)
+    durations = snapshot.column('duration')[rows].astype(np.int64)
+    queue_table = snapshot.queue_table(rows, context.is_vip)
+    cost_table = queue_table + (durations + ride_gap_time)[:, None]
+    wet = snapshot.column('type')[rows] == RIDE_TYPE_CODES['water']
+    dry_first = context.ride_preference == 'dry_first'
+
+    # The last ride's gap is never waited out, so arrivals may run up to one gap past the horizon
+    end = horizon + ride_gap_time
+    slot_of = np.minimum((context.entry_time + np.arange(end + 1)) // QUEUE_SLOT_MINUTES, QUEUE_SLOTS_PER_DAY - 1)
+    if len(rows) <= SCHEDULE_EXACT_MAX_CANDIDATES:
+        steps, finish = _schedule_exact(cost_table, thrills, wet, dry_first, slot_of, end)
+    else:
+        steps, finish = _schedule_labels(cost_table, thrills, wet, dry_first, slot_of.tolist(), end)
+
+    plan.selected_rides = [int(rows[k]) for _, k in steps]
+    plan.total_thrill = int(sum(thrills[k] for _, k in steps))
+    plan.remaining_time = context.total_time - (finish - ride_gap_time) if steps else context.total_time
+    plan.schedule = []
+    for start, k in steps:
+        queue = int(queue_table[k, slot_of[start]])
+        plan.schedule.append((context.entry_time + start, queue, context.entry_time + start + queue + int(durations[k])))
+
+def _schedule_exact(cost_table, thrills, wet, dry_first, slot_of, end):
+    # Exact subset DP: done[S] is the earliest minute all of S can be done; returns (starts, finish minute)
+    count = len(thrills)
+    finish_at = np.arange(end + 1) + cost_table[:, slot_of]  # (count, end + 1): done at, if started at t
+    never = end + 1
+    ready = np.full((count, end + 2), never, dtype=np.int64)
+    ready[:, :-1] = np.minimum(np.minimum.accumulate(finish_at[:, ::-1], axis=1)[:, ::-1], never)
+
+    subsets = np.arange(1 << count, dtype=np.int64)
+    sizes = np.zeros(1 << count, dtype=np.int64)
+    totals = np.zeros(1 << count, dtype=np.int64)
+    for k in range(count):
+        has = (subsets >> k) & 1
+        sizes += has
+        totals += has * thrills[k]
+    by_size = np.argsort(sizes, kind='stable')
+    bounds = np.searchsorted(sizes[by_size], np.arange(count + 2))
+    wet_bits = sum(1 << k for k in range(count) if wet[k])
+
+    done = np.full(1 << count, never, dtype=np.int64)
+    done[0] = 0
+    last = np.full(1 << count, -1, dtype=np.int64)
+    for size in range(1, count + 1):
+        layer = by_size[bounds[size]:bounds[size + 1]]
+        for k in range(count):
+            members = layer[((layer >> k) & 1) == 1]
+            before = members ^ (1 << k)
+            if dry_first and not wet[k]:
+                dry_only = (before & wet_bits) == 0
+                members, before = members[dry_only], before[dry_only]
+            finished = ready[k, done[before]]
+            better = finished < done[members]
+            done[members[better]] = finished[better]
+            last[members[better]] = k
+
+    fits = np.flatnonzero(done <= end)
+    best = int(fits[np.lexsort((done[fits], -totals[fits]))[0]])
+    order = []
+    subset = best
+    while subset:
+        k = int(last[subset])
+        order.append(k)
+        subset ^= 1 << k
+    order.reverse()
+
+    # Replay the order to recover each start: the earliest minute that finishes the ride soonest
+    steps = []
+    t = 0
+    for k in order:
+        start = t + int(np.argmin(finish_at[k, t:]))
+        steps.append((start, k))
+        t = int(finish_at[k, start])
+    return steps, int(done[best])
+
+def _schedule_labels(cost_table, thrills, wet, dry_first, slot_of, end):
+    # Label-setting DP over minutes after entry: wait a minute or queue for a ride; returns (starts, finish)
+    costs_by_slot = np.ascontiguousarray(cost_table.T)
+
+    # label[t] packs thrill * base + tie-break, so one np.maximum.at settles every arrival
+    count = len(thrills)
+    base = count + 1
+    waited = 0  # tie-break of a wait edge; candidate k arrives with count - k
+    ride_labels = thrills * base + (count - np.arange(count))
+    label = np.full(end + 1, -1, dtype=np.int64)
+    previous = np.zeros(end + 1, dtype=np.int64)
+    used = np.zeros((end + 1, count), dtype=bool)
+    went_wet = np.zeros(end + 1, dtype=bool)
+    label[0] = waited
+    for t in range(end + 1):
+        current = label[t].item()
+        if current < 0:
+            continue
+        value, tie_break = divmod(current, base)
+        if t > 0:
+            before = previous[t].item()
+            used[t] = used[before]
+            went_wet[t] = went_wet[before]
+            if tie_break != waited:
+                taken = count - tie_break
+                used[t, taken] = True
+                went_wet[t] |= wet[taken]
+        if t < end and value * base + waited > label[t + 1]:
+            label[t + 1] = value * base + waited
+            previous[t + 1] = t
+        if tie_break == waited and t > 0 and slot_of[t] == slot_of[t - 1]:
+            continue
+
+        arrivals = costs_by_slot[slot_of[t]] + t
+        allowed = ~used[t] & (arrivals <= end)
+        if dry_first and went_wet[t]:
+            allowed &= wet
+        arrivals = arrivals[allowed]
+        labels = ride_labels[allowed] + value * base
+        np.maximum.at(label, arrivals, labels)
+        previous[arrivals[label[arrivals] == labels]] = t
+
+    # The earliest arrival at the highest thrill; walk the path back to list the rides in visiting order
+    finish = int(np.argmax(label // base))
+    steps = []
+    t = finish
+    while t > 0:
+        tie_break = int(label[t] % base)
+        if tie_break != waited:
+            steps.append((int(previous[t]), count - tie_break))
+        t = int(previous[t])
+    steps.reverse()
+    return steps, finish
+
+def _schedule_candidates(context, snapshot, eligible_rides, horizon, ride_gap_time):
+    # The SCHEDULE_MAX_CANDIDATES rides with the best thrill per minute at their quietest slot of the visit
+    first_slot = context.entry_time // QUEUE_SLOT_MINUTES
+    last_slot = min((context.entry_time + horizon - 1) // QUEUE_SLOT_MINUTES, QUEUE_SLOTS_PER_DAY - 1)
+    quietest = snapshot.column('queue_time')[eligible_rides].astype(np.int64) * \
+        DEFAULT_QUEUE_PROFILE[first_slot:last_slot + 1].min() // 100
+    if snapshot.queue_curves:
+        rows_by_id = snapshot.catalog.rows_by_id
+        stored = np.array([rows_by_id.get(ride_id, -1) for ride_id in snapshot.queue_curves], dtype=np.int64)
+        positions = np.flatnonzero(np.isin(eligible_rides, stored))
+        if len(positions):
+            ids = snapshot.catalog.ids
+            quietest[positions] = [snapshot.queue_curves[ids[row]][first_slot:last_slot + 1].min()
+                                   for row in eligible_rides[positions].tolist()]
+    if context.is_vip:
+        vip = snapshot.column('vip_access')[eligible_rides]
+        quietest[vip] //= 2
+    cheapest = quietest + snapshot.column('duration')[eligible_rides]
+    fits = np.flatnonzero(cheapest <= horizon)
+    if len(fits) > SCHEDULE_MAX_CANDIDATES:
+        # Everything above the cut-off rate, then ties at the cut-off in eligible order
+        rate = snapshot.column('thrill')[eligible_rides[fits]] / (cheapest[fits] + ride_gap_time)
+        cutoff = np.partition(rate, len(rate) - SCHEDULE_MAX_CANDIDATES)[len(rate) - SCHEDULE_MAX_CANDIDATES]
+        above = rate > cutoff
+        ties = np.flatnonzero(rate == cutoff)[:SCHEDULE_MAX_CANDIDATES - np.count_nonzero(above)]
+        above[ties] = True
+        fits = fits[above]
+    return eligible_rides[fits]
@@ -0,0 +1,109 @@
+"""Live queue-time feed simulator.
+
+Posts random-walk queue times for every ride to /api/queue_times at a target update rate, in batches,
+and reports the rate actually achieved and the request latency. Runs against a live server or, with
+--in-process, against the app through the Flask test client on an in-memory SQLite stand-in.
+
+    python queue_simulator.py --in-process --rate 5000 --duration 10
+    python queue_simulator.py --url http://localhost:5000 --staff-id admin --password ... --rate 1000
+
+In-process runs also flush the feed at the end and print its counters (applied, persisted, plans invalidated)."""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import urllib.request
+
+def make_poster(args):
+    # Returns (post(updates) -> status, ride_ids) for either a live server or the in-process app
+    if args.in_process:
+        os.environ.setdefault('DB_BACKEND', 'sqlite')
+        os.environ.setdefault('SQLITE_PATH', ':memory:')
+        os.environ.setdefault('LOG_LEVEL', 'WARNING')
+        os.environ.setdefault('CATALOG_SNAPSHOT_PATH', os.path.join(tempfile.gettempdir(), 'thrill_safari_sim_catalog.bin'))
+        import tapp
+        tapp.initialize_app()
+        client = tapp.app.test_client()
+        token = client.post('/api/login', json={'staff_id': args.staff_id, 'password': args.password}).get_json()['token']
+        headers = {'Authorization': f'Bearer {token}'}
+        ride_ids = [ride['id'] for ride in client.get('/api/rides?fields=id&limit=1000').get_json()]
+
+        def post(updates):
+            return client.post('/api/queue_times', json={'updates': updates}, headers=headers).status_code
+        return post, ride_ids
+
+    def request(method, path, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(args.url.rstrip('/') + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json', **(headers or {})})
+        with urllib.request.urlopen(req, timeout=30) as response:
+            return response.status, json.loads(response.read() or b'null')
+
+    _, login = request('POST', '/api/login', {'staff_id': args.staff_id, 'password': args.password})
+    headers = {'Authorization': f'Bearer {login["token"]}'}
+    _, rides = request('GET', '/api/rides?fields=id&limit=1000')
+
+    def post(updates):
+        return request('POST', '/api/queue_times', {'updates': updates}, headers)[0]
+    return post, [ride['id'] for ride in rides]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000', help='server base URL (default: %(default)s)')
+    parser.add_argument('--in-process', action='store_true', help='drive the app through the Flask test client')
+    parser.add_argument('--staff-id', default='admin')
+    parser.add_argument('--password', default=os.environ.get('SIM_PASSWORD', 'password123'))
+    parser.add_argument('--rate', type=float, default=1000, help='target updates per second')
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run')
+    parser.add_argument('--batch', type=int, default=100, help='updates per request')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    post, ride_ids = make_poster(args)
+    if not ride_ids:
+        print('No rides in the catalog.', file=sys.stderr)
+        return 1
+    queue_times = {ride_id: rng.randint(0, 60) for ride_id in ride_ids}
+
+    sent = failed = 0
+    latencies = []
+    interval = args.batch / args.rate
+    started = time.perf_counter()
+    next_send = started
+    while time.perf_counter() - started < args.duration:
+        updates = []
+        now = time.time()
+        for _ in range(args.batch):
+            # Queue times drift a few minutes at a time, as a park's do
+            ride_id = rng.choice(ride_ids)
+            queue_times[ride_id] = max(0, min(240, queue_times[ride_id] + rng.randint(-5, 5)))
+            updates.append([ride_id, queue_times[ride_id], now])
+        request_started = time.perf_counter()
+        status = post(updates)
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        if status == 202:
+            sent += len(updates)
+        else:
+            failed += len(updates)
+        next_send += interval
+        time.sleep(max(0.0, next_send - time.perf_counter()))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f'updates sent: {sent} ({failed} failed) in {elapsed:.2f} s = {sent / elapsed:.0f}/s '
+          f'(target {args.rate:.0f}/s)')
+    print(f'request latency: median {latencies[len(latencies) // 2]:.2f} ms, '
+          f'p95 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.2f} ms, max {latencies[-1]:.2f} ms')
+    if args.in_process:
+        import tapp
+        tapp.queue_feed.flush()
+        print('feed:', json.dumps(tapp.queue_feed.stats(), sort_keys=True))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""Ride catalog shared by every worker process on the host (CATALOG_SHARED_PATH).
+
+Every published snapshot is written once to an immutable segment file next to the control file, ideally on tmpfs
+such as /dev/shm. Workers map the newest segment read-only and use its arrays in place, so the catalog costs the
+same memory with one worker or twenty; the control header's version tells a worker it is behind. Live queue times
+are the one thing written into a published segment, as (row, minutes) records appended to its delta area."""
+
+import os
+import json
+import mmap
+import time
+import struct
+import threading
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so no shared catalog
+    fcntl = None
+from contextlib import contextmanager
+import numpy as np
+from catalog import (RIDE_TYPE_CODES, EMPTY_LAYOUT, Tombstones, RowIndex, RideCatalog, EligibilityIndex, ParkLayout,
+                     CatalogSnapshot, SharedStrings, AppendedStrings, SharedIdIndex)
+
+# Shared Catalog Configuration
+# Live queue-time updates recorded in place in a shared segment before the next one is written out whole
+CATALOG_SHARED_QUEUE_DELTAS = int(os.environ.get('CATALOG_SHARED_QUEUE_DELTAS', 65536))
+
+# Segment Layout
+SHARED_CONTROL_MAGIC = b'TSSHCTL\x00'
+SHARED_SEGMENT_MAGIC = b'TSSHSEG\x00'
+SHARED_FORMAT = 3
+# magic, format, reserved, reserved, catalog version, version of the segment holding it, queue delta records
+SHARED_CONTROL_HEADER = struct.Struct('<8sHHIQQQ')
+SHARED_CONTROL_STATE = struct.Struct('<QQQ')
+SHARED_SEGMENT_HEADER = struct.Struct('<8sHHIQQ')  # magic, format, reserved, rides, version, directory length
+SHARED_SECTION_ALIGN = 64
+
+class SharedEligibilityIndex(EligibilityIndex):
+    # EligibilityIndex over a segment's packed masks; writers change a private live mask, tail and blocks
+    FLAG_ROW = EligibilityIndex.MAX_AGE + EligibilityIndex.MAX_WEIGHT + 2
+    UNRESTRICTED, WEATHER_SAFE, CALM, WET, DRY, LIVE = range(FLAG_ROW, FLAG_ROW + 6)
+
+    def __init__(self, masks, size):
+        self.masks = masks
+        self.size = size
+        self.live = None  # None: the segment's own live row
+        self.tail = []
+        self.blocks = []  # (first row, EligibilityIndex over the rows appended by one extend)
+        self._tail_masks = {}
+
+    def packed(self):
+        if self.live is None:
+            return self.masks
+        # Only the bytes from the first appended row on are unpacked to set the new rows' bits
+        blocks = list(self.blocks)
+        if self.tail:
+            blocks.append(self._tail_block())
+        segment_width = self.masks.shape[1]
+        masks = np.zeros((len(self.masks), (self.size + 7) // 8), dtype=np.uint8)
+        masks[:, :segment_width] = self.masks
+        if blocks:
+            first = min(start for start, _ in blocks) // 8
+            bits = np.unpackbits(masks[:, first:], axis=1, bitorder='little')
+            for start, block in blocks:
+                offset = start - first * 8
+                bits[:, offset:offset + block.size] |= np.unpackbits(block.packed(), axis=1, bitorder='little')[:, :block.size]
+            masks[:, first:] = np.packbits(bits, axis=1, bitorder='little')
+        masks[self.LIVE] = np.frombuffer(self.live.to_bytes(masks.shape[1], 'little'), dtype=np.uint8)
+        return masks
+
+    def _tail_block(self):
+        # The tail rides as a block: (first row, EligibilityIndex over the rows from there to the last one)
+        start = min(row for row, _ in self.tail)
+        size = max(row for row, _ in self.tail) + 1 - start
+        columns = {field: np.zeros(size, dtype=np.int64) for field in ('min_age', 'max_age', 'min_weight', 'max_weight', 'thrill', 'type')}
+        columns.update((field, np.zeros(size, dtype=bool)) for field in ('restricted', 'affected_by_weather'))
+        for row, ride in self.tail:
+            for field, values in columns.items():
+                values[row - start] = RIDE_TYPE_CODES[ride.type] if field == 'type' else getattr(ride, field)
+        return start, EligibilityIndex(columns, size)
+
+    def copy(self):
+        # Writers get a private, mutable view; the mapped masks are shared, not copied
+        clone = object.__new__(SharedEligibilityIndex)
+        clone.__dict__.update(self.__dict__)
+        clone.tail = list(self.tail)
+        clone.blocks = list(self.blocks)
+        clone._tail_masks = {}
+        return clone
+
+    def _own_live(self):
+        if self.live is None:
+            self.live = int.from_bytes(self.masks[self.LIVE].tobytes(), 'little')
+
+    def add(self, index, ride):
+        # Tail rides are folded in by packed(), never into the mapped masks
+        self._own_live()
+        self.live |= 1 << index
+        self.tail.append((index, ride))
+        self._tail_masks = {}
+        self.size = max(self.size, index + 1)
+
+    def remove(self, index):
+        self._own_live()
+        super().remove(index)
+
+    def remove_rows(self, rows):
+        self._own_live()
+        super().remove_rows(rows)
+
+    def extend(self, columns, end):
+        start = self.size
+        if end <= start:
+            return
+        block = EligibilityIndex({name: values[start:end] for name, values in columns.items()}, end - start)
+        self._own_live()
+        self.live |= block.live << start
+        self.blocks.append((start, block))
+        self.size = end
+        self._tail_masks = {}
+
+    def eligible(self, user_age, user_weight, bad_weather, ride_preference=''):
+        if not (0 <= user_age <= self.MAX_AGE and 0 <= user_weight <= self.MAX_WEIGHT):
+            return 0
+        rows = [self.UNRESTRICTED, user_age, self.MAX_AGE + 1 + user_weight]
+        if self.live is None:
+            rows.append(self.LIVE)
+        if bad_weather:
+            rows.append(self.WEATHER_SAFE)
+        if user_age > 40:
+            rows.append(self.CALM)
+        if ride_preference == 'dry_only':
+            rows.append(self.DRY)
+        elif ride_preference == 'wet_only':
+            rows.append(self.WET)
+        mask = int.from_bytes(np.bitwise_and.reduce(self.masks[rows], axis=0).tobytes(), 'little')
+        if self.live is None:
+            return mask
+        for start, block in self.blocks:
+            mask |= block.eligible(user_age, user_weight, bad_weather, ride_preference) << start
+        if self.tail:
+            mask |= self._tail_mask(user_age, user_weight, bad_weather, ride_preference)
+        return mask & self.live
+
+def _layout_state(layout):
+    # The parts of a ParkLayout that define it, as stored in a segment directory
+    if not layout.nodes:
+        return None
+    return {'nodes': layout.nodes, 'walkways': layout.walkways, 'ride_locations': layout.ride_locations,
+            'entrance': layout.entrance}
+
+def write_shared_segment(path, snapshot):
+    # Writes `snapshot` as an immutable segment file at `path` (through a temporary file and a rename)
+    catalog, size = snapshot.catalog, snapshot.size
+    sections = {name: snapshot.column(name) for name in RideCatalog.NUMERIC_COLUMNS + RideCatalog.FLAG_COLUMNS + ('type',)}
+    for name, strings in (('ids', catalog.ids), ('names', catalog.names)):
+        if isinstance(strings, SharedStrings) and len(strings) == size:
+            sections[f'{name}_offsets'], sections[f'{name}_blob'] = strings.offsets, strings.blob
+        elif isinstance(strings, AppendedStrings) and len(strings) == size:
+            sections[f'{name}_offsets'], sections[f'{name}_blob'] = strings.pack()
+        else:
+            sections[f'{name}_offsets'], sections[f'{name}_blob'] = SharedStrings.pack(strings[:size])
+    rows_by_id = catalog.rows_by_id
+    if isinstance(rows_by_id, SharedIdIndex) and len(rows_by_id) == size - len(snapshot.dead):
+        sections['id_keys'], sections['id_rows'] = rows_by_id.keys, rows_by_id.rows
+    elif isinstance(rows_by_id, RowIndex) and isinstance(rows_by_id.settled, SharedIdIndex):
+        sections['id_keys'], sections['id_rows'] = rows_by_id.settled.merged(rows_by_id.recent, size)
+    else:
+        sections['id_keys'], sections['id_rows'] = SharedIdIndex.pack(catalog.ids[:size], snapshot.dead)
+    sections['eligibility'] = snapshot.eligibility_index.packed()
+    sections['dead'] = np.array(sorted(snapshot.dead), dtype=np.int64)
+    sections['queue_deltas'] = np.zeros((CATALOG_SHARED_QUEUE_DELTAS, 2), dtype=np.int64)  # see SharedCatalog
+
+    directory = {'version': snapshot.version, 'plan_version': snapshot.plan_version, 'size': size,
+                 'queue_curves': {ride_id: curve.tolist() for ride_id, curve in snapshot.queue_curves.items()},
+                 'layout': _layout_state(snapshot.layout), 'sections': {}}
+    offset = 0
+    for name, values in sections.items():
+        directory['sections'][name] = [values.dtype.str, list(values.shape), offset]
+        offset += -(-values.nbytes // SHARED_SECTION_ALIGN) * SHARED_SECTION_ALIGN
+    encoded = json.dumps(directory, separators=(',', ':')).encode('utf-8')
+    header = SHARED_SEGMENT_HEADER.pack(SHARED_SEGMENT_MAGIC, SHARED_FORMAT, 0, size, snapshot.version, len(encoded))
+    data_start = -(-(len(header) + len(encoded)) // SHARED_SECTION_ALIGN) * SHARED_SECTION_ALIGN
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(encoded)
+        for name, values in sections.items():
+            f.seek(data_start + directory['sections'][name][2])
+            f.write(np.ascontiguousarray(values).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(temp_path, path)
+
+def read_shared_segment(path):
+    # Maps a segment read-only; returns (directory, {section: array view into the mapping}) or raises ValueError
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mapped) < SHARED_SEGMENT_HEADER.size:
+        raise ValueError('shared catalog segment is truncated')
+    magic, segment_format, _, _, _, directory_length = SHARED_SEGMENT_HEADER.unpack_from(mapped, 0)
+    if magic != SHARED_SEGMENT_MAGIC or segment_format != SHARED_FORMAT:
+        raise ValueError('not a shared catalog segment of a supported format')
+    start = SHARED_SEGMENT_HEADER.size
+    directory = json.loads(mapped[start:start + directory_length])
+    data_start = -(-(start + directory_length) // SHARED_SECTION_ALIGN) * SHARED_SECTION_ALIGN
+    sections = {}
+    for name, (dtype, shape, offset) in directory['sections'].items():
+        count = int(np.prod(shape))
+        sections[name] = np.frombuffer(mapped, dtype=np.dtype(dtype), count=count,
+                                       offset=data_start + offset).reshape(shape)
+    directory['data_start'] = data_start
+    return directory, sections
+
+class SharedCatalog:
+    # The control file and segments behind CATALOG_SHARED_PATH; writers publish under an exclusive flock
+    SUPPORTED = fcntl is not None
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._pid = None
+        self._fd = None
+        self._control = None
+        # The segment mapped last: (version, delta records, delta area offset), its snapshot and records applied
+        self._segment = None
+        self._segment_snapshot = None
+        self._applied = 0
+        self.publishes = 0
+        self.attaches = 0
+        self.queue_appends = 0
+        self.last_publish_ms = 0.0
+
+    def _open(self):
+        # Opened per process: an inherited descriptor would share its flock with the parent after a fork
+        if self._pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if os.fstat(fd).st_size < SHARED_CONTROL_HEADER.size:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(fd).st_size < SHARED_CONTROL_HEADER.size:
+                        os.pwrite(fd, SHARED_CONTROL_HEADER.pack(SHARED_CONTROL_MAGIC, SHARED_FORMAT, 0, 0, 0, 0, 0), 0)
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            control = mmap.mmap(fd, SHARED_CONTROL_HEADER.size, access=mmap.ACCESS_READ)
+            magic, control_format = SHARED_CONTROL_HEADER.unpack_from(control, 0)[:2]
+            if magic != SHARED_CONTROL_MAGIC or control_format != SHARED_FORMAT:
+                raise ValueError(f"{self.path} is not a shared catalog control file of a supported format")
+            self._fd, self._control, self._pid, self._depth = fd, control, os.getpid(), 0
+
+    def version(self):
+        # Newest catalog version, 0 before the first publish
+        return self.state()[0]
+
+    def state(self):
+        # (catalog version, segment version, queue delta records), read until two reads agree
+        self._open()
+        offset = SHARED_CONTROL_HEADER.size - SHARED_CONTROL_STATE.size
+        state = SHARED_CONTROL_STATE.unpack_from(self._control, offset)
+        while True:
+            again = SHARED_CONTROL_STATE.unpack_from(self._control, offset)
+            if again == state:
+                return state
+            state = again
+
+    def _segment_path(self, version):
+        return f"{self.path}.{version}"
+
+    @contextmanager
+    def locked(self):
+        # Exclusive across processes (flock) and threads (RLock); re-entrant within a thread
+        self._open()
+        with self._lock:
+            if self._depth == 0:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def publish(self, snapshot):
+        # Writes a segment for `snapshot` and points the control file at it; call under locked()
+        started = time.perf_counter()
+        write_shared_segment(self._segment_path(snapshot.version), snapshot)
+        os.pwrite(self._fd, SHARED_CONTROL_STATE.pack(snapshot.version, snapshot.version, 0),
+                  SHARED_CONTROL_HEADER.size - SHARED_CONTROL_STATE.size)
+        prefix = os.path.basename(self.path) + '.'
+        directory = os.path.dirname(os.path.abspath(self.path))
+        for name in os.listdir(directory):
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit() and int(suffix) != snapshot.version:
+                try:
+                    os.unlink(os.path.join(directory, name))  # workers still mapping it keep their pages
+                except OSError:
+                    pass
+        self.publishes += 1
+        self.last_publish_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    def append_queue_times(self, snapshot, rows, queue_times):
+        # Appends live queue times to the current segment's delta area; False when a whole segment is needed
+        version, segment, count = self.state()
+        if self._segment is None or self._segment[0] != segment or self._segment_snapshot.version != version \
+                or count + len(rows) > len(self._segment[1]):
+            return False
+        records = np.column_stack([rows, queue_times]).astype('<i8')
+        with open(self._segment_path(segment), 'r+b') as f:
+            os.pwrite(f.fileno(), records.tobytes(), self._segment[2] + count * records.itemsize * 2)
+        os.pwrite(self._fd, SHARED_CONTROL_STATE.pack(snapshot.version, segment, count + len(rows)),
+                  SHARED_CONTROL_HEADER.size - SHARED_CONTROL_STATE.size)
+        self._segment_snapshot, self._applied = snapshot, count + len(rows)
+        self.queue_appends += 1
+        return True
+
+    def attach(self, current):
+        # Maps the newest catalog version as a CatalogSnapshot, or None if nothing has been published
+        while True:
+            version, segment, count = self.state()
+            if not version:
+                return None
+            if self._segment is not None and self._segment[0] == segment:
+                return self._with_queue_deltas(version, count)
+            try:
+                directory, sections = read_shared_segment(self._segment_path(segment))
+                break
+            except FileNotFoundError:
+                if self.state()[1] == segment:
+                    raise
+                # Superseded between reading the version and opening it
+
+        size = directory['size']
+        catalog = object.__new__(RideCatalog)
+        catalog.size = size
+        catalog.columns = {name: sections[name]
+                           for name in RideCatalog.NUMERIC_COLUMNS + RideCatalog.FLAG_COLUMNS + ('type',)}
+        catalog.ids = SharedStrings(sections['ids_offsets'], sections['ids_blob'])
+        catalog.names = SharedStrings(sections['names_offsets'], sections['names_blob'])
+        catalog.rows_by_id = SharedIdIndex(sections['id_keys'], sections['id_rows'])
+        catalog.read_only = True
+
+        queue_curves = {ride_id: np.array(curve, dtype=np.int64) for ride_id, curve in directory['queue_curves'].items()}
+        if queue_curves.keys() == current.queue_curves.keys() and all(
+                np.array_equal(curve, current.queue_curves[ride_id]) for ride_id, curve in queue_curves.items()):
+            queue_curves = current.queue_curves
+        layout = current.layout
+        if directory['layout'] != json.loads(json.dumps(_layout_state(layout))):
+            layout = ParkLayout(**directory['layout']) if directory['layout'] else EMPTY_LAYOUT
+        self.attaches += 1
+        self._segment = (segment, sections['queue_deltas'],
+                         directory['data_start'] + directory['sections']['queue_deltas'][2])
+        self._segment_snapshot = CatalogSnapshot(
+            directory['version'], catalog, size, SharedEligibilityIndex(sections['eligibility'], size),
+            directory['plan_version'], queue_curves, layout, Tombstones(frozenset(sections['dead'].tolist())))
+        self._applied = 0
+        return self._with_queue_deltas(version, count)
+
+    def _with_queue_deltas(self, version, count):
+        # The mapped segment's snapshot with its first `count` delta records applied, as catalog `version`
+        if count > self._applied:
+            records = self._segment[1][self._applied:count][::-1]
+            rows, last = np.unique(records[:, 0], return_index=True)
+            self._segment_snapshot = self._segment_snapshot.with_queue_times(rows, records[last, 1], version)
+            self._applied = count
+        return self._segment_snapshot
+
+    def stats(self):
+        version, segment, count = self.state()
+        return {'path': self.path, 'version': version, 'segment': segment, 'queue_deltas': count,
+                'publishes': self.publishes, 'attaches': self.attaches, 'queue_appends': self.queue_appends,
+                'last_publish_ms': self.last_publish_ms}
@@ -1,26 +1,70 @@
 import time
 import os
-import heapq
-import mysql.connector
+import sys
+import atexit
+import random
+import logging
+import logging.handlers
+import io
+import csv
+import json
+import base64
+import hashlib
+import mmap
+import struct
+import zlib
+import queue
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+import numpy as np
 from mysql.connector import Error
-from flask import Flask, request, jsonify
+from mysql.connector.errors import IntegrityError
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
+from urllib.parse import urlencode
 from dotenv import load_dotenv
 
+load_dotenv()   # environment variables, read by the modules below as they are imported
+from metrics import metrics
+from db import Database
+from catalog import (RIDE_FIELDS, RIDE_TABLES, RIDE_COLUMNS, RIDE_TYPES, RIDE_TYPE_CODES, QUEUE_SLOT_MINUTES,
+                     QUEUE_SLOTS_PER_DAY, Ride, RowIndex, RideCatalog, ParkLayout, CatalogSnapshot, SharedStrings)
+from shared_catalog import SHARED_SECTION_ALIGN, SharedCatalog
+from change_log import RideChangeLog
+from live_queue import QUEUE_APPLY_INTERVAL, QUEUE_PERSIST_INTERVAL, LiveQueueFeed
+from planner import (PLANNING_ENGINES, RIDE_PREFERENCES, PARETO_DEFAULT_ALTERNATIVES, PARETO_MAX_ALTERNATIVES,
+                     PARK_OPENING_TIME, plan_stage_seconds, PlanningContext, find_eligible_rides,
+                     find_group_eligible_rides, generate_optimal_plan)
+
 # Flask Setup
 app = Flask(__name__)
 CORS(app)
 bcrypt = Bcrypt(app)
-load_dotenv()   # environment variables
 
 # JWT Configuration 
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your_super_secret_jwt_key_here_please_change_me')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES_HOURS', 1)))
 
+# Authentication Configuration
+AUTH_TOKEN_CACHE_SIZE = int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 4096))  # verified tokens kept; 0 disables
+AUTH_USER_CACHE_SIZE = int(os.environ.get('AUTH_USER_CACHE_SIZE', 1024))  # user records kept; 0 disables
+AUTH_USER_CACHE_TTL = float(os.environ.get('AUTH_USER_CACHE_TTL', 30))  # seconds a user record is reused
+AUTH_BCRYPT_WORKERS = int(os.environ.get('AUTH_BCRYPT_WORKERS', 2))  # threads verifying passwords
+AUTH_BCRYPT_MAX_PENDING = int(os.environ.get('AUTH_BCRYPT_MAX_PENDING', 16))  # logins admitted at once; more get a 503
+AUTH_BCRYPT_TIMEOUT = float(os.environ.get('AUTH_BCRYPT_TIMEOUT', 10))  # seconds a login waits for its verification
+
+# Logging Configuration
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text').lower()  # 'text' (colored on a terminal) or 'json'
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # records beyond this are dropped, never waited on
+# Per-logger sampling of DEBUG records, as "logger=rate,..." (rate between 0 and 1)
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', 'thrill_safari.planner=0.01,thrill_safari.api=0.1')
+
 # Color Definitions (for console output)
 COLOR_RESET = "\x1B[0m"
 COLOR_RED = "\x1B[31m"
@@ -33,129 +77,778 @@ COLOR_WHITE = "\x1B[37m"
 BOLD = "\x1B[1m"
 UNDERLINE = "\x1B[4m"
 
-# DB Configuration
-DB_CONFIG = {
-    'host': os.environ.get('DB_HOST', 'localhost'),
-    'database': os.environ.get('DB_NAME', 'theme_park_db'),
-    'user': os.environ.get('DB_USER', 'root'),
-    'password': os.environ.get('DB_PASSWORD', 'sql##123'),
-    'port': int(os.environ.get('DB_PORT', 3306))
-}
+# Logging
+class TextLogFormatter(logging.Formatter):
+    # "time level logger: message key=value ..." with the level colored when writing to a terminal
+    LEVEL_COLORS = {
+        logging.DEBUG: COLOR_BLUE,
+        logging.INFO: COLOR_GREEN,
+        logging.WARNING: COLOR_YELLOW,
+        logging.ERROR: COLOR_RED,
+        logging.CRITICAL: BOLD + COLOR_RED
+    }
 
-# Model Classes
-class Ride:
-    # Represents a single ride in the theme park with its attributes
-    def __init__(self, id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, vip_access,
-                  affected_by_weather, type, min_weight=0, max_weight=200, min_age=0, max_age=100):
-        self.id = id
-        self.name = name
-        self.thrill = thrill
-        self.duration = duration
-        self.queue_time = queue_time
-        self.fatigue = fatigue
-        self.mandatory = mandatory
-        self.restricted = restricted
-        self.vip_access = vip_access
-        self.affected_by_weather = affected_by_weather
-        self.type = type
-        self.min_weight = min_weight
-        self.max_weight = max_weight
-        self.min_age = min_age
-        self.max_age = max_age
-
-class ParkModel:
-    # Manages the overall theme park state, like rides,user preferences
-    def __init__(self, total_time, is_vip, bad_weather, user_age=25, user_weight=70): 
-        self.rides = []
-        self.ride_count = 0
-        self.total_time = total_time
-        self.is_vip = is_vip
-        self.bad_weather = bad_weather
-        self.user_age = user_age
-        self.user_weight = user_weight
-        self.db_connection = None
-        self._connect_db()
-        self._create_tables()
-        self.load_rides_from_db()
+    def __init__(self, color):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+        self.color = color
 
-    def _connect_db(self):
-        # Establishes a connection to the MySQL database.
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        if self.color:
+            line = f"{self.LEVEL_COLORS.get(record.levelno, '')}{line}{COLOR_RESET}"
+        return line
+
+class JsonLogFormatter(logging.Formatter):
+    # One JSON object per line, for log shippers
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + '.%03dZ' % record.msecs,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    # Never blocks the logging thread: when the queue is full the record is counted and dropped
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
         try:
-            self.db_connection = mysql.connector.connect(**DB_CONFIG)
-            if self.db_connection.is_connected():
-                print(f"{COLOR_GREEN}Successfully connected to MySQL database.{COLOR_RESET}")
-        except Error as e:
-            print(f"{COLOR_RED}Error connecting to MySQL database: {e}{COLOR_RESET}")
-            self.db_connection = None
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class DebugSampler(logging.Filter):
+    # Lets through only a `rate` fraction of DEBUG records; other levels always pass
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+def setup_logging():
+    # Routes thrill_safari.* records through a bounded queue drained to stdout; safe to call twice
+    root = logging.getLogger('thrill_safari')
+    if any(isinstance(handler, DroppingQueueHandler) for handler in root.handlers):
+        return root
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == 'json':
+        stream_handler.setFormatter(JsonLogFormatter())
+    else:
+        stream_handler.setFormatter(TextLogFormatter(color=sys.stdout.isatty()))
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    for entry in LOG_SAMPLE_RATES.split(','):
+        name, _, rate = entry.partition('=')
+        if name.strip() and rate.strip():
+            logging.getLogger(name.strip()).addFilter(DebugSampler(float(rate)))
+    return root
+
+log = setup_logging()
+db_log = logging.getLogger('thrill_safari.db')
+catalog_log = logging.getLogger('thrill_safari.catalog')
+api_log = logging.getLogger('thrill_safari.api')
+auth_log = logging.getLogger('thrill_safari.auth')
+
+# Metrics
+http_request_seconds = metrics.histogram(
+    'thrill_safari_http_request_duration_seconds', 'Time spent handling HTTP requests.', ('route', 'method', 'status'))
+auth_seconds = metrics.histogram(
+    'thrill_safari_auth_duration_seconds', 'Time spent authenticating, by step (token, user_lookup, password, login).',
+    ('step',))
+auth_rejections = metrics.counter('thrill_safari_auth_rejections_total', 'Authentication attempts turned away.', ('reason',))
+
+# DB Migration Configuration
+DB_MIGRATION_LOCK_TIMEOUT = int(os.environ.get('DB_MIGRATION_LOCK_TIMEOUT', 60))  # seconds to wait for another migrator
+DB_MIGRATION_LOCK_NAME = 'thrill_safari_migrations'
+
+# Catalog Snapshot File Configuration
+CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH', 'catalog_snapshot.bin')  # '' disables the file
+CATALOG_SNAPSHOT_SAVE_DELAY = float(os.environ.get('CATALOG_SNAPSHOT_SAVE_DELAY', 1))  # seconds to coalesce writes
+# Catalog shared by every worker process on the host, e.g. /dev/shm/thrill_safari_catalog; '' keeps it per process
+CATALOG_SHARED_PATH = os.environ.get('CATALOG_SHARED_PATH', '')
+CATALOG_RECONCILE_INTERVAL = float(os.environ.get('CATALOG_RECONCILE_INTERVAL', 30))  # DB retry period during outages
+
+# Bulk Import Configuration
+BULK_IMPORT_CHUNK_SIZE = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE', 1000))  # rows per INSERT transaction
+BULK_IMPORT_MAX_ERRORS = int(os.environ.get('BULK_IMPORT_MAX_ERRORS', 1000))  # row errors kept in the report
+
+# Plan Request Configuration
+PLAN_BATCH_MAX_SIZE = int(os.environ.get('PLAN_BATCH_MAX_SIZE', 500))  # profiles per /api/generate_plans call
+PLAN_BATCH_PROCESSES = int(os.environ.get('PLAN_BATCH_PROCESSES', 0))  # >0 fans large batches out to a process pool
+PLAN_BATCH_PARALLEL_MIN = int(os.environ.get('PLAN_BATCH_PARALLEL_MIN', 64))  # smallest batch worth fanning out
+GROUP_MAX_MEMBERS = int(os.environ.get('GROUP_MAX_MEMBERS', 100))  # members per /api/generate_group_plan call
+GROUP_KIDS_MAX_AGE = int(os.environ.get('GROUP_KIDS_MAX_AGE', 12))  # members this age or younger take the kids segment
+GROUP_ENGINES = ['heap', 'knapsack']
+
+# Plan Cache Configuration
+PLAN_CACHE_SIZE = int(os.environ.get('PLAN_CACHE_SIZE', 4096))  # 0 disables the cache
+PLAN_CACHE_TTL_SECONDS = float(os.environ.get('PLAN_CACHE_TTL_SECONDS', 300))
 
-    def _create_tables(self):
-        if not self.db_connection:
-            print(f"{COLOR_RED}Cannot create tables: No database connection.{COLOR_RESET}")
+# Ride Listing Configuration
+RIDES_CACHE_SIZE = int(os.environ.get('RIDES_CACHE_SIZE', 256))  # serialized /api/rides pages kept in memory
+RIDES_PAGE_MAX_LIMIT = int(os.environ.get('RIDES_PAGE_MAX_LIMIT', 1000))
+
+# Live Queue Times Configuration
+QUEUE_UPDATES_MAX_BATCH = int(os.environ.get('QUEUE_UPDATES_MAX_BATCH', 50000))  # updates per request
+QUEUE_MAX_MINUTES = 1440
+QUEUE_MAX_CLOCK_SKEW = 60  # seconds an update's timestamp may run ahead of the server clock
+
+def ride_insert_query(table_name):
+    # INSERT for one ride row; parameters are the add_ride arguments without the type
+    return f"""
+        INSERT INTO {table_name} (id, name, thrill, duration, queue_time, fatigue, mandatory, restricted,
+          vip_access, affected_by_weather, min_weight, max_weight, min_age, max_age)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+         """
+
+RIDE_COLUMN_POSITIONS = [RIDE_FIELDS.index(column) for column in RIDE_COLUMNS]
+
+# Catalog Snapshot File
+# Header (with a CRC-32 of the payload), a JSON section directory, then 64-byte aligned columns
+CATALOG_FILE_MAGIC = b'TSCATLG\x00'
+CATALOG_FILE_FORMAT = 2
+# magic, format, reserved, rides, generation, saved_at, directory length, payload length, crc32
+CATALOG_FILE_HEADER = struct.Struct('<8sHHIQdIQI')
+CATALOG_FILE_SECTIONS = RideCatalog.NUMERIC_COLUMNS + RideCatalog.FLAG_COLUMNS + ('type', 'ids_offsets', 'ids_blob',
+                                                                                   'names_offsets', 'names_blob')
+
+def write_catalog_file(path, snapshot, generation):
+    # Writes the live rides of `snapshot` next to `path` and renames it into place
+    rows = np.flatnonzero(np.isin(np.arange(snapshot.size), np.array(sorted(snapshot.dead), dtype=np.int64),
+                                  invert=True))
+    sections = {name: snapshot.column(name)[rows] for name in RideCatalog.NUMERIC_COLUMNS + RideCatalog.FLAG_COLUMNS + ('type',)}
+    for name, strings in (('ids', snapshot.catalog.ids), ('names', snapshot.catalog.names)):
+        sections[f'{name}_offsets'], sections[f'{name}_blob'] = SharedStrings.pack([strings[row] for row in rows.tolist()])
+    directory = {}
+    offset = 0
+    for name, values in sections.items():
+        directory[name] = [values.dtype.str, list(values.shape), offset]
+        offset += -(-values.nbytes // SHARED_SECTION_ALIGN) * SHARED_SECTION_ALIGN
+    encoded = json.dumps(directory, separators=(',', ':')).encode('utf-8')
+    data_start = -(-(CATALOG_FILE_HEADER.size + len(encoded)) // SHARED_SECTION_ALIGN) * SHARED_SECTION_ALIGN
+    payload = bytearray(data_start - CATALOG_FILE_HEADER.size + offset)
+    payload[:len(encoded)] = encoded
+    for name, values in sections.items():
+        start = data_start - CATALOG_FILE_HEADER.size + directory[name][2]
+        payload[start:start + values.nbytes] = np.ascontiguousarray(values).tobytes()
+    header = CATALOG_FILE_HEADER.pack(CATALOG_FILE_MAGIC, CATALOG_FILE_FORMAT, 0, len(rows), generation,
+                                      time.time(), len(encoded), len(payload), zlib.crc32(payload))
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+def read_catalog_file(path):
+    # Memory-maps and verifies a catalog file; returns (generation, saved_at, RideCatalog) or raises ValueError
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < CATALOG_FILE_HEADER.size:
+            raise ValueError('catalog file is truncated')
+        magic, file_format, _, ride_count, generation, saved_at, directory_length, length, crc = \
+            CATALOG_FILE_HEADER.unpack_from(mapped, 0)
+        if magic != CATALOG_FILE_MAGIC or file_format != CATALOG_FILE_FORMAT:
+            raise ValueError('not a catalog file of a supported format')
+        with memoryview(mapped) as view:
+            payload = view[CATALOG_FILE_HEADER.size:CATALOG_FILE_HEADER.size + length]
+            valid = len(payload) == length and zlib.crc32(payload) == crc
+            payload.release()
+        if not valid:
+            raise ValueError('catalog file checksum mismatch')
+        directory = json.loads(mapped[CATALOG_FILE_HEADER.size:CATALOG_FILE_HEADER.size + directory_length])
+        if set(directory) != set(CATALOG_FILE_SECTIONS):
+            raise ValueError('catalog file sections mismatch')
+        return generation, saved_at, _catalog_from_sections(mapped, directory, ride_count)
+
+def _catalog_from_sections(mapped, directory, ride_count):
+    # A RideCatalog copied out of a mapped catalog file, dropping the views before it is unmapped
+    data_start = -(-(CATALOG_FILE_HEADER.size + len(json.dumps(directory, separators=(',', ':')).encode('utf-8')))
+                   // SHARED_SECTION_ALIGN) * SHARED_SECTION_ALIGN
+    sections = {}
+    for name, (dtype, shape, offset) in directory.items():
+        sections[name] = np.frombuffer(mapped, dtype=np.dtype(dtype), count=int(np.prod(shape)), offset=data_start + offset)
+    if any(len(sections[name]) != ride_count for name in CATALOG_FILE_SECTIONS if not name.startswith(('ids', 'names'))):
+        raise ValueError('catalog file ride count mismatch')
+    catalog = RideCatalog(ride_count)
+    for name in RideCatalog.NUMERIC_COLUMNS + RideCatalog.FLAG_COLUMNS + ('type',):
+        catalog.columns[name][:ride_count] = sections[name]
+    for name in ('ids', 'names'):
+        offsets, blob = sections[f'{name}_offsets'].tolist(), sections[f'{name}_blob'].tobytes()
+        if len(offsets) != ride_count + 1:
+            raise ValueError('catalog file ride count mismatch')
+        setattr(catalog, name, [blob[offsets[row]:offsets[row + 1]].decode('utf-8') for row in range(ride_count)])
+    catalog.rows_by_id = RowIndex(dict(zip(catalog.ids, range(ride_count))))
+    catalog.size = ride_count
+    return catalog
+
+# Seed Data
+# Land Rides 
+land_rides_data = [
+    ("L001", "Mission Interstellar", 9, 3, 25, 8, False, False, True, True, "land", 40, 120, 12, 65),
+    ("L002", "Sky Wheel", 3, 5, 10, 2, False, False, True, True, "land", 0, 150, 3, 80),
+    ("L003", "Adventures of Chikku", 4, 4, 8, 3, False, False, False, False, "land", 0, 80, 5, 16),
+    ("L004", "Twist and Shout", 7, 3, 20, 6, False, False, True, True, "land", 35, 110, 10, 60),
+    ("L005", "Rockin' Tug", 5, 4, 12, 4, False, False, True, True, "land", 25, 100, 8, 70),
+    ("L006", "Termite Coaster and Train", 6, 5, 15, 5, False, False, False, False, "land", 30, 120, 10, 75),
+    ("L007", "Pirate Ship", 8, 4, 18, 7, False, True, True, True, "land", 40, 130, 12, 65), # RESTRICTED
+    ("L008", "Wonder Splash", 5, 3, 10, 4, False, False, True, True, "land", 20, 100, 6, 70),
+    ("L009", "Grand Prix", 6, 6, 15, 5, False, False, True, False, "land", 25, 120, 8, 75),
+    ("L010", "Crazy Cars", 4, 3, 8, 3, False, False, False, False, "land", 15, 90, 5, 80),
+    ("L011", "Sky Tilt (New)", 8, 3, 22, 7, False, False, True, True, "land", 45, 120, 14, 60),
+    ("L012", "Hyperverse", 10, 2, 30, 9, False, True, True, True, "land", 50, 110, 16, 55), # RESTRICTED
+    ("L013", "Recoil", 9, 3, 28, 8, False, False, True, True, "land", 45, 120, 14, 60),
+    ("L014", "Maverick", 9, 3, 25, 8, False, False, True, True, "land", 45, 115, 14, 65),
+    ("L015", "Equinox", 8, 4, 20, 7, False, False, True, True, "land", 40, 120, 12, 65),
+    ("L016", "Techno Jump", 7, 2, 15, 6, False, False, True, True, "land", 35, 110, 10, 70),
+    ("L017", "Twin Flip T Rex", 8, 3, 22, 7, False, False, True, True, "land", 40, 120, 12, 65),
+    ("L018", "Wonderla Bamba", 6, 4, 12, 5, False, False, True, True, "land", 30, 120, 8, 75),
+    ("L019", "G Fall", 10, 1, 35, 9, False,True, True, True, "land", 50, 110, 18, 50)
+]
+
+# Water Rides 
+water_rides_data = [
+    ("W001", "Rainbow Loooops", 8, 4, 25, 7, False, False, True, True, "water", 40, 120, 12, 65),
+    ("W002", "Drop Loop", 9, 3, 30, 8, False, True, True, True, "water", 45, 110, 14, 60), # RESTRICTED
+    ("W003", "Rain Disco", 6, 5, 15, 5, False, False, True, True, "water", 25, 120, 8, 75),
+    ("W004", "Boomerang", 7, 4, 20, 6, False, False, True, True, "water", 35, 115, 10, 70),
+    ("W005", "Pirate Lagoon", 5, 6, 12, 4, False, False, True, True, "water", 20, 130, 6, 80),
+    ("W006", "Fun Racers", 4, 3, 8, 3, False, False, False, True, "water", 15, 100, 5, 75),
+    ("W007", "Uphill Racer", 6, 4, 15, 5, False, False, True, True, "water", 30, 120, 8, 70),
+    ("W008", "Bullet", 8, 2, 25, 7, False, False, True, True, "water", 40, 115, 12, 65),
+    ("W009", "Wavy and Vertical Fall", 9, 3, 28, 8, False, False, True, True, "water", 45, 120, 14, 60),
+    ("W010", "Harakiri", 10, 2, 35, 9, False, True, True, True, "water", 50, 110, 16, 55), # RESTRICTED
+    ("W011", "Mammoth", 7, 5, 18, 6, False, False, True, True, "water", 35, 130, 10, 70),
+    ("W012", "Splash", 3, 4, 5, 2, False, False, False, True, "water", 0, 150, 3, 85),
+    ("W013", "Wave Pools", 2, 8, 5, 2, False, False, False, True, "water", 0, 200, 0, 90),
+    ("W014", "Lazy River", 1, 10, 3, 1, False, False, False, True, "water", 0, 200, 0, 95),
+    ("W015", "Sea Lagoon", 3, 6, 5, 2, False, False, False, True, "water", 0, 180, 3, 85),
+    ("W016", "Drop and Tornado", 8, 4, 22, 7, False, False, True, True, "water", 40, 120, 12, 65),
+    ("W017", "Screw", 7, 3, 18, 6, False, False, True, True, "water", 35, 115, 10, 70)
+]
+
+# Kids Rides 
+kids_rides_data = [
+    ("K001", "Mini Coaster", 3, 5, 10, 2, False, False, False, False, "kids", 15, 80, 4, 14),
+    ("K002", "Bumper Cars", 2, 8, 5, 1, False, False, False, False, "kids", 20, 90, 6, 16),
+    ("K003", "Kiddie Swings", 2, 3, 5, 1, False, False, False, False, "kids", 10, 70, 3, 12),
+    ("K004", "Mini Pirate Ship", 3, 3, 8, 2, False, False, False, False, "kids", 15, 80, 5, 14),
+    ("K005", "Kiddies Wheel", 2, 4, 6, 1, False, False, False, False, "kids", 10, 85, 3, 15),
+    ("K006", "Coco Cup", 2, 3, 5, 1, False, False, False, False, "kids", 12, 75, 4, 13),
+    ("K007", "Carousel", 1, 4, 3, 1, False, False, False, False, "kids", 5, 90, 2, 16),
+    ("K008", "Flying Jumbo", 2, 3, 6, 1, False, False, False, False, "kids", 10, 80, 3, 14),
+    ("K009", "Convoy", 2, 4, 5, 1, False, False, False, False, "kids", 8, 85, 3, 15),
+    ("K010", "Moon Base", 3, 3, 8, 2, False, False, False, False, "kids", 15, 80, 4, 14),
+    ("K011", "Mini Top Spin", 3, 3, 10, 2, False, True, False, False, "kids", 18, 85, 5, 16), # RESTRICTED
+    ("K012", "Circus Train", 1, 5, 3, 1, False, False, False, False, "kids", 5, 100, 2, 18),
+    ("K013", "Funky Monkey", 2, 4, 6, 1, False, False, False, False, "kids", 12, 80, 4, 15)
+]
+
+DEFAULT_RIDES = land_rides_data + water_rides_data + kids_rides_data
+
+# Rides that stay restricted after the default restriction update (taken as 5 )
+DEFAULT_RESTRICTED_RIDES = {
+    'L007',  # Pirate Ship
+    'L012',  # Hyperverse
+    'W002',  # Drop Loop
+    'W010',  # Harakiri
+    'K011'   # Mini Top Spin
+}
+
+# Schema Migrations
+# Applied in order and recorded in schema_version; a restart on a current schema runs no DDL
+RIDE_TABLE_SCHEMA = """
+(
+id VARCHAR(10) PRIMARY KEY,
+name VARCHAR(50) NOT NULL,
+thrill INT NOT NULL,
+duration INT NOT NULL,
+queue_time INT NOT NULL,
+fatigue INT NOT NULL,
+mandatory BOOLEAN NOT NULL,
+restricted BOOLEAN NOT NULL,
+vip_access BOOLEAN NOT NULL,
+affected_by_weather BOOLEAN NOT NULL,
+min_weight INT DEFAULT 0,
+max_weight INT DEFAULT 200,
+min_age INT DEFAULT 0,
+max_age INT DEFAULT 100
+)
+"""
+
+def _migrate_create_tables(tx):
+    for table_name in RIDE_TABLES.values():
+        tx.execute(f"CREATE TABLE IF NOT EXISTS {table_name} {RIDE_TABLE_SCHEMA}")
+    tx.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        staff_id VARCHAR(50) PRIMARY KEY,
+        password_hash VARCHAR(255) NOT NULL,
+        role VARCHAR(20) NOT NULL DEFAULT 'guest'
+    )
+    """)
+
+def _migrate_drop_legacy_rides(tx):
+    # The single 'rides' table predates the per-type tables
+    tx.execute("DROP TABLE IF EXISTS rides")
+
+def _migrate_seed_default_rides(tx):
+    # Seeds the default catalog only into a database that has no rides at all
+    for table_name in RIDE_TABLES.values():
+        if tx.execute(f"SELECT COUNT(*) FROM {table_name}").fetchone()[0]:
             return
-        cursor = self.db_connection.cursor()
-        
-        # Define table schemas for rides
-        ride_table_schema = """
-        (
-        id VARCHAR(10) PRIMARY KEY,
-        name VARCHAR(50) NOT NULL,
-        thrill INT NOT NULL,
-        duration INT NOT NULL,
-        queue_time INT NOT NULL,
-        fatigue INT NOT NULL,
-        mandatory BOOLEAN NOT NULL,
-        restricted BOOLEAN NOT NULL,
-        vip_access BOOLEAN NOT NULL,
-        affected_by_weather BOOLEAN NOT NULL,
-        min_weight INT DEFAULT 0,
-        max_weight INT DEFAULT 200,
-        min_age INT DEFAULT 0,
-        max_age INT DEFAULT 100
+    rows_by_table = {}
+    for ride_data in DEFAULT_RIDES:
+        row = ride_data[:10] + ride_data[11:]  # drop 'type'; it is implied by the table
+        rows_by_table.setdefault(RIDE_TABLES[ride_data[10]], []).append(row)
+    for table_name, rows in rows_by_table.items():
+        tx.executemany(f"INSERT INTO {table_name} ({', '.join(RIDE_COLUMNS)}) "
+                       f"VALUES ({', '.join(['%s'] * len(RIDE_COLUMNS))})", rows)
+
+def _migrate_default_restrictions(tx):
+    # Update all rides to be non-restricted first, then restrict the default set
+    for table_name in RIDE_TABLES.values():
+        tx.execute(f"UPDATE {table_name} SET restricted = FALSE")
+    for ride_id in DEFAULT_RESTRICTED_RIDES:
+        # Determine which table based on ride ID prefix
+        table_name = {'L': 'land_rides', 'W': 'water_rides', 'K': 'kids_rides'}.get(ride_id[0])
+        if table_name:
+            tx.execute(f"UPDATE {table_name} SET restricted = TRUE WHERE id = %s", (ride_id,))
+
+def _migrate_seed_admin_user(tx):
+    # Adds the default admin user if the users table is empty
+    if tx.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+        password_hash = bcrypt.generate_password_hash("password123").decode('utf-8')
+        tx.execute("INSERT INTO users (staff_id, password_hash, role) VALUES (%s, %s, %s)",
+                   ("admin", password_hash, "admin"))
+        db_log.info("Default admin user 'admin' added successfully. Password: password123")
+
+def _migrate_create_queue_curves(tx):
+    # One row per ride with a measured queue curve: QUEUE_SLOTS_PER_DAY comma-separated minutes
+    tx.execute("""
+    CREATE TABLE IF NOT EXISTS ride_queue_curves (
+        ride_id VARCHAR(10) PRIMARY KEY,
+        curve VARCHAR(1024) NOT NULL
+    )
+    """)
+
+def _migrate_create_park_layout(tx):
+    # Walkway graph for route planning: nodes with map coordinates, two-way walkways and ride locations
+    tx.execute("""
+    CREATE TABLE IF NOT EXISTS park_nodes (
+        id VARCHAR(32) PRIMARY KEY,
+        x INT NOT NULL DEFAULT 0,
+        y INT NOT NULL DEFAULT 0,
+        is_entrance BOOLEAN NOT NULL DEFAULT FALSE
+    )
+    """)
+    tx.execute("""
+    CREATE TABLE IF NOT EXISTS park_walkways (
+        node_a VARCHAR(32) NOT NULL,
+        node_b VARCHAR(32) NOT NULL,
+        minutes INT NOT NULL,
+        PRIMARY KEY (node_a, node_b)
+    )
+    """)
+    tx.execute("""
+    CREATE TABLE IF NOT EXISTS ride_locations (
+        ride_id VARCHAR(10) PRIMARY KEY,
+        node_id VARCHAR(32) NOT NULL
+    )
+    """)
+
+def _migrate_create_ride_changes(tx):
+    # Ride table change log, filled by triggers; queue_time-only updates are not logged
+    if tx.backend == 'sqlite':
+        tx.execute("""
+        CREATE TABLE IF NOT EXISTS ride_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            ride_id VARCHAR(10) NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-        """
-        
-        # users table
-        create_users_table_query = """
-        CREATE TABLE IF NOT EXISTS users (
-            staff_id VARCHAR(50) PRIMARY KEY,
-            password_hash VARCHAR(255) NOT NULL,
-            role VARCHAR(20) NOT NULL DEFAULT 'guest'
+        """)
+    else:
+        tx.execute("""
+        CREATE TABLE IF NOT EXISTS ride_changes (
+            seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+            ride_id VARCHAR(10) NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
-        """
-        
+        """)
+    tracked = [column for column in RIDE_COLUMNS if column != 'queue_time']
+    for table_name in RIDE_TABLES.values():
+        if tx.backend == 'sqlite':
+            unchanged = ' AND '.join(f"OLD.{column} IS NEW.{column}" for column in tracked)
+            tx.execute(f"CREATE TRIGGER IF NOT EXISTS {table_name}_log_insert AFTER INSERT ON {table_name} "
+                       f"BEGIN INSERT INTO ride_changes (ride_id) VALUES (NEW.id); END")
+            tx.execute(f"CREATE TRIGGER IF NOT EXISTS {table_name}_log_update AFTER UPDATE ON {table_name} "
+                       f"WHEN NOT ({unchanged}) BEGIN "
+                       f"INSERT INTO ride_changes (ride_id) SELECT OLD.id WHERE OLD.id IS NOT NEW.id; "
+                       f"INSERT INTO ride_changes (ride_id) VALUES (NEW.id); END")
+            tx.execute(f"CREATE TRIGGER IF NOT EXISTS {table_name}_log_delete AFTER DELETE ON {table_name} "
+                       f"BEGIN INSERT INTO ride_changes (ride_id) VALUES (OLD.id); END")
+        else:
+            # MySQL has no CREATE TRIGGER IF NOT EXISTS before 8.0; dropping first lets the migration re-run
+            for event in ('insert', 'update', 'delete'):
+                tx.execute(f"DROP TRIGGER IF EXISTS {table_name}_log_{event}")
+            unchanged = ' AND '.join(f"OLD.{column} <=> NEW.{column}" for column in tracked)
+            tx.execute(f"CREATE TRIGGER {table_name}_log_insert AFTER INSERT ON {table_name} FOR EACH ROW "
+                       f"INSERT INTO ride_changes (ride_id) VALUES (NEW.id)")
+            tx.execute(f"CREATE TRIGGER {table_name}_log_update AFTER UPDATE ON {table_name} FOR EACH ROW BEGIN "
+                       f"IF OLD.id <> NEW.id THEN INSERT INTO ride_changes (ride_id) VALUES (OLD.id); END IF; "
+                       f"IF NOT ({unchanged}) THEN INSERT INTO ride_changes (ride_id) VALUES (NEW.id); END IF; END")
+            tx.execute(f"CREATE TRIGGER {table_name}_log_delete AFTER DELETE ON {table_name} FOR EACH ROW "
+                       f"INSERT INTO ride_changes (ride_id) VALUES (OLD.id)")
+
+MIGRATIONS = [
+    (1, 'create ride and user tables', _migrate_create_tables),
+    (2, 'drop legacy rides table', _migrate_drop_legacy_rides),
+    (3, 'seed default rides into an empty catalog', _migrate_seed_default_rides),
+    (4, 'apply default ride restrictions', _migrate_default_restrictions),
+    (5, 'seed default admin user', _migrate_seed_admin_user),
+    (6, 'create ride queue curve table', _migrate_create_queue_curves),
+    (7, 'create park layout tables', _migrate_create_park_layout),
+    (8, 'create ride change log', _migrate_create_ride_changes),
+]
+
+def migrate(database):
+    # Migrates under a cross-process lock; MySQL commits per migration, so a failed run resumes there
+    with database.transaction() as tx:
+        _lock_migrations(tx)
         try:
-            cursor.execute("DROP TABLE IF EXISTS rides")
-            self.db_connection.commit()
-            print(f"{COLOR_YELLOW}Old 'rides' table dropped (if existed).{COLOR_RESET}")
-            # Create new ride type tables
-            cursor.execute(f"CREATE TABLE IF NOT EXISTS land_rides {ride_table_schema}")
-            cursor.execute(f"CREATE TABLE IF NOT EXISTS water_rides {ride_table_schema}")
-            cursor.execute(f"CREATE TABLE IF NOT EXISTS kids_rides {ride_table_schema}")
-            
-            cursor.execute(create_users_table_query)
-            self.db_connection.commit()
-            print(f"{COLOR_GREEN}Land, Water, Kids, and Users tables checked/created successfully.{COLOR_RESET}")
-        except Error as e:
-            print(f"{COLOR_RED}Error creating tables: {e}{COLOR_RESET}")
+            try:
+                current = tx.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+            except Error:
+                # First run against this database: the version table itself is the only unconditional DDL
+                tx.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INT PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at VARCHAR(32) NOT NULL
+                )
+                """)
+                current = 0
+            applied = 0
+            for version, description, apply in MIGRATIONS:
+                if version <= current:
+                    continue
+                apply(tx)
+                tx.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)",
+                           (version, description, datetime.utcnow().isoformat(timespec='seconds')))
+                if tx.backend != 'sqlite':
+                    tx.commit()
+                applied += 1
+                db_log.info("Applied migration %d: %s.", version, description)
         finally:
-            cursor.close()
+            _unlock_migrations(tx)
+    return applied
+
+def _lock_migrations(tx):
+    # MySQL: a named advisory lock for this session. SQLite: an immediate transaction
+    if tx.backend == 'sqlite':
+        tx.execute("BEGIN IMMEDIATE")
+        return
+    locked = tx.execute("SELECT GET_LOCK(%s, %s)", (DB_MIGRATION_LOCK_NAME, DB_MIGRATION_LOCK_TIMEOUT)).fetchone()[0]
+    if locked != 1:
+        raise Error(msg=f"Timed out after {DB_MIGRATION_LOCK_TIMEOUT}s waiting for another process's migrations.")
+
+def _unlock_migrations(tx):
+    # The SQLite lock ends with the transaction; the MySQL one outlives commits and must be released
+    if tx.backend != 'sqlite':
+        try:
+            tx.execute("SELECT RELEASE_LOCK(%s)", (DB_MIGRATION_LOCK_NAME,)).fetchone()
+        except Error as e:
+            # A broken connection is discarded by the pool, and the server drops its lock with the session
+            db_log.warning("Could not release the migration lock: %s", e)
+
+class ParkModel(RideChangeLog):
+    # Manages the overall theme park state: the ride catalog and the database behind it
+    def __init__(self): 
+        # Cheap on purpose: nothing touches the database until ensure_initialized()
+        self.snapshot = CatalogSnapshot.from_rows(0, [])
+        self._write_lock = threading.RLock()  # serializes writers (see _writing); readers never lock
+        self._init_lock = threading.Lock()
+        self._initialized = False  # set once the schema is migrated; until then a reconcile thread keeps retrying
+        self.db = None  # pooled Database, or None when the database is unreachable
+        self.startup_stats = {}
+        self.catalog_source = 'empty'  # where the current catalog came from: 'empty', 'file', 'database' or 'memory'
+        self._file_generation = 0
+        self._save_event = threading.Event()
+        self._saver_thread = None
+        self._reconcile_thread = None
+        # ride_id -> ride data, or None for a delete, written while the database was unreachable
+        self._offline_writes = {}
+        self._init_change_log()
+        self.user_cache = ResponseCache(AUTH_USER_CACHE_SIZE, AUTH_USER_CACHE_TTL)  # staff_id -> user record
+        # Called as listener(old_snapshot, rows, queue_times, previous) when another worker's queue times arrive
+        self.queue_time_listeners = []
+        # Called as listener() under the write lock right after the catalog is reloaded from the database
+        self.reload_listeners = []
+        self.shared = None
+        self._shared_snapshot = None  # the snapshot last published to or mapped from the shared catalog
+        if CATALOG_SHARED_PATH:
+            if not SharedCatalog.SUPPORTED:
+                catalog_log.warning("CATALOG_SHARED_PATH is set but this platform has no flock; the catalog stays per process.")
+            else:
+                self.shared = SharedCatalog(CATALOG_SHARED_PATH)
+
+    def ensure_initialized(self):
+        # Connects, migrates and loads the catalog once; during an outage the reconcile thread retries
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized or (self._reconcile_thread is not None and self._reconcile_thread.is_alive()):
+                return
+            started = time.perf_counter()
+            if self.shared is not None:
+                # Only the first worker loads the catalog; the others wait on the lock and map what it published
+                with self._writing():
+                    self._initialize(started)
+            else:
+                self._initialize(started)
+
+    def _initialize(self, started):
+        if self.shared is not None and self._attach_shared():
+            self.startup_stats = {'attach_ms': round((time.perf_counter() - started) * 1000, 2),
+                                  'total_ms': round((time.perf_counter() - started) * 1000, 2),
+                                  'source': 'shared'}
+            self.catalog_source = 'shared'
+            self._connect_db()
+            if self.db and self._migrate() is not None:
+                self._initialized = True
+                self._start_change_poller()
+            else:
+                self._start_reconcile()
+            catalog_log.info("Mapped shared catalog version %d (%d rides) in %s ms.", self.catalog_version,
+                             self.ride_count, self.startup_stats['total_ms'], extra={'fields': self.startup_stats})
+            return
+
+        # Warm start: serve the local catalog file right away and reconcile with the database in the background
+        if self._load_catalog_file():
+            self.startup_stats = {'snapshot_ms': round((time.perf_counter() - started) * 1000, 2),
+                                  'total_ms': round((time.perf_counter() - started) * 1000, 2),
+                                  'source': 'file'}
+            catalog_log.info("Warm start from %s: %s ms, %d rides; reconciling with the database in the background.",
+                             CATALOG_SNAPSHOT_PATH, self.startup_stats['total_ms'], self.ride_count,
+                             extra={'fields': self.startup_stats})
+            self._start_reconcile()
+            return
+
+        self._connect_db()
+        connected = time.perf_counter()
+        migrations_applied = self._migrate() if self.db else None
+        migrated = time.perf_counter()
+        if migrations_applied is not None:
+            self.load_rides_from_db()
+        loaded = time.perf_counter()
+        self.startup_stats = {
+            'connect_ms': round((connected - started) * 1000, 2),
+            'migrate_ms': round((migrated - connected) * 1000, 2),
+            'load_ms': round((loaded - migrated) * 1000, 2),
+            'total_ms': round((loaded - started) * 1000, 2),
+            'migrations_applied': migrations_applied or 0,
+            'source': self.catalog_source
+        }
+        if migrations_applied is None:
+            self._start_reconcile()
+        else:
+            self._initialized = True
+            self._start_change_poller()
+        catalog_log.info("Cold start: %s ms (connect %s ms, migrate %s ms / %d applied, load %s ms).",
+                         self.startup_stats['total_ms'], self.startup_stats['connect_ms'],
+                         self.startup_stats['migrate_ms'], migrations_applied or 0, self.startup_stats['load_ms'],
+                         extra={'fields': self.startup_stats})
+
+    @property
+    def rides(self):
+        return self.snapshot.rides
+
+    @property
+    def ride_count(self):
+        return self.snapshot.ride_count
+
+    @property
+    def catalog_version(self):
+        # bumped on every catalog change; part of every plan cache key
+        return self.snapshot.version
+
+    @property
+    def eligibility_index(self):
+        return self.snapshot.eligibility_index
+
+    def _load_catalog_file(self):
+        # Publishes the catalog from CATALOG_SNAPSHOT_PATH; False if there is no usable file
+        if not CATALOG_SNAPSHOT_PATH or not os.path.exists(CATALOG_SNAPSHOT_PATH):
+            return False
+        try:
+            generation, saved_at, catalog = read_catalog_file(CATALOG_SNAPSHOT_PATH)
+        except (OSError, ValueError, TypeError) as e:
+            catalog_log.warning("Ignoring catalog file %s: %s", CATALOG_SNAPSHOT_PATH, e)
+            return False
+        with self._writing():
+            self._file_generation = generation
+            self.snapshot = CatalogSnapshot(self.snapshot.version + 1, catalog, queue_curves=self.snapshot.queue_curves,
+                                            layout=self.snapshot.layout)
+            self.catalog_source = 'file'
+        age_minutes = (time.time() - saved_at) / 60
+        catalog_log.info("Loaded %d rides from catalog file (generation %d, %.1f min old).", catalog.size, generation, age_minutes)
+        return True
+
+    def save_catalog_file(self):
+        # Writes the current snapshot to CATALOG_SNAPSHOT_PATH
+        if not CATALOG_SNAPSHOT_PATH:
+            return
+        snapshot = self.snapshot
+        try:
+            self._file_generation += 1
+            write_catalog_file(CATALOG_SNAPSHOT_PATH, snapshot, self._file_generation)
+        except OSError as e:
+            catalog_log.warning("Could not write catalog file %s: %s", CATALOG_SNAPSHOT_PATH, e)
+
+    def _schedule_catalog_save(self):
+        # Coalesces bursts of catalog changes into one file write, off the request thread
+        if not CATALOG_SNAPSHOT_PATH:
+            return
+        if self._saver_thread is None:
+            self._saver_thread = threading.Thread(target=self._catalog_saver, name='catalog-file-saver', daemon=True)
+            self._saver_thread.start()
+        self._save_event.set()
+
+    def _catalog_saver(self):
+        while True:
+            self._save_event.wait()
+            time.sleep(CATALOG_SNAPSHOT_SAVE_DELAY)
+            self._save_event.clear()
+            self.save_catalog_file()
+
+    def _start_reconcile(self):
+        if self._reconcile_thread is None or not self._reconcile_thread.is_alive():
+            self._reconcile_thread = threading.Thread(target=self._reconcile_with_database, name='catalog-reconcile',
+                                                      daemon=True)
+            self._reconcile_thread.start()
+
+    def _reconcile_with_database(self):
+        # Serves the current catalog until the database is back and migrated, then reloads from it
+        while True:
+            if not self.db:
+                self._connect_db()
+            if self.db and self._migrate() is not None and self.load_rides_from_db():
+                catalog_log.info("Catalog reconciled with the database (%d rides).", self.ride_count)
+                self._initialized = True
+                self._start_change_poller()
+                return
+            time.sleep(CATALOG_RECONCILE_INTERVAL)
+
+    def _migrate(self):
+        # Number of migrations applied, or None when they could not run
+        try:
+            return migrate(self.db)
+        except Error as e:
+            db_log.error("Error applying migrations: %s", e)
+            return None
+
+    def _publish(self, rows, queue_curves=None, layout=None):
+        # Swaps in a snapshot built from `rows` with one reference assignment; curves and layout carry over
+        queue_curves = self.snapshot.queue_curves if queue_curves is None else queue_curves
+        layout = self.snapshot.layout if layout is None else layout
+        self.snapshot = CatalogSnapshot.from_rows(self.snapshot.version + 1, rows, queue_curves, layout)
+
+    @contextmanager
+    def _writing(self):
+        # Serializes writers across threads and, with a shared catalog, workers; publishes what they leave
+        with self._write_lock:
+            if self.shared is None:
+                yield
+                return
+            with self.shared.locked():
+                self._attach_shared()
+                try:
+                    yield
+                finally:
+                    if self.snapshot is not self._shared_snapshot and self.snapshot.version:
+                        self.shared.publish(self.snapshot)
+                        self._attach_shared()
+
+    def _attach_shared(self):
+        # Maps the newest shared version unless it is already in place; False if nothing has been published yet
+        version = self.shared.version()
+        if not version:
+            return False
+        if self._shared_snapshot is None or self._shared_snapshot.version != version:
+            previous, snapshot = self.snapshot, self.shared.attach(self.snapshot)
+            self.snapshot = self._shared_snapshot = snapshot
+            if previous.version != snapshot.version and previous.plan_version == snapshot.plan_version \
+                    and previous.size == snapshot.size and self.queue_time_listeners:
+                # Another worker applied live queue times; the plans cached here that they affect must go too
+                before, after = previous.column('queue_time'), snapshot.column('queue_time')
+                rows = np.flatnonzero(before != after)
+                if len(rows):
+                    for listener in self.queue_time_listeners:
+                        listener(previous, rows, after[rows], before[rows])
+        return True
+
+    def apply_queue_times(self, rows, queue_times):
+        # Publishes new queue times at catalog `rows`; must be called under _writing()
+        snapshot = self.snapshot.with_queue_times(rows, queue_times)
+        if self.shared is not None and self.snapshot is self._shared_snapshot \
+                and self.shared.append_queue_times(snapshot, rows, queue_times):
+            self._shared_snapshot = snapshot
+        self.snapshot = snapshot
+
+    def refresh_shared(self):
+        # Called per request: picks up a catalog another worker has published
+        if self.shared is not None and self.shared.version() != self.snapshot.version:
+            with self._write_lock:
+                self._attach_shared()
+
+    def _connect_db(self):
+        # Sets up the connection pool and checks that the database answers
+        try:
+            database = Database()
+            database.fetchone("SELECT 1")
+            self.db = database
+            db_log.info("Successfully connected to %s database (pool size %d).", database.backend, database.pool.size)
+        except (Error, ValueError) as e:
+            db_log.error("Error connecting to database: %s", e)
+            self.db = None
 
     def add_ride(self, id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, vip_access, 
                  affected_by_weather, type, min_weight=0, max_weight=200, min_age=0, max_age=100):
+        with self._writing():
+            self._add_ride_locked(id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, vip_access,
+                                  affected_by_weather, type, min_weight, max_weight, min_age, max_age)
 
+    def _add_ride_locked(self, id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, vip_access,
+                         affected_by_weather, type, min_weight, max_weight, min_age, max_age):
         # Check for duplicate IDs across all in-memory rides first
-        if any(ride.id == id for ride in self.rides):
+        if self.snapshot.has_ride(id):
             raise ValueError(f"Ride with ID {id} already exists.")
-        if not self.db_connection:
-            print(f"{COLOR_RED}Cannot add ride to DB: No database connection. Adding only to in-memory.{COLOR_RESET}")
+        if not self.db:
+            catalog_log.warning("Cannot add ride to DB: No database connection. Adding only to in-memory.")
             new_ride = Ride(id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, 
                             vip_access, affected_by_weather, type, min_weight, max_weight, min_age, max_age)
-            self.rides.append(new_ride)
-            self.ride_count = len(self.rides)
+            self.snapshot = self.snapshot.with_ride(new_ride)
+            self._offline_writes[id] = (id, name, thrill, duration, queue_time, fatigue, mandatory, restricted,
+                                        vip_access, affected_by_weather, type, min_weight, max_weight, min_age, max_age)
+            self.catalog_source = 'memory' if self.catalog_source == 'empty' else self.catalog_source
+            self._schedule_catalog_save()
             return
 
-        cursor = self.db_connection.cursor()
-        
         # target table based on ride type
         table_name = ""
         if type == "land":
@@ -167,350 +860,530 @@ class ParkModel:
         else:
             raise ValueError("Invalid ride type specified.")
 
-        insert_query = f"""
-        INSERT INTO {table_name} (id, name, thrill, duration, queue_time, fatigue, mandatory, restricted,
-          vip_access, affected_by_weather, min_weight, max_weight, min_age, max_age)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-         """
+        insert_query = ride_insert_query(table_name)
         try:
-            cursor.execute(insert_query, (id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, 
-                                          vip_access, affected_by_weather, min_weight, max_weight, min_age, max_age))
-            self.db_connection.commit()
+            self.db.execute(insert_query, (id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, 
+                                           vip_access, affected_by_weather, min_weight, max_weight, min_age, max_age))
     
             # Add to in-memory list after successful DB insert
             new_ride = Ride(id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, vip_access, 
                             affected_by_weather, type, min_weight, max_weight, min_age, max_age)
-            self.rides.append(new_ride)
-            self.ride_count = len(self.rides)
-            print(f"{COLOR_GREEN}Ride '{name}' ({type}) added to database successfully!{COLOR_RESET}")
+            self.snapshot = self.snapshot.with_ride(new_ride)
+            self._schedule_catalog_save()
+            catalog_log.info("Ride '%s' (%s) added to database successfully!", name, type)
+        except IntegrityError as e:
+            # Another process stored the same ID after the catalog check
+            raise ValueError(f"Ride with ID {id} already exists.") from e
         except Error as e:
-            print(f"{COLOR_RED}Error adding ride to database: {e}{COLOR_RESET}")
+            db_log.error("Error adding ride to database: %s", e)
             raise
-        finally:
-            cursor.close()
+
+    def add_stored_ride(self, ride_data):
+        # Publishes a ride the caller already inserted into its table, such as the ASGI app
+        with self._writing():
+            if self.snapshot.has_ride(ride_data[0]):
+                raise ValueError(f"Ride with ID {ride_data[0]} already exists.")
+            self.snapshot = self.snapshot.with_ride(Ride(*ride_data))
+        self._schedule_catalog_save()
+
+    def add_rides(self, rides_data):
+        # Adds validated rides in one transaction and one snapshot; raises ValueError on a duplicate ID
+        with self._writing():
+            snapshot = self.snapshot
+            seen = set()
+            new_rides = []
+            for ride_data in rides_data:
+                if ride_data[0] in seen or snapshot.has_ride(ride_data[0]):
+                    raise ValueError(f"Ride with ID {ride_data[0]} already exists.")
+                if ride_data[10] not in RIDE_TABLES:
+                    raise ValueError("Invalid ride type specified.")
+                seen.add(ride_data[0])
+                new_rides.append(ride_data)
+            if not new_rides:
+                return 0
+            if self.db:
+                rows_by_table = {}
+                for ride_data in new_rides:
+                    rows_by_table.setdefault(RIDE_TABLES[ride_data[10]], []).append(
+                        tuple(ride_data[position] for position in RIDE_COLUMN_POSITIONS))
+                with self.db.transaction() as tx:
+                    for table_name, rows in rows_by_table.items():
+                        tx.executemany(
+                            f"INSERT INTO {table_name} ({', '.join(RIDE_COLUMNS)}) "
+                            f"VALUES ({', '.join(['%s'] * len(RIDE_COLUMNS))})", rows)
+            else:
+                catalog_log.warning("Cannot add rides to DB: No database connection. Adding only to in-memory.")
+                self._offline_writes.update((ride_data[0], tuple(ride_data)) for ride_data in new_rides)
+            self.snapshot = self.snapshot.with_rides(new_rides)
+            if not self.db and self.catalog_source == 'empty':
+                self.catalog_source = 'memory'
+            self._schedule_catalog_save()
+            return len(new_rides)
+
+    def import_rides(self, records, chunk_size=BULK_IMPORT_CHUNK_SIZE):
+        # Validates, deduplicates and adds streamed (row_number, dict) records; returns the error report
+        report = {'imported': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+
+        def reject(row_number, ride_id, message):
+            report['failed'] += 1
+            if len(report['errors']) < BULK_IMPORT_MAX_ERRORS:
+                report['errors'].append({'row': row_number, 'id': ride_id, 'error': message})
+            else:
+                report['errors_truncated'] = True
+
+        def flush(chunk):
+            try:
+                report['imported'] += self.add_rides([ride_data for _, ride_data in chunk])
+            except (ValueError, Error) as e:
+                # The chunk was rolled back as a whole
+                for row_number, ride_data in chunk:
+                    reject(row_number, ride_data[0], f"Chunk rejected: {e}")
+
+        chunk = []
+        seen = set()
+        for row_number, data in records:
+            if isinstance(data, str):
+                reject(row_number, None, data)
+                continue
+            try:
+                ride_data = validate_ride_data(data)
+            except ValueError as e:
+                reject(row_number, data.get('id') if isinstance(data, dict) else None, str(e))
+                continue
+            if ride_data[0] in seen or self.snapshot.has_ride(ride_data[0]):
+                reject(row_number, ride_data[0], f"Ride with ID {ride_data[0]} already exists.")
+                continue
+            seen.add(ride_data[0])
+            chunk.append((row_number, ride_data))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+        catalog_log.info("Bulk import finished: %d rides imported, %d rejected.", report['imported'], report['failed'])
+        return report
+
+    def update_ride(self, ride_data):
+        # Replaces an existing ride; a type change moves the row to the other table in one transaction
+        ride_id, ride_type = ride_data[0], ride_data[10]
+        if ride_type not in RIDE_TABLES:
+            raise ValueError("Invalid ride type specified.")
+        with self._writing():
+            snapshot = self.snapshot
+            row = snapshot.catalog.rows_by_id.get(ride_id)
+            if row is None or row >= snapshot.size:
+                raise ValueError(f"Ride with ID {ride_id} does not exist.")
+            old_table = RIDE_TABLES[RIDE_TYPES[snapshot.column('type')[row]]]
+            new_table = RIDE_TABLES[ride_type]
+            values = tuple(ride_data[position] for position in RIDE_COLUMN_POSITIONS)
+            if self.db:
+                with self.db.transaction() as tx:
+                    if old_table == new_table:
+                        assignments = ', '.join(f"{column} = %s" for column in RIDE_COLUMNS[1:])
+                        tx.execute(f"UPDATE {new_table} SET {assignments} WHERE id = %s", values[1:] + (ride_id,))
+                    else:
+                        tx.execute(f"DELETE FROM {old_table} WHERE id = %s", (ride_id,))
+                        tx.execute(ride_insert_query(new_table), values)
+            else:
+                catalog_log.warning("Cannot update ride in DB: No database connection. Updating only in-memory.")
+                self._offline_writes[ride_id] = tuple(ride_data)
+            self.snapshot = snapshot.with_ride_changes(upserts=[tuple(ride_data)])
+        self._schedule_catalog_save()
+        catalog_log.info("Ride '%s' (%s) updated.", ride_data[1], ride_id)
+
+    def delete_ride(self, ride_id):
+        # Removes a ride, with its queue curve and layout place, from the database and the catalog
+        with self._writing():
+            snapshot = self.snapshot
+            row = snapshot.catalog.rows_by_id.get(ride_id)
+            if row is None or row >= snapshot.size:
+                raise ValueError(f"Ride with ID {ride_id} does not exist.")
+            table_name = RIDE_TABLES[RIDE_TYPES[snapshot.column('type')[row]]]
+            if self.db:
+                with self.db.transaction() as tx:
+                    tx.execute(f"DELETE FROM {table_name} WHERE id = %s", (ride_id,))
+                    tx.execute("DELETE FROM ride_queue_curves WHERE ride_id = %s", (ride_id,))
+                    tx.execute("DELETE FROM ride_locations WHERE ride_id = %s", (ride_id,))
+            else:
+                catalog_log.warning("Cannot delete ride from DB: No database connection. Removing only from in-memory.")
+                self._offline_writes[ride_id] = None
+            self.snapshot = snapshot.with_ride_changes(deletes=[ride_id])
+        self._schedule_catalog_save()
+        catalog_log.info("Ride %s deleted.", ride_id)
 
     def load_rides_from_db(self):
-        # Loads rides from all tables in the database into the in-memory list.
-        self.rides = []
-        if not self.db_connection:
-            print(f"{COLOR_RED}Cannot load rides: No database connection.{COLOR_RESET}")
-            return
+        # Loads rides from all tables as a new snapshot; on failure the current catalog stays in place
+        if not self.db:
+            catalog_log.error("Cannot load rides: No database connection.")
+            return False
 
-        cursor = self.db_connection.cursor()
-        ride_tables = ["land_rides", "water_rides", "kids_rides"]
-        
-        for table_name in ride_tables:
-            # Ensuring the SELECT query matches the order of arguments for Ride constructor
-            select_query = f"""
-            SELECT id, name, thrill, duration, queue_time, fatigue, mandatory, restricted,
-              vip_access, affected_by_weather, min_weight, max_weight, min_age, max_age 
-            FROM {table_name}
-            """
+        # One round trip for the whole catalog; the ride type comes from the table each row lives in
+        select_query = " UNION ALL ".join(
+            f"SELECT {', '.join(RIDE_COLUMNS)}, '{ride_type}' FROM {table_name}"
+            for ride_type, table_name in RIDE_TABLES.items())
+        with self._writing():
             try:
-                cursor.execute(select_query)
-                records = cursor.fetchall()
-                for row in records:
-                    ride_type = table_name.replace('_rides', '') # Infer type from table name
-                    # Correctly unpack row and pass 'type' explicitly
-                    
-                    self.rides.append(Ride(
-                        row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8], row[9], # First 10 positional args
-                        ride_type, 
-                        row[10], row[11], row[12], row[13] 
-                    ))
+                # Writes made while the database was unreachable go in first, or the load would drop them
+                self._replay_offline_writes()
+                # Read the change log position first: changes made during the load are applied again, never lost
+                change_seq, change_gaps = self._change_log_position()
+                records = self.db.fetchall(select_query)
             except Error as e:
-                # Handle case where a table might not exist yet
-                print(f"{COLOR_YELLOW}Warning: Could not load rides from {table_name}: {e}{COLOR_RESET}")
-        cursor.close() 
-        self.ride_count = len(self.rides)
-        print(f"{COLOR_GREEN}Loaded {self.ride_count} rides from the database.{COLOR_RESET}")
+                catalog_log.warning("Could not load rides: %s", e)
+                return False
+            try:
+                queue_curves = {ride_id: parse_queue_curve(curve.split(','))
+                                for ride_id, curve in self.db.fetchall("SELECT ride_id, curve FROM ride_queue_curves")}
+            except (Error, ValueError) as e:
+                catalog_log.warning("Could not load queue curves: %s", e)
+                queue_curves = None
+            try:
+                layout = self._load_layout()
+            except (Error, ValueError) as e:
+                catalog_log.warning("Could not load park layout: %s", e)
+                layout = None
+            self._publish([row[:10] + (row[14],) + row[10:14] for row in records], queue_curves, layout)
+            self.catalog_source = 'database'
+            for listener in self.reload_listeners:
+                listener()
+        # Outside the write lock: apply_ride_changes takes the change lock first, then the write lock
+        self._advance_change_log(change_seq, change_gaps)
+        self._schedule_catalog_save()
+        catalog_log.info("Loaded %d rides from the database.", self.ride_count)
+        return True
+
+    def _replay_offline_writes(self):
+        # Writes the offline rides in one transaction under the write lock; kept for the next load on error
+        if not self._offline_writes:
+            return
+        with self.db.transaction() as tx:
+            for ride_id, ride_data in self._offline_writes.items():
+                for table_name in RIDE_TABLES.values():
+                    tx.execute(f"DELETE FROM {table_name} WHERE id = %s", (ride_id,))
+                if ride_data is None:
+                    tx.execute("DELETE FROM ride_queue_curves WHERE ride_id = %s", (ride_id,))
+                    tx.execute("DELETE FROM ride_locations WHERE ride_id = %s", (ride_id,))
+                else:
+                    tx.execute(ride_insert_query(RIDE_TABLES[ride_data[10]]),
+                               tuple(ride_data[position] for position in RIDE_COLUMN_POSITIONS))
+        catalog_log.info("Wrote %d rides changed during the database outage.", len(self._offline_writes))
+        self._offline_writes = {}
+
+    def _load_layout(self):
+        nodes = self.db.fetchall("SELECT id, x, y, is_entrance FROM park_nodes")
+        walkways = self.db.fetchall("SELECT node_a, node_b, minutes FROM park_walkways")
+        ride_locations = dict(self.db.fetchall("SELECT ride_id, node_id FROM ride_locations"))
+        entrance = next((node_id for node_id, _, _, is_entrance in nodes if is_entrance), None)
+        return ParkLayout([node[:3] for node in nodes], walkways, ride_locations, entrance)
+
+    def set_layout(self, layout):
+        # Replaces the whole park layout (see ParkLayout) in one transaction and publishes it
+        with self._writing():
+            unknown = [ride_id for ride_id in layout.ride_locations if not self.snapshot.has_ride(ride_id)]
+            if unknown:
+                raise ValueError(f"Unknown ride(s) in layout: {', '.join(sorted(unknown)[:10])}")
+            if self.db:
+                with self.db.transaction() as tx:
+                    for table_name in ('park_nodes', 'park_walkways', 'ride_locations'):
+                        tx.execute(f"DELETE FROM {table_name}")
+                    tx.executemany("INSERT INTO park_nodes (id, x, y, is_entrance) VALUES (%s, %s, %s, %s)",
+                                   [(node_id, x, y, node_id == layout.entrance) for node_id, x, y in layout.nodes])
+                    tx.executemany("INSERT INTO park_walkways (node_a, node_b, minutes) VALUES (%s, %s, %s)",
+                                   layout.walkways)
+                    tx.executemany("INSERT INTO ride_locations (ride_id, node_id) VALUES (%s, %s)",
+                                   list(layout.ride_locations.items()))
+            else:
+                catalog_log.warning("Cannot store park layout in DB: No database connection. Keeping it in memory only.")
+            self.snapshot = self.snapshot.with_layout(layout)
+        catalog_log.info("Park layout updated: %d nodes, %d walkways, %d rides placed; all-pairs walking times in %s ms.",
+                         len(layout.nodes), len(layout.walkways), len(layout.ride_locations), layout.precompute_ms)
+
+    def set_queue_curve(self, ride_id, curve):
+        # Stores a validated queue curve (see parse_queue_curve) for one ride and publishes it
+        with self._writing():
+            if not self.snapshot.has_ride(ride_id):
+                raise ValueError(f"Ride with ID {ride_id} does not exist.")
+            if self.db:
+                with self.db.transaction() as tx:
+                    tx.execute("DELETE FROM ride_queue_curves WHERE ride_id = %s", (ride_id,))
+                    tx.execute("INSERT INTO ride_queue_curves (ride_id, curve) VALUES (%s, %s)",
+                               (ride_id, ','.join(str(minutes) for minutes in curve.tolist())))
+            else:
+                catalog_log.warning("Cannot store queue curve in DB: No database connection. Keeping it in memory only.")
+            self.snapshot = self.snapshot.with_queue_curves({**self.snapshot.queue_curves, ride_id: curve})
 
     def update_ride_restrictions(self):
-        # Updates existing ride restrictions
-        if not self.db_connection:
-            print(f"{COLOR_RED}Cannot update ride restrictions: No database connection.{COLOR_RESET}")
+        # Re-applies the default ride restrictions (migration 4 does this once when the schema is provisioned)
+        if not self.db:
+            catalog_log.error("Cannot update ride restrictions: No database connection.")
             return
-        cursor = self.db_connection.cursor()
-        
-        # Define which rides should remain restricted (taken as 5 )
-        restricted_rides = {
-            'L007',  # Pirate Ship
-            'L012',  # Hyperverse
-            'W002',  # Drop Loop
-            'W010',  # Harakiri
-            'K011'   # Mini Top Spin
-        }
-        
-        # Update all rides to be non-restricted first
-        tables = ['land_rides', 'water_rides', 'kids_rides']
-        
         try:
-            for table in tables:
-                update_query = f"UPDATE {table} SET restricted = FALSE"
-                cursor.execute(update_query)
-                print(f"{COLOR_GREEN}Updated all rides in {table} to non-restricted.{COLOR_RESET}")
-            
-            for ride_id in restricted_rides:
-                # Determine which table based on ride ID prefix
-                if ride_id.startswith('L'):
-                    table = 'land_rides'
-                elif ride_id.startswith('W'):
-                    table = 'water_rides'
-                elif ride_id.startswith('K'):
-                    table = 'kids_rides'
-                else:
-                    continue
-                
-                update_query = f"UPDATE {table} SET restricted = TRUE WHERE id = %s"
-                cursor.execute(update_query, (ride_id,))
-                print(f"{COLOR_YELLOW}Set ride {ride_id} to restricted.{COLOR_RESET}")
-            
-            self.db_connection.commit()
-            print(f"{COLOR_GREEN}Successfully updated ride restrictions! Only 5 rides are now restricted.{COLOR_RESET}")
+            with self.db.transaction() as tx:
+                _migrate_default_restrictions(tx)
+            catalog_log.info("Successfully updated ride restrictions! Only %d rides are now restricted.", len(DEFAULT_RESTRICTED_RIDES))
             
-            # Reload rides from database to reflect changes
-            self.load_rides_from_db()
+            # Pick up just the rides whose restriction changed
+            self.apply_ride_changes()
             
         except Error as e:
-            print(f"{COLOR_RED}Error updating ride restrictions: {e}{COLOR_RESET}")
-        finally:
-            cursor.close()
+            db_log.error("Error updating ride restrictions: %s", e)
 
     def add_default_rides(self):
-        # Adds a set of predefined rides to the database if no rides are currently loaded."""
+        # Adds the predefined rides if none are loaded, skipping any already in the catalog or their table
         if not self.rides:
-            print(f"{COLOR_YELLOW}Adding default rides (database appears empty or failed to load)...{COLOR_RESET}")
-            
-            # Land Rides 
-            land_rides_data = [
-                ("L001", "Mission Interstellar", 9, 3, 25, 8, False, False, True, True, "land", 40, 120, 12, 65),
-                ("L002", "Sky Wheel", 3, 5, 10, 2, False, False, True, True, "land", 0, 150, 3, 80),
-                ("L003", "Adventures of Chikku", 4, 4, 8, 3, False, False, False, False, "land", 0, 80, 5, 16),
-                ("L004", "Twist and Shout", 7, 3, 20, 6, False, False, True, True, "land", 35, 110, 10, 60),
-                ("L005", "Rockin' Tug", 5, 4, 12, 4, False, False, True, True, "land", 25, 100, 8, 70),
-                ("L006", "Termite Coaster and Train", 6, 5, 15, 5, False, False, False, False, "land", 30, 120, 10, 75),
-                ("L007", "Pirate Ship", 8, 4, 18, 7, False, True, True, True, "land", 40, 130, 12, 65), # RESTRICTED
-                ("L008", "Wonder Splash", 5, 3, 10, 4, False, False, True, True, "land", 20, 100, 6, 70),
-                ("L009", "Grand Prix", 6, 6, 15, 5, False, False, True, False, "land", 25, 120, 8, 75),
-                ("L010", "Crazy Cars", 4, 3, 8, 3, False, False, False, False, "land", 15, 90, 5, 80),
-                ("L011", "Sky Tilt (New)", 8, 3, 22, 7, False, False, True, True, "land", 45, 120, 14, 60),
-                ("L012", "Hyperverse", 10, 2, 30, 9, False, True, True, True, "land", 50, 110, 16, 55), # RESTRICTED
-                ("L013", "Recoil", 9, 3, 28, 8, False, False, True, True, "land", 45, 120, 14, 60),
-                ("L014", "Maverick", 9, 3, 25, 8, False, False, True, True, "land", 45, 115, 14, 65),
-                ("L015", "Equinox", 8, 4, 20, 7, False, False, True, True, "land", 40, 120, 12, 65),
-                ("L016", "Techno Jump", 7, 2, 15, 6, False, False, True, True, "land", 35, 110, 10, 70),
-                ("L017", "Twin Flip T Rex", 8, 3, 22, 7, False, False, True, True, "land", 40, 120, 12, 65),
-                ("L018", "Wonderla Bamba", 6, 4, 12, 5, False, False, True, True, "land", 30, 120, 8, 75),
-                ("L019", "G Fall", 10, 1, 35, 9, False,True, True, True, "land", 50, 110, 18, 50)
-            ]
-            
-            # Water Rides 
-            water_rides_data = [
-                ("W001", "Rainbow Loooops", 8, 4, 25, 7, False, False, True, True, "water", 40, 120, 12, 65),
-                ("W002", "Drop Loop", 9, 3, 30, 8, False, True, True, True, "water", 45, 110, 14, 60), # RESTRICTED
-                ("W003", "Rain Disco", 6, 5, 15, 5, False, False, True, True, "water", 25, 120, 8, 75),
-                ("W004", "Boomerang", 7, 4, 20, 6, False, False, True, True, "water", 35, 115, 10, 70),
-                ("W005", "Pirate Lagoon", 5, 6, 12, 4, False, False, True, True, "water", 20, 130, 6, 80),
-                ("W006", "Fun Racers", 4, 3, 8, 3, False, False, False, True, "water", 15, 100, 5, 75),
-                ("W007", "Uphill Racer", 6, 4, 15, 5, False, False, True, True, "water", 30, 120, 8, 70),
-                ("W008", "Bullet", 8, 2, 25, 7, False, False, True, True, "water", 40, 115, 12, 65),
-                ("W009", "Wavy and Vertical Fall", 9, 3, 28, 8, False, False, True, True, "water", 45, 120, 14, 60),
-                ("W010", "Harakiri", 10, 2, 35, 9, False, True, True, True, "water", 50, 110, 16, 55), # RESTRICTED
-                ("W011", "Mammoth", 7, 5, 18, 6, False, False, True, True, "water", 35, 130, 10, 70),
-                ("W012", "Splash", 3, 4, 5, 2, False, False, False, True, "water", 0, 150, 3, 85),
-                ("W013", "Wave Pools", 2, 8, 5, 2, False, False, False, True, "water", 0, 200, 0, 90),
-                ("W014", "Lazy River", 1, 10, 3, 1, False, False, False, True, "water", 0, 200, 0, 95),
-                ("W015", "Sea Lagoon", 3, 6, 5, 2, False, False, False, True, "water", 0, 180, 3, 85),
-                ("W016", "Drop and Tornado", 8, 4, 22, 7, False, False, True, True, "water", 40, 120, 12, 65),
-                ("W017", "Screw", 7, 3, 18, 6, False, False, True, True, "water", 35, 115, 10, 70)
-            ]
-
-            # Kids Rides 
-            kids_rides_data = [
-                ("K001", "Mini Coaster", 3, 5, 10, 2, False, False, False, False, "kids", 15, 80, 4, 14),
-                ("K002", "Bumper Cars", 2, 8, 5, 1, False, False, False, False, "kids", 20, 90, 6, 16),
-                ("K003", "Kiddie Swings", 2, 3, 5, 1, False, False, False, False, "kids", 10, 70, 3, 12),
-                ("K004", "Mini Pirate Ship", 3, 3, 8, 2, False, False, False, False, "kids", 15, 80, 5, 14),
-                ("K005", "Kiddies Wheel", 2, 4, 6, 1, False, False, False, False, "kids", 10, 85, 3, 15),
-                ("K006", "Coco Cup", 2, 3, 5, 1, False, False, False, False, "kids", 12, 75, 4, 13),
-                ("K007", "Carousel", 1, 4, 3, 1, False, False, False, False, "kids", 5, 90, 2, 16),
-                ("K008", "Flying Jumbo", 2, 3, 6, 1, False, False, False, False, "kids", 10, 80, 3, 14),
-                ("K009", "Convoy", 2, 4, 5, 1, False, False, False, False, "kids", 8, 85, 3, 15),
-                ("K010", "Moon Base", 3, 3, 8, 2, False, False, False, False, "kids", 15, 80, 4, 14),
-                ("K011", "Mini Top Spin", 3, 3, 10, 2, False, True, False, False, "kids", 18, 85, 5, 16), # RESTRICTED
-                ("K012", "Circus Train", 1, 5, 3, 1, False, False, False, False, "kids", 5, 100, 2, 18),
-                ("K013", "Funky Monkey", 2, 4, 6, 1, False, False, False, False, "kids", 12, 80, 4, 15)
-            ]
-
-            all_default_rides = land_rides_data + water_rides_data + kids_rides_data
+            catalog_log.warning("Adding default rides (database appears empty or failed to load)...")
             
-            for ride_data in all_default_rides:
-                try:
-                    self.add_ride(*ride_data)
-                except (ValueError, Error) as e:
-                    print(f"{COLOR_RED}Warning: Could not add default ride {ride_data[1]}: {e}{COLOR_RESET}")
+            try:
+                stored = self._stored_ride_ids(DEFAULT_RIDES)
+                rides = [ride_data for ride_data in DEFAULT_RIDES
+                         if ride_data[0] not in stored and not self.snapshot.has_ride(ride_data[0])]
+                if len(rides) < len(DEFAULT_RIDES):
+                    catalog_log.warning("Skipped %d default rides that already exist.", len(DEFAULT_RIDES) - len(rides))
+                added = self.add_rides(rides)
+                catalog_log.info("Added %d default rides.", added)
+            except (ValueError, Error) as e:
+                catalog_log.error("Could not add default rides: %s", e)
         else:
-            print(f"{COLOR_YELLOW}Default rides not added as rides already exist in the database.{COLOR_RESET}")
-            # Since rides exist, update their restrictions
-            self.update_ride_restrictions()
+            catalog_log.info("Default rides not added as rides already exist in the database.")
+
+    def _stored_ride_ids(self, rides_data):
+        # IDs of `rides_data` (add_ride argument order) already in their ride tables; none without a database
+        if not self.db:
+            return set()
+        ids_by_table = {}
+        for ride_data in rides_data:
+            ids_by_table.setdefault(RIDE_TABLES[ride_data[10]], []).append(ride_data[0])
+        stored = set()
+        for table_name, ride_ids in ids_by_table.items():
+            placeholders = ', '.join(['%s'] * len(ride_ids))
+            stored.update(row[0] for row in self.db.fetchall(f"SELECT id FROM {table_name} WHERE id IN ({placeholders})",
+                                                             tuple(ride_ids)))
+        return stored
 
     def add_default_admin_user(self):
-        # Adds a default admin user if the users table is empty
-        if not self.db_connection:
-            print(f"{COLOR_RED}Cannot add default user: No database connection.{COLOR_RESET}")
+        # Adds a default admin user if the users table is empty (migration 5 does this when provisioning)
+        if not self.db:
+            db_log.error("Cannot add default user: No database connection.")
             return
 
-        cursor = self.db_connection.cursor()
         try:
-            cursor.execute("SELECT COUNT(*) FROM users")
-            user_count = cursor.fetchone()[0]
-            if user_count == 0:
-                print(f"{COLOR_YELLOW}Adding default admin user...{COLOR_RESET}")
-                staff_id = "admin"
-                password_hash = bcrypt.generate_password_hash("password123").decode('utf-8')
-                role = "admin"
-                insert_user_query = "INSERT INTO users (staff_id, password_hash, role) VALUES (%s, %s, %s)"
-                cursor.execute(insert_user_query, (staff_id, password_hash, role))
-                self.db_connection.commit()
-                print(f"{COLOR_GREEN}Default admin user '{staff_id}' added successfully. Password: password123{COLOR_RESET}")
-            else:
-                print(f"{COLOR_YELLOW}Default admin user not added as users already exist.{COLOR_RESET}")
+            with self.db.transaction() as tx:
+                _migrate_seed_admin_user(tx)
+            self.invalidate_user('admin')
         except Error as e:
-            print(f"{COLOR_RED}Error adding default admin user: {e}{COLOR_RESET}")
-        finally:
-            cursor.close()
+            db_log.error("Error adding default admin user: %s", e)
 
     def get_user_by_staff_id(self, staff_id):
-        # Retrieves user data by staff_id from the database."""
-        if not self.db_connection:
+        # Retrieves user data by staff_id, from the user cache or else the database
+        user = self.user_cache.get(staff_id)
+        if user is not None:
+            return user
+        if not self.db:
             return None
-        cursor = self.db_connection.cursor(dictionary=True)
         try:
-            cursor.execute("SELECT staff_id, password_hash, role FROM users WHERE staff_id = %s", (staff_id,))
-            user = cursor.fetchone()
+            row = self.db.fetchone("SELECT staff_id, password_hash, role FROM users WHERE staff_id = %s", (staff_id,))
+            if row is None:
+                return None
+            user = {'staff_id': row[0], 'password_hash': row[1], 'role': row[2]}
+            self.user_cache.put(staff_id, user)
             return user
         except Error as e:
-            print(f"{COLOR_RED}Error fetching user: {e}{COLOR_RESET}")
+            db_log.error("Error fetching user: %s", e)
             return None
-        finally:
-            cursor.close()
+
+    def invalidate_user(self, staff_id):
+        # Every write to the users table must call this so logins never see a stale password hash or role
+        self.user_cache.discard(staff_id)
 
     def close_db_connection(self):
-        # Closes the database connection 
-        if self.db_connection and self.db_connection.is_connected():
-            self.db_connection.close()
-            print(f"{COLOR_GREEN}MySQL connection closed.{COLOR_RESET}")
-
-class PlanModel:
-    # Represents the generated optimal ride plan
-    def __init__(self, selected_rides, total_thrill, remaining_time): 
-        self.selected_rides = selected_rides
-        self.selected_count = len(selected_rides)
-        self.total_thrill = total_thrill
-        self.remaining_time = remaining_time
-
-# Heap Implementation
-def generate_optimal_plan(model):
-    
-    """Generates an optimal ride plan based on available time,VIP status, weather conditions, user age, and weight.
-     Uses a max-heap to prioritize rides by thrill. and includes a gap time between rides.
-     Supports ride preference (like dry_only, wet_only, or mixed), with age-based thrill filtering for adults over 40"""
-    
-    heap = []  # Min-heap that stores negative thrill for max-heap behavior.
-    plan = PlanModel([], 0, model.total_time) 
+        # Closes every pooled database connection
+        if self.db:
+            self.db.close()
+            db_log.info("Database connections closed.")
 
-    # Determine the gap time based on total available time
-    ride_gap_time = 5 if model.total_time < 30 else 10
-    print(f"Calculated ride gap time: {ride_gap_time} minutes.") 
+class ResponseCache:
+    # LRU + TTL cache of serialized API responses, keyed by catalog version and tagged by ride
+    def __init__(self, max_size, ttl_seconds):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tagged = {}  # tag -> keys of the entries carrying it
+        self._lock = threading.Lock()
+        self.generation = 0  # bumped by every invalidation, see put()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
 
-    # Separate rides by type if ride_preference is specified
-    eligible_rides = []
-    
-    # Filter eligible rides first
-    for i, ride in enumerate(model.rides):
-        # Skip restricted rides or weather-affected rides.
-        if ride.restricted or (model.bad_weather and ride.affected_by_weather):
-            continue
-            
-        # filtering based on age and weight 
-        if not (ride.min_age <= model.user_age <= ride.max_age):
-            continue
-        if not (ride.min_weight <= model.user_weight <= ride.max_weight):
-            continue
-        if model.user_age > 40 and ride.thrill > 6:
-            print(f"Skipping ride '{ride.name}' (thrill: {ride.thrill}) - too intense for user over 40")
-            continue
-            
-        eligible_rides.append((i, ride))
-    
-    print(f"Total eligible rides after filtering: {len(eligible_rides)}")
-    
-    # ride preference filtering and ordering
-    if hasattr(model, 'ride_preference') and model.ride_preference:
-        if model.ride_preference == 'dry_only':
-            # Only dry rides
-            eligible_rides = [(i, ride) for i, ride in eligible_rides if ride.type in ['land', 'kids']]
-        elif model.ride_preference == 'wet_only':
-            # Only water rides
-            eligible_rides = [(i, ride) for i, ride in eligible_rides if ride.type == 'water']
-        elif model.ride_preference == 'dry_first':
-            # If dry rides first, separate and sort by thrill
-            dry_rides = [(i, ride) for i, ride in eligible_rides if ride.type in ['land', 'kids']]
-            wet_rides = [(i, ride) for i, ride in eligible_rides if ride.type == 'water']
-            
-            dry_rides.sort(key=lambda x: x[1].thrill, reverse=True)
-            wet_rides.sort(key=lambda x: x[1].thrill, reverse=True)
-            eligible_rides = dry_rides + wet_rides
-    
-    # If no ride preference or mixed preference, use heap-based selection
-    if not hasattr(model, 'ride_preference') or not model.ride_preference or model.ride_preference not in ['dry_only', 'wet_only', 'dry_first']:
-        # heap-based approach
-        for i, ride in eligible_rides:
-            heapq.heappush(heap, (-ride.thrill, i)) #taking -ve so that it behaves like a max-heap
-        
-        # Iterate while there are rides in the heap, with time constraint
-        while heap and plan.remaining_time > 0: 
-            neg_thrill, ride_index = heapq.heappop(heap)
-            ride = model.rides[ride_index]
-
-            # adjusted queue time based on VIP access
-            adjusted_queue_time = ride.queue_time // 2 if model.is_vip and ride.vip_access else ride.queue_time
-            current_ride_total_time = ride.duration + adjusted_queue_time
-            
-            if len(plan.selected_rides) > 0: # Add gap only if it's not the first ride
-                current_ride_total_time += ride_gap_time
-            # Check if the ride can be added within time constraint
-            if current_ride_total_time <= plan.remaining_time:
-                plan.selected_rides.append(ride_index)
-                plan.total_thrill += ride.thrill
-                plan.remaining_time -= current_ride_total_time
-    else:
-        # Sequential selection for dry_first, dry_only, or wet_only
-        for i, ride in eligible_rides:
-            if plan.remaining_time <= 0: 
-                break
-            adjusted_queue_time = ride.queue_time // 2 if model.is_vip and ride.vip_access else ride.queue_time
-            current_ride_total_time = ride.duration + adjusted_queue_time
-            if len(plan.selected_rides) > 0: 
-                current_ride_total_time += ride_gap_time
-            if current_ride_total_time <= plan.remaining_time:
-                plan.selected_rides.append(i)
-                plan.total_thrill += ride.thrill
-                plan.remaining_time -= current_ride_total_time
-    print(f"Final plan: {len(plan.selected_rides)} rides selected, total thrill: {plan.total_thrill}, remaining time: {plan.remaining_time}")
-    return plan
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value, tags=(), generation=None, ttl=None):
+        # A value computed before the latest invalidation (`generation`) is not stored
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl_seconds if ttl is None else min(ttl, self.ttl_seconds)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+                self.invalidations += 1
+
+    def invalidate(self, matches):
+        # Drops every entry carrying a tag for which matches(tag) is true; returns how many were dropped
+        with self._lock:
+            self.generation += 1
+            keys = set()
+            for tag in [tag for tag in self._tagged if matches(tag)]:
+                keys |= self._tagged[tag]
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tagged.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
 
 #  Global ParkModel Instance 
-initial_total_time = 180
-initial_is_vip = True
-initial_bad_weather = False
-initial_user_age = 25
-initial_user_weight = 70
-park_model = ParkModel(initial_total_time, initial_is_vip, initial_bad_weather, initial_user_age, initial_user_weight)
+park_model = ParkModel()
+plan_cache = ResponseCache(PLAN_CACHE_SIZE, PLAN_CACHE_TTL_SECONDS)
+queue_feed = LiveQueueFeed(park_model, plan_cache, QUEUE_APPLY_INTERVAL, QUEUE_PERSIST_INTERVAL)
+rides_cache = ResponseCache(RIDES_CACHE_SIZE, 24 * 3600)
 
 # Authentication 
+# Verified tokens by SHA-256 of the token: (staff_id, role), each kept no longer than the token's own exp
+token_cache = ResponseCache(AUTH_TOKEN_CACHE_SIZE, app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
+
+class PasswordVerifier:
+    # Runs bcrypt checks on a small pool; past `max_pending` checks verify() returns None at once
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.verified = 0
+        self.rejected = 0
+
+    def verify(self, password_hash, password):
+        # True/False for a checked password, None when the verifier is saturated
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return None
+        try:
+            if self._executor is None:
+                with self._lock:
+                    if self._executor is None:
+                        from concurrent.futures import ThreadPoolExecutor
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+            future = self._executor.submit(bcrypt.check_password_hash, password_hash, password)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The permit goes back when the check finishes, since a timed-out check still holds a worker
+        future.add_done_callback(lambda _: self._slots.release())
+        result = future.result(timeout=self.timeout)
+        with self._lock:
+            self.verified += 1
+        return result
+
+    def stats(self):
+        return {'workers': self.workers, 'max_pending': self.max_pending, 'verified': self.verified,
+                'rejected': self.rejected}
+
+password_verifier = PasswordVerifier(AUTH_BCRYPT_WORKERS, AUTH_BCRYPT_MAX_PENDING, AUTH_BCRYPT_TIMEOUT)
+
+def verify_token(token):
+    # Returns (staff_id, role) for a valid token; raises jwt.ExpiredSignatureError / jwt.InvalidTokenError
+    started = time.perf_counter()
+    token_key = hashlib.sha256(token.encode('utf-8')).digest()
+    cached = token_cache.get(token_key)
+    if cached is None:
+        data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
+        cached = (data['staff_id'], data['role'])
+        if 'exp' in data:
+            token_cache.put(token_key, cached, ttl=data['exp'] - time.time())
+    auth_seconds.observe(time.perf_counter() - started, ('token',))
+    return cached
+
+def check_password(user, password):
+    # True/False for the user's password, None if the password verifier turned the attempt away
+    started = time.perf_counter()
+    try:
+        verified = password_verifier.verify(user['password_hash'], password)
+    except TimeoutError:
+        verified = None
+    auth_seconds.observe(time.perf_counter() - started, ('password',))
+    if verified is None:
+        auth_rejections.inc(labels=('overloaded',))
+        auth_log.warning("Login for %s turned away: password verification is saturated.", user['staff_id'])
+    elif not verified:
+        auth_rejections.inc(labels=('bad_credentials',))
+    return verified
+
+def issue_token(user):
+    # Signed JWT for a logged-in user, valid for JWT_ACCESS_TOKEN_EXPIRES
+    token_payload = {
+        'staff_id': user['staff_id'],
+        'role': user['role'],
+        'exp': datetime.utcnow() + app.config['JWT_ACCESS_TOKEN_EXPIRES']
+    }
+    return jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
+
 def token_required(f):
-    # to check for a valid JWT in the Authorization header 
+    # to check for a valid JWT in the Authorization header; tokens verified once are served from token_cache
 
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -525,15 +1398,13 @@ def token_required(f):
         if not token:
             return jsonify({'message': 'Token is missing!'}), 401
         try:
-            data = jwt.decode(token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            current_user = data['staff_id']
-            current_role = data['role']
+            current_user, current_role = verify_token(token)
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired!'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'message': 'Token is invalid!'}), 401
         except Exception as e:
-            print(f"Token decoding error: {e}")
+            auth_log.exception("Token decoding error: %s", e)
             return jsonify({'message': 'An error occurred during token validation.'}), 500
         return f(current_user, current_role, *args, **kwargs)
     return decorated
@@ -559,17 +1430,24 @@ def login():
 
     if not staff_id or not password:
         return jsonify({'message': 'Staff ID and password are required.'}), 400
+    started = time.perf_counter()
     user = park_model.get_user_by_staff_id(staff_id)
-    if not user or not bcrypt.check_password_hash(user['password_hash'], password):
+    looked_up = time.perf_counter()
+    auth_seconds.observe(looked_up - started, ('user_lookup',))
+    if not user:
+        auth_rejections.inc(labels=('bad_credentials',))
+        return jsonify({'message': 'Invalid Staff ID or password.'}), 401
+    verified = check_password(user, password)
+    if verified is None:
+        response = jsonify({'message': 'Too many logins in progress. Please retry shortly.'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    if not verified:
         return jsonify({'message': 'Invalid Staff ID or password.'}), 401
 
     # Generate JWT
-    token_payload = {
-        'staff_id': user['staff_id'],
-        'role': user['role'],
-        'exp': datetime.utcnow() + app.config['JWT_ACCESS_TOKEN_EXPIRES']
-    }
-    token = jwt.encode(token_payload, app.config['SECRET_KEY'], algorithm="HS256")
+    token = issue_token(user)
+    auth_seconds.observe(time.perf_counter() - started, ('login',))
 
     return jsonify({
         'message': 'Login successful!',
@@ -578,201 +1456,921 @@ def login():
         'role': user['role']
     }), 200
 
+def _encode_cursor(ride_id):
+    return base64.urlsafe_b64encode(str(ride_id).encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    try:
+        return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+def render_rides_page(snapshot, fields, ride_type, cursor, limit):
+    # Serializes one /api/rides response; returns (body, etag, next_cursor)
+    rows = snapshot.listing(ride_type)
+    start = 0
+    if cursor:
+        position = snapshot.listing_position(_decode_cursor(cursor), ride_type)
+        if position is None:
+            raise ValueError('Invalid cursor')
+        start = position + 1
+    page = rows[start:start + limit] if limit else rows[start:]
+    next_cursor = _encode_cursor(page[-1]['id']) if limit and page and start + limit < len(rows) else None
+    if fields != RIDE_FIELDS:
+        page = [{field: row[field] for field in fields} for row in page]
+    body = app.json.dumps(page)
+    etag = '"' + hashlib.sha1(body.encode('utf-8')).hexdigest() + '"'
+    return body, etag, next_cursor
+
+def parse_rides_query(args):
+    # Parses the /api/rides query into (fields, ride_type, cursor, limit); raises ValueError
+    fields = RIDE_FIELDS
+    if args.get('fields'):
+        fields = [field.strip() for field in args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in RIDE_FIELDS]
+        if unknown or not fields:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}. Valid fields: {', '.join(RIDE_FIELDS)}")
+    ride_type = args.get('type') or None
+    if ride_type is not None and ride_type not in ['land', 'water', 'kids']:
+        raise ValueError('Invalid ride type. Must be "land", "water", or "kids".')
+    try:
+        limit = int(args['limit']) if args.get('limit') else None
+    except ValueError:
+        raise ValueError(f'limit must be an integer between 1 and {RIDES_PAGE_MAX_LIMIT}')
+    if limit is not None and not (1 <= limit <= RIDES_PAGE_MAX_LIMIT):
+        raise ValueError(f'limit must be between 1 and {RIDES_PAGE_MAX_LIMIT}')
+    cursor = args.get('cursor') or None
+    return fields, ride_type, cursor, limit
+
+def _rides_cache_key(snapshot, query):
+    fields, ride_type, cursor, limit = query
+    return snapshot.version, tuple(fields), ride_type, cursor, limit
+
+def cached_rides_page(snapshot, query):
+    # The (body, etag, next_cursor) page for a parse_rides_query result if rides_cache has it, else None
+    return rides_cache.get(_rides_cache_key(snapshot, query))
+
+def render_cached_rides_page(snapshot, query):
+    # Renders a page missing from rides_cache and stores it
+    entry = render_rides_page(snapshot, *query)
+    rides_cache.put(_rides_cache_key(snapshot, query), entry)
+    return entry
+
+def get_rides_page(snapshot, args):
+    # The (body, etag, next_cursor) page for an /api/rides query, from rides_cache or rendered on a miss
+    query = parse_rides_query(args)
+    return cached_rides_page(snapshot, query) or render_cached_rides_page(snapshot, query)
+
 @app.route('/api/rides', methods=['GET'])
 def get_rides():
-    # API endpoint to retrieve all available rides
+    # API endpoint to retrieve all available rides, with ETags, ?fields=, ?type= and cursor paging
     try:
-        rides_data = []
-        for ride in park_model.rides:
-            rides_data.append({
-                'id': ride.id,
-                'name': ride.name,
-                'thrill': ride.thrill,
-                'duration': ride.duration,
-                'queue_time': ride.queue_time,
-                'fatigue': ride.fatigue,
-                'mandatory': ride.mandatory,
-                'restricted': ride.restricted,
-                'vip_access': ride.vip_access,
-                'affected_by_weather': ride.affected_by_weather,
-                'type': ride.type,
-                'min_weight': getattr(ride, 'min_weight', 0),
-                'max_weight': getattr(ride, 'max_weight', 200),
-                'min_age': getattr(ride, 'min_age', 0),
-                'max_age': getattr(ride, 'max_age', 100)
-            })
-        return jsonify(rides_data), 200
+        body, etag, next_cursor = get_rides_page(park_model.snapshot, request.args)
+
+        if request.if_none_match.contains(etag.strip('"')):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(body, status=200, mimetype='application/json')
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'no-cache'
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+            next_args = request.args.to_dict()
+            next_args['cursor'] = next_cursor
+            response.headers['Link'] = f'<{request.base_url}?{urlencode(next_args)}>; rel="next"'
+        return response
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
     except Exception as e:
-        print(f"Error in get_rides endpoint: {e}")
+        api_log.exception("Error in get_rides endpoint: %s", e)
         return jsonify({'error': f"Failed to retrieve rides: {str(e)}"}), 500
 
+def _flag(value):
+    # Boolean fields arrive as JSON booleans or, from CSV, as text such as "true"/"0"
+    if isinstance(value, str):
+        return value.strip().lower() in ['1', 'true', 'yes', 'y', 't']
+    return bool(value)
+
+def _optional(data, field, default):
+    value = data.get(field)
+    return default if value is None or value == '' else value
+
+def _whole_number(value, field):
+    # int() of a JSON object or array raises TypeError; report it as a bad value like any other
+    try:
+        return int(value)
+    except TypeError:
+        raise ValueError(f"{field} must be a number, not {type(value).__name__}") from None
+
+def validate_ride_data(data):
+    # Validates a ride payload and returns the add_ride arguments as a tuple; raises ValueError with a client message
+    if not data or not isinstance(data, dict):
+        raise ValueError('Invalid JSON data provided')
+
+    # Validate required fields
+    required_fields = ['id', 'name', 'thrill', 'duration', 'queue_time', 'fatigue', 'type']
+    for field in required_fields:
+            if field not in data or data[field] is None or data[field] == '':
+                raise ValueError(f'Missing required field: {field}')
+
+    # Validate and convert data types
+    ride_id = str(data.get('id')).strip()
+    name = str(data.get('name')).strip()
+    thrill = _whole_number(data.get('thrill'), 'thrill')
+    duration = _whole_number(data.get('duration'), 'duration')
+    queue_time = _whole_number(data.get('queue_time'), 'queue_time')
+    fatigue = _whole_number(data.get('fatigue'), 'fatigue')
+    mandatory = _flag(_optional(data, 'mandatory', False))
+    restricted = _flag(_optional(data, 'restricted', False))
+    vip_access = _flag(_optional(data, 'vip_access', False))
+    affected_by_weather = _flag(_optional(data, 'affected_by_weather', False))
+    ride_type = str(data.get('type')).strip().lower()
+    min_weight = _whole_number(_optional(data, 'min_weight', 0), 'min_weight')
+    max_weight = _whole_number(_optional(data, 'max_weight', 200), 'max_weight')
+    min_age = _whole_number(_optional(data, 'min_age', 0), 'min_age')
+    max_age = _whole_number(_optional(data, 'max_age', 100), 'max_age')
+    if not name:
+        raise ValueError('Ride name cannot be empty')
+    if not (1 <= thrill <= 10):
+        raise ValueError('Thrill must be between 1 and 10')
+    if not (1 <= fatigue <= 10):
+        raise ValueError('Fatigue must be between 1 and 10')
+    if duration < 1:
+        raise ValueError('Duration must be at least 1 minute')
+    if queue_time < 0:
+        raise ValueError('Queue time cannot be negative')
+    if ride_type not in ['land', 'water', 'kids']:
+        raise ValueError('Invalid ride type. Must be "land", "water", or "kids".')
+    return (ride_id, name, thrill, duration, queue_time, fatigue, mandatory, restricted, vip_access,
+            affected_by_weather, ride_type, min_weight, max_weight, min_age, max_age)
+
+def parse_ride_stream(stream, data_format):
+    # Lazily parses a CSV or NDJSON body into (row_number, dict) pairs, or (row_number, error)
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if data_format == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, f"Invalid JSON: {e}"
+
 @app.route('/api/add_ride', methods=['POST'])
 @token_required
 @roles_required(['admin'])
 def add_ride(current_user, current_role):
     # admin authentication 
     try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'error': 'Invalid JSON data provided'}), 400
-
-        # Validate required fields
-        required_fields = ['id', 'name', 'thrill', 'duration', 'queue_time', 'fatigue', 'type']
-        for field in required_fields:
-                if field not in data or data[field] is None or data[field] == '':
-                    return jsonify({'error': f'Missing required field: {field}'}), 400
-
-        # Validate and convert data types
-        ride_id = str(data.get('id')).strip()
-        name = str(data.get('name')).strip()
-        thrill = int(data.get('thrill'))
-        duration = int(data.get('duration'))
-        queue_time = int(data.get('queue_time'))
-        fatigue = int(data.get('fatigue'))
-        mandatory = bool(data.get('mandatory', False))
-        restricted = bool(data.get('restricted', False))
-        vip_access = bool(data.get('vip_access', False))
-        affected_by_weather = bool(data.get('affected_by_weather', False))
-        ride_type = str(data.get('type')).lower()
-        min_weight = int(data.get('min_weight', 0))
-        max_weight = int(data.get('max_weight', 200))
-        min_age = int(data.get('min_age', 0))
-        max_age = int(data.get('max_age', 100))
-        if not name:
-            return jsonify({'error': 'Ride name cannot be empty'}), 400
-        if not (1 <= thrill <= 10):
-            return jsonify({'error': 'Thrill must be between 1 and 10'}), 400
-        if not (1 <= fatigue <= 10):
-            return jsonify({'error': 'Fatigue must be between 1 and 10'}), 400
-        if duration < 1:
-            return jsonify({'error': 'Duration must be at least 1 minute'}), 400
-        if queue_time < 0:
-            return jsonify({'error': 'Queue time cannot be negative'}), 400
-        if ride_type not in ['land', 'water', 'kids']:
-            return jsonify({'error': 'Invalid ride type. Must be "land", "water", or "kids".'}), 400
-
-        park_model.add_ride(
-            ride_id, name, thrill, duration, queue_time, fatigue,
-        mandatory, restricted, vip_access, affected_by_weather, ride_type,
-        min_weight, max_weight, min_age, max_age
-        )
-        return jsonify({'message': f"Ride '{name}' added successfully by {current_user}!"}), 201
+        ride_data = validate_ride_data(request.get_json())
+        park_model.add_ride(*ride_data)
+        return jsonify({'message': f"Ride '{ride_data[1]}' added successfully by {current_user}!"}), 201
         
     except ValueError as ve:
         return jsonify({'error': str(ve)}), 400
     except Exception as e:
-        print(f"Error in add_ride endpoint: {e}")
+        api_log.exception("Error in add_ride endpoint: %s", e)
         return jsonify({'error': f"Failed to add ride: {str(e)}"}), 500
 
+def _ride_payload(ride_id, data, current=None):
+    # PUT/PATCH body as a validate_ride_data payload; a PATCH is laid over `current`
+    if not data or not isinstance(data, dict):
+        raise ValueError('Invalid JSON data provided')
+    if data.get('id') not in (None, '') and str(data['id']).strip() != ride_id:
+        raise ValueError('Ride ID in the body does not match the URL; IDs cannot be changed.')
+    return {**(current or {}), **data, 'id': ride_id}
+
+@app.route('/api/rides/<ride_id>', methods=['GET'])
+def get_ride(ride_id):
+    ride = park_model.snapshot.ride_record(ride_id)
+    if ride is None:
+        return jsonify({'error': f"Ride with ID {ride_id} does not exist."}), 404
+    return jsonify(ride), 200
+
+@app.route('/api/rides/<ride_id>', methods=['PUT', 'PATCH'])
+@token_required
+@roles_required(['admin'])
+def update_ride(current_user, current_role, ride_id):
+    # PUT replaces a ride with a full ride body (as for /api/add_ride); PATCH changes only the fields it sends
+    try:
+        current = park_model.snapshot.ride_record(ride_id)
+        if current is None:
+            return jsonify({'error': f"Ride with ID {ride_id} does not exist."}), 404
+        data = request.get_json(silent=True)
+        ride_data = validate_ride_data(_ride_payload(ride_id, data, current if request.method == 'PATCH' else None))
+        park_model.update_ride(ride_data)
+        return jsonify({'message': f"Ride '{ride_data[1]}' updated successfully by {current_user}!",
+                        'ride': park_model.snapshot.ride_record(ride_id)}), 200
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        api_log.exception("Error in update_ride endpoint: %s", e)
+        return jsonify({'error': f"Failed to update ride: {str(e)}"}), 500
+
+@app.route('/api/rides/<ride_id>', methods=['DELETE'])
+@token_required
+@roles_required(['admin'])
+def delete_ride(current_user, current_role, ride_id):
+    try:
+        if not park_model.snapshot.has_ride(ride_id):
+            return jsonify({'error': f"Ride with ID {ride_id} does not exist."}), 404
+        park_model.delete_ride(ride_id)
+        return jsonify({'message': f"Ride {ride_id} deleted by {current_user}."}), 200
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        api_log.exception("Error in delete_ride endpoint: %s", e)
+        return jsonify({'error': f"Failed to delete ride: {str(e)}"}), 500
+
+@app.route('/api/rides/bulk', methods=['POST'])
+@token_required
+@roles_required(['admin'])
+def bulk_add_rides(current_user, current_role):
+    # Streams a CSV or NDJSON body of rides (?format=csv|ndjson) and reports per-row errors
+    try:
+        data_format = request.args.get('format', '').lower()
+        if not data_format:
+            mimetype = request.mimetype or ''
+            if mimetype in ['text/csv', 'application/csv']:
+                data_format = 'csv'
+            elif mimetype in ['application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/jsonlines']:
+                data_format = 'ndjson'
+        if data_format not in ['csv', 'ndjson']:
+            return jsonify({'error': 'Unsupported format. Send text/csv or application/x-ndjson, or pass ?format=csv|ndjson.'}), 400
+
+        report = park_model.import_rides(parse_ride_stream(request.stream, data_format))
+        report['message'] = f"{report['imported']} rides imported by {current_user}, {report['failed']} rejected."
+        return jsonify(report), 200
+    except Exception as e:
+        api_log.exception("Error in bulk_add_rides endpoint: %s", e)
+        return jsonify({'error': f"Failed to import rides: {str(e)}"}), 500
+
+def parse_queue_curve(curve):
+    # Validates a queue curve: QUEUE_SLOTS_PER_DAY whole minutes (0..QUEUE_MAX_MINUTES), one per slot from midnight
+    if not isinstance(curve, (list, tuple)) or len(curve) != QUEUE_SLOTS_PER_DAY:
+        raise ValueError(f"curve must list {QUEUE_SLOTS_PER_DAY} queue times, one per {QUEUE_SLOT_MINUTES}-minute slot from midnight.")
+    try:
+        values = [int(minutes) for minutes in curve]
+    except (TypeError, ValueError):
+        raise ValueError("curve values must be whole minutes.")
+    if any(isinstance(minutes, (bool, float)) for minutes in curve) or not all(0 <= v <= QUEUE_MAX_MINUTES for v in values):
+        raise ValueError(f"curve values must be whole minutes between 0 and {QUEUE_MAX_MINUTES}.")
+    return np.array(values, dtype=np.int64)
+
+def parse_park_layout(data):
+    # Builds a ParkLayout from the nodes, walkways and ride locations; raises ValueError if malformed
+    if not isinstance(data, dict):
+        raise ValueError("Invalid JSON data provided")
+    try:
+        nodes = [(node['id'], node.get('x', 0), node.get('y', 0)) for node in data.get('nodes', [])]
+        walkways = [(walkway['from'], walkway['to'], walkway['minutes']) for walkway in data.get('walkways', [])]
+        ride_locations = dict(data.get('rides', {}))
+        return ParkLayout(nodes, walkways, ride_locations, data.get('entrance'))
+    except (KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Malformed layout: {e}")
+
+@app.route('/api/park_layout', methods=['GET'])
+def get_park_layout():
+    return jsonify(park_model.snapshot.layout.to_dict()), 200
+
+@app.route('/api/park_layout', methods=['PUT'])
+@token_required
+@roles_required(['admin'])
+def put_park_layout(current_user, current_role):
+    # Replaces the park layout; all-pairs walking times are recomputed before it is published
+    try:
+        layout = parse_park_layout(request.get_json(silent=True))
+        park_model.set_layout(layout)
+        return jsonify({'message': f"Park layout updated by {current_user}.", 'nodes': len(layout.nodes),
+                        'rides_placed': len(layout.ride_locations), 'precompute_ms': layout.precompute_ms}), 200
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        api_log.exception("Error in put_park_layout endpoint: %s", e)
+        return jsonify({'error': f"Failed to update park layout: {str(e)}"}), 500
+
+@app.route('/api/rides/<ride_id>/queue_curve', methods=['GET'])
+def get_queue_curve(ride_id):
+    # The queue curve the schedule engine uses for a ride: the stored one, or the default crowd profile
+    snapshot = park_model.snapshot
+    row = snapshot.catalog.rows_by_id.get(ride_id)
+    if row is None or row >= snapshot.size:
+        return jsonify({'error': f"Ride with ID {ride_id} does not exist."}), 404
+    curve = snapshot.queue_table(np.array([row]), False)[0]
+    return jsonify({'ride_id': ride_id, 'slot_minutes': QUEUE_SLOT_MINUTES, 'curve': curve.tolist(),
+                    'source': 'stored' if ride_id in snapshot.queue_curves else 'default'}), 200
+
+@app.route('/api/rides/<ride_id>/queue_curve', methods=['PUT'])
+@token_required
+@roles_required(['admin'])
+def put_queue_curve(current_user, current_role, ride_id):
+    # Stores a measured queue curve, {"curve": [...]} with one value per QUEUE_SLOT_MINUTES slot from midnight
+    try:
+        data = request.get_json(silent=True)
+        curve = parse_queue_curve(data.get('curve') if isinstance(data, dict) else None)
+        park_model.set_queue_curve(ride_id, curve)
+        return jsonify({'message': f"Queue curve for ride {ride_id} updated by {current_user}."}), 200
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        api_log.exception("Error in put_queue_curve endpoint: %s", e)
+        return jsonify({'error': f"Failed to store queue curve: {str(e)}"}), 500
+
+def parse_queue_update(item, snapshot, now):
+    # Validates one {"ride_id", "queue_time", "timestamp"} update or triple; returns a tuple
+    if isinstance(item, dict):
+        ride_id, queue_time, timestamp = item.get('ride_id'), item.get('queue_time'), item.get('timestamp', now)
+    elif isinstance(item, (list, tuple)) and len(item) in (2, 3):
+        ride_id, queue_time, timestamp = (list(item) + [now])[:3]
+    else:
+        raise ValueError("Expected an object or an [id, queue_time, timestamp] array.")
+    if isinstance(ride_id, int) and not isinstance(ride_id, bool):
+        ride_id = str(ride_id)
+    elif not isinstance(ride_id, str):
+        raise ValueError("ride_id must be a string or an integer.")
+    if not snapshot.has_ride(ride_id):
+        raise ValueError(f"Unknown ride '{ride_id}'.")
+    if isinstance(queue_time, bool) or not isinstance(queue_time, int) or not 0 <= queue_time <= QUEUE_MAX_MINUTES:
+        raise ValueError(f"queue_time must be an integer between 0 and {QUEUE_MAX_MINUTES}.")
+    if isinstance(timestamp, bool) or not isinstance(timestamp, (int, float)) or timestamp > now + QUEUE_MAX_CLOCK_SKEW:
+        raise ValueError("timestamp must be Unix seconds, not in the future.")
+    return ride_id, queue_time, timestamp
+
+@app.route('/api/queue_times', methods=['POST'])
+@token_required
+@roles_required(['admin'])
+def post_queue_times(current_user, current_role):
+    # Live queue-time feed (JSON or NDJSON); applied about every QUEUE_APPLY_INTERVAL seconds, hence 202
+    try:
+        if (request.mimetype or '') in ['application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/jsonlines']:
+            items = parse_ride_stream(request.stream, 'ndjson')
+        else:
+            data = request.get_json(silent=True)
+            updates = data.get('updates') if isinstance(data, dict) else data
+            if not isinstance(updates, list):
+                return jsonify({'error': 'An "updates" array is required'}), 400
+            items = enumerate(updates, start=1)
+
+        snapshot = park_model.snapshot
+        now = time.time()
+        valid = []
+        report = {'accepted': 0, 'stale': 0, 'rejected': 0, 'errors': [], 'errors_truncated': False}
+        for row_number, item in items:
+            if row_number > QUEUE_UPDATES_MAX_BATCH:
+                return jsonify({'error': f'At most {QUEUE_UPDATES_MAX_BATCH} updates per request'}), 400
+            try:
+                if isinstance(item, str):
+                    raise ValueError(item)
+                valid.append(parse_queue_update(item, snapshot, now))
+            except ValueError as ve:
+                report['rejected'] += 1
+                if len(report['errors']) < BULK_IMPORT_MAX_ERRORS:
+                    report['errors'].append({'row': row_number, 'error': str(ve)})
+                else:
+                    report['errors_truncated'] = True
+        if not valid and report['rejected']:
+            # Nothing in the batch was usable
+            return jsonify(report), 400
+        report['accepted'], report['stale'] = queue_feed.record(valid)
+        return jsonify(report), 202
+    except Exception as e:
+        api_log.exception("Error in post_queue_times endpoint: %s", e)
+        return jsonify({'error': f"Failed to record queue times: {str(e)}"}), 500
+
+class PlanRequestError(ValueError):
+    # A plan request failed validation; the message is returned to the client as-is
+    pass
+
+def parse_plan_request(data):
+    # Validates one set of guest preferences and returns its PlanningContext
+    if not data or not isinstance(data, dict):
+        raise PlanRequestError('Invalid JSON data provided')
+    if 'total_time' not in data or 'user_age' not in data or 'user_weight' not in data: # Removed max_daily_rides
+        raise PlanRequestError('total_time, user_age, and user_weight are required')
+    try:
+        total_time = int(data.get('total_time'))
+        user_age = int(data.get('user_age'))
+        user_weight = int(data.get('user_weight'))
+    except (TypeError, ValueError) as e:
+        raise PlanRequestError(f'Invalid input: {str(e)}')
+    is_vip = bool(data.get('is_vip', False))
+    bad_weather = bool(data.get('bad_weather', False))
+    ride_preference = data.get('ride_preference') or ''
+    engine = str(data.get('engine') or 'heap').lower()
+    entry_time = None
+    if engine == 'schedule':
+        try:
+            entry_time = parse_clock_time(data.get('entry_time', PARK_OPENING_TIME))
+        except ValueError as e:
+            raise PlanRequestError(str(e))
+    alternatives = max_fatigue = None
+    if engine == 'pareto':
+        try:
+            alternatives = int(data['alternatives']) if data.get('alternatives') is not None else PARETO_DEFAULT_ALTERNATIVES
+            max_fatigue = int(data['max_fatigue']) if data.get('max_fatigue') is not None else None
+        except (TypeError, ValueError) as e:
+            raise PlanRequestError(f'Invalid input: {str(e)}')
+        if not 1 <= alternatives <= PARETO_MAX_ALTERNATIVES:
+            raise PlanRequestError(f'alternatives must be between 1 and {PARETO_MAX_ALTERNATIVES}')
+        if max_fatigue is not None and max_fatigue < 1:
+            raise PlanRequestError('max_fatigue must be at least 1')
+
+    # Validate inputs
+    if total_time < 1:
+        raise PlanRequestError('Total time must be at least 1 minute')
+    _validate_ride_preference(ride_preference)
+    _validate_guest(user_age, user_weight)
+    if engine not in PLANNING_ENGINES:
+        raise PlanRequestError('Invalid engine. Must be "heap", "knapsack", "schedule" or "pareto".')
+    return PlanningContext(total_time, is_vip, bad_weather, user_age, user_weight, ride_preference, engine, entry_time,
+                           alternatives, max_fatigue)
+
+def _validate_ride_preference(ride_preference):
+    # Preferences shared by single-guest and group requests
+    if ride_preference not in RIDE_PREFERENCES:
+        raise PlanRequestError('Invalid ride_preference. Must be "dry_only", "wet_only", "dry_first" or empty.')
+
+def _validate_guest(user_age, user_weight):
+    # Age and weight bounds shared by single-guest and group requests
+    if user_age < 1 or user_age > 100:
+        raise PlanRequestError('User age must be between 1 and 100')
+    if user_weight < 10 or user_weight > 300:
+        raise PlanRequestError('User weight must be between 10 and 300 kg')
+
+def parse_group_plan_request(data):
+    # Validates a group plan request; returns (context, members, split_time)
+    if not data or not isinstance(data, dict):
+        raise PlanRequestError('Invalid JSON data provided')
+    members = data.get('members')
+    if 'total_time' not in data or not isinstance(members, list) or not members:
+        raise PlanRequestError('total_time and a non-empty members array are required')
+    if len(members) > GROUP_MAX_MEMBERS:
+        raise PlanRequestError(f'At most {GROUP_MAX_MEMBERS} members per group')
+    if not all(isinstance(member, dict) and 'user_age' in member and 'user_weight' in member for member in members):
+        raise PlanRequestError('Every member needs user_age and user_weight')
+    try:
+        total_time = int(data.get('total_time'))
+        split_time = int(data['split_time']) if data.get('split_time') is not None else None
+        parsed = [(int(member['user_age']), int(member['user_weight'])) for member in members]
+    except (TypeError, ValueError) as e:
+        raise PlanRequestError(f'Invalid input: {str(e)}')
+    is_vip = bool(data.get('is_vip', False))
+    bad_weather = bool(data.get('bad_weather', False))
+    ride_preference = data.get('ride_preference') or ''
+    engine = str(data.get('engine') or 'heap').lower()
+
+    # Validate inputs
+    if total_time < 1:
+        raise PlanRequestError('Total time must be at least 1 minute')
+    _validate_ride_preference(ride_preference)
+    for user_age, user_weight in parsed:
+        _validate_guest(user_age, user_weight)
+    if engine not in GROUP_ENGINES:
+        raise PlanRequestError('Invalid engine. Group plans support "heap" or "knapsack".')
+    if split_time is not None:
+        if not 1 <= split_time < total_time:
+            raise PlanRequestError('split_time must be at least 1 minute and less than total_time')
+        kids = sum(1 for user_age, _ in parsed if user_age <= GROUP_KIDS_MAX_AGE)
+        if not 0 < kids < len(parsed):
+            raise PlanRequestError(f'split_time needs both kids (age {GROUP_KIDS_MAX_AGE} or under) and adults')
+    context = PlanningContext(total_time, is_vip, bad_weather, None, None, ride_preference, engine)
+    return context, parsed, split_time
+
+def parse_clock_time(value):
+    # "HH:MM" or minutes after midnight -> minutes after midnight
+    if isinstance(value, str) and ':' in value:
+        hours, _, minutes = value.partition(':')
+        try:
+            value = int(hours) * 60 + int(minutes) if 0 <= int(minutes) < 60 else -1
+        except ValueError:
+            value = -1
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < 24 * 60:
+        raise ValueError('entry_time must be "HH:MM" or minutes after midnight')
+    return value
+
+def format_clock_time(minutes):
+    return f'{minutes // 60 % 24:02d}:{minutes % 60:02d}'
+
+def build_plan_data(context, snapshot, plan):
+    # Prepares the plan data for JSON response
+    selected_rides_details = _ride_details(context, snapshot, plan)
+
+    plan_data = {
+        'selected_rides': selected_rides_details,
+        'total_thrill': plan.total_thrill,
+        'remaining_time': plan.remaining_time,
+        # 'remaining_rides': plan.remaining_fatigue,  
+        'total_time_used': context.total_time,
+        # 'max_daily_rides_used': max_daily_rides,
+        'is_vip_used': context.is_vip,
+        'bad_weather_used': context.bad_weather,
+        'user_age_used': context.user_age,
+        'user_weight_used': context.user_weight,
+        'ride_preference_used': context.ride_preference,
+        'engine_used': plan.engine
+    }
+    if context.entry_time is not None:
+        plan_data['entry_time_used'] = format_clock_time(context.entry_time)
+
+    # Pareto plans list every alternative from the front, the plan above first
+    if plan.alternatives is not None:
+        ids = snapshot.catalog.ids
+        plan_data['total_fatigue'] = plan.total_fatigue
+        plan_data['max_fatigue_used'] = context.max_fatigue
+        plan_data['alternatives'] = [{
+            'ride_ids': [ids[row] for row in alternative.selected_rides],
+            'total_thrill': alternative.total_thrill,
+            'total_fatigue': alternative.total_fatigue,
+            'remaining_time': alternative.remaining_time
+        } for alternative in plan.alternatives]
+    if plan.walks is not None:
+        plan_data['walking_time'] = sum(plan.walks)
+    return plan_data
+
+def _ride_details(context, snapshot, plan):
+    # One JSON object per selected ride, in plan order
+    selected_rides_details = []
+    for ride_index in plan.selected_rides:
+        ride = snapshot.rides[ride_index]
+        adjusted_queue_time = ride.queue_time // 2 if context.is_vip and ride.vip_access else ride.queue_time
+        selected_rides_details.append({
+            'id': ride.id,
+            'name': ride.name,
+            'thrill': ride.thrill,
+            'duration': ride.duration,
+            'queue_time': ride.queue_time,
+            'vip_queue_time': adjusted_queue_time,
+            'type': ride.type 
+        })
+
+    # Routed plans say how far each ride is from the previous stop
+    if plan.walks is not None:
+        for details, minutes in zip(selected_rides_details, plan.walks):
+            details['walk_minutes'] = minutes
+
+    # Timed itineraries also say when to join each queue, the wait expected then, and when the ride ends
+    if plan.schedule is not None:
+        for details, (start, expected_queue, finish) in zip(selected_rides_details, plan.schedule):
+            details.update({'start_time': format_clock_time(start), 'expected_queue_time': expected_queue,
+                            'end_time': format_clock_time(finish)})
+    return selected_rides_details
+
+def plan_group(context, snapshot, members, split_time=None):
+    # Plans a group with one run per segment: shared rides, then an optional kids/adults split
+    masks = {}
+    together_context = context
+    if split_time is not None:
+        together_context = PlanningContext(context.total_time - split_time, context.is_vip, context.bad_weather,
+                                           None, None, context.ride_preference, context.engine)
+    together = generate_optimal_plan(together_context, snapshot,
+                                     find_group_eligible_rides(context, snapshot, members, masks))
+    plan_data = _segment_data(together_context, snapshot, together)
+    plan_data.update({
+        'group_size': len(members),
+        'members_used': [{'user_age': user_age, 'user_weight': user_weight} for user_age, user_weight in members],
+        'total_time_used': context.total_time,
+        'is_vip_used': context.is_vip,
+        'bad_weather_used': context.bad_weather,
+        'ride_preference_used': context.ride_preference,
+        'engine_used': together.engine
+    })
+    if split_time is None:
+        return plan_data
+
+    # Neither segment repeats a ride the whole group already took
+    split_context = PlanningContext(split_time, context.is_vip, context.bad_weather, None, None,
+                                    context.ride_preference, context.engine)
+    kids_code = RIDE_TYPE_CODES['kids']
+    taken = np.asarray(together.selected_rides, dtype=np.int64)
+    segments = {}
+    for name, segment_members in (('kids', [m for m in members if m[0] <= GROUP_KIDS_MAX_AGE]),
+                                  ('adults', [m for m in members if m[0] > GROUP_KIDS_MAX_AGE])):
+        rows = find_group_eligible_rides(context, snapshot, segment_members, masks)
+        is_kids = snapshot.column('type')[rows] == kids_code
+        rows = rows[(is_kids if name == 'kids' else ~is_kids) & ~np.isin(rows, taken)]
+        segment = _segment_data(split_context, snapshot, generate_optimal_plan(split_context, snapshot, rows))
+        segment['members'] = len(segment_members)
+        segments[name] = segment
+    plan_data['split'] = {'split_time_used': split_time, **segments}
+    return plan_data
+
+def _segment_data(context, snapshot, plan):
+    # The rides, thrill and leftover minutes of one group segment
+    segment = {
+        'selected_rides': _ride_details(context, snapshot, plan),
+        'total_thrill': plan.total_thrill,
+        'remaining_time': plan.remaining_time
+    }
+    if plan.walks is not None:
+        segment['walking_time'] = sum(plan.walks)
+    return segment
+
+def group_cache_tags(context, members, plan_data):
+    # Plan-cache tags for a group plan: every ride any segment uses, and each member's eligibility profile
+    segments = [plan_data] + [plan_data['split'][name] for name in ('kids', 'adults') if 'split' in plan_data]
+    ride_ids = {ride['id'] for segment in segments for ride in segment['selected_rides']}
+    profiles = sorted({(user_age, user_weight, context.bad_weather, context.ride_preference)
+                       for user_age, user_weight in members})
+    return (tuple(('ride', ride_id) for ride_id in sorted(ride_ids)) +
+            tuple(('eligibility', profile) for profile in profiles))
+
+def render_plan(context, snapshot, cache_key, cache_generation):
+    # Plans one request, serializes it and stores it in the plan cache; returns the JSON body
+    plan = generate_optimal_plan(context, snapshot)
+    started = time.perf_counter()
+    plan_data = build_plan_data(context, snapshot, plan)
+    built = time.perf_counter()
+    body = app.json.dumps(plan_data)
+    plan_stage_seconds.observe(built - started, ('build',))
+    plan_stage_seconds.observe(time.perf_counter() - built, ('serialize',))
+    plan_cache.put(cache_key, body, context.cache_tags(plan_data), cache_generation)
+    return body
+
+def _plan_profiles(snapshot, profiles):
+    # Plans [(position, context), ...] against one snapshot, filtering once per eligibility key
+    eligible_by_key = {}
+    results = []
+    for position, context in profiles:
+        key = context.eligibility_key()
+        if key not in eligible_by_key:
+            eligible_by_key[key] = find_eligible_rides(context, snapshot)
+        plan = generate_optimal_plan(context, snapshot, eligible_by_key[key])
+        results.append((position, build_plan_data(context, snapshot, plan)))
+    return results
+
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+_batch_snapshot = None  # the snapshot the pool workers were started with; in a worker, the one it plans against
+
+def _init_batch_worker(snapshot):
+    # Pool initializer: each worker receives the catalog snapshot once, when it starts
+    global _batch_snapshot
+    _batch_snapshot = snapshot
+
+def _plan_batch_chunk(profiles):
+    # Runs in a pool worker; only the chunk's profiles cross the process boundary
+    return _plan_profiles(_batch_snapshot, profiles)
+
+def _get_batch_executor(snapshot):
+    # Lazily starts the /api/generate_plans process pool; a newer snapshot replaces it
+    global _batch_executor, _batch_snapshot
+    with _batch_executor_lock:
+        if _batch_executor is None or _batch_snapshot is not snapshot:
+            from concurrent.futures import ProcessPoolExecutor
+            if _batch_executor is not None:
+                _batch_executor.shutdown(wait=False)
+            _batch_executor = ProcessPoolExecutor(max_workers=PLAN_BATCH_PROCESSES, initializer=_init_batch_worker,
+                                                  initargs=(snapshot,))
+            _batch_snapshot = snapshot
+        return _batch_executor
+
 @app.route('/api/generate_plan', methods=['POST'])
 def generate_plan():
     """API endpoint to generate an optimal ride plan based on user preferences."""
     try:
         data = request.get_json()
-        print(f"Received data for generate_plan: {data}")
+        if api_log.isEnabledFor(logging.DEBUG):
+            api_log.debug("Received data for generate_plan: %s", data)
         
-        if not data:
-            return jsonify({'error': 'Invalid JSON data provided'}), 400
-        if 'total_time' not in data or 'user_age' not in data or 'user_weight' not in data: # Removed max_daily_rides
-            return jsonify({'error': 'total_time, user_age, and user_weight are required'}), 400
-        total_time = int(data.get('total_time'))
-        is_vip = bool(data.get('is_vip', False))
-        bad_weather = bool(data.get('bad_weather', False))
-        user_age = int(data.get('user_age'))
-        user_weight = int(data.get('user_weight'))
-        ride_preference = data.get('ride_preference', '') 
-
-        # Validate inputs
-        if total_time < 1:
-            return jsonify({'error': 'Total time must be at least 1 minute'}), 400
-        if user_age < 1 or user_age > 100:
-            return jsonify({'error': 'User age must be between 1 and 100'}), 400
-        if user_weight < 10 or user_weight > 300:
-            return jsonify({'error': 'User weight must be between 10 and 300 kg'}), 400
-
-        # Update park model parameters
-        park_model.total_time = total_time
-        park_model.is_vip = is_vip
-        park_model.bad_weather = bad_weather
-        park_model.user_age = user_age
-        park_model.user_weight = user_weight
-        park_model.ride_preference = ride_preference 
-
-        print(f"Updated ParkModel: total_time={park_model.total_time}, is_vip={park_model.is_vip}, bad_weather={park_model.bad_weather}, user_age={park_model.user_age}, user_weight={park_model.user_weight}, ride_preference={park_model.ride_preference}")
+        # Request-scoped inputs and one catalog snapshot for the whole request
+        context = parse_plan_request(data)
+        cache_generation = plan_cache.generation
+        snapshot = park_model.snapshot
+
+        # Serve repeated parameter combinations straight from the cache (already serialized)
+        cache_key = context.cache_key(snapshot.plan_version)
+        cached_body = plan_cache.get(cache_key)
+        if cached_body is not None:
+            response = app.response_class(cached_body, status=200, mimetype='application/json')
+            response.headers['X-Plan-Cache'] = 'HIT'
+            return response
+
+        if api_log.isEnabledFor(logging.DEBUG):
+            api_log.debug("Planning context", extra={'fields': {
+                'total_time': context.total_time, 'is_vip': context.is_vip, 'bad_weather': context.bad_weather,
+                'user_age': context.user_age, 'user_weight': context.user_weight,
+                'ride_preference': context.ride_preference, 'catalog_version': snapshot.version}})
 
         # Check if there are any rides available
-        if not park_model.rides:
+        if not snapshot.rides:
             return jsonify({'error': 'No rides available. Please add some rides first.'}), 400
 
         # Generate the optimal plan
-        plan = generate_optimal_plan(park_model)
-
-        # Prepare selected rides details for response
-        selected_rides_details = []
-        for ride_index in plan.selected_rides:
-            ride = park_model.rides[ride_index]
-            adjusted_queue_time = ride.queue_time // 2 if park_model.is_vip and ride.vip_access else ride.queue_time
-            selected_rides_details.append({
-                'id': ride.id,
-                'name': ride.name,
-                'thrill': ride.thrill,
-                'duration': ride.duration,
-                'queue_time': ride.queue_time,
-                'vip_queue_time': adjusted_queue_time,
-                'type': ride.type 
-            })
-
-        # Prepare the plan data for JSON response
-        plan_data = {
-            'selected_rides': selected_rides_details,
-            'total_thrill': plan.total_thrill,
-            'remaining_time': plan.remaining_time,
-            # 'remaining_rides': plan.remaining_fatigue,  
-            'total_time_used': total_time,
-            # 'max_daily_rides_used': max_daily_rides,
-            'is_vip_used': is_vip,
-            'bad_weather_used': bad_weather,
-            'user_age_used': user_age,
-            'user_weight_used': user_weight,
-            'ride_preference_used': ride_preference  
-        }
-        return jsonify(plan_data), 200
+        body = render_plan(context, snapshot, cache_key, cache_generation)
+        response = app.response_class(body, status=200, mimetype='application/json')
+        response.headers['X-Plan-Cache'] = 'MISS'
+        return response
+    except PlanRequestError as pe:
+        return jsonify({'error': str(pe)}), 400
     except ValueError as ve:
         return jsonify({'error': f'Invalid input: {str(ve)}'}), 400
     except Exception as e:
-        print(f"Error in generate_plan endpoint: {e}")
+        api_log.exception("Error in generate_plan endpoint: %s", e)
         return jsonify({'error': f"Failed to generate plan: {str(e)}"}), 500
 
+@app.route('/api/generate_plans', methods=['POST'])
+def generate_plans():
+    """Batch variant of /api/generate_plan for kiosks and group bookings.
+    Takes {"profiles": [...]} (or a bare array) of preference objects and plans them all against one
+    catalog snapshot. Profiles with the same eligibility inputs share one filtering pass, and large
+    batches can fan out to a process pool (PLAN_BATCH_PROCESSES). Results come back in request order;
+    each item is {"status": 200, "plan": {...}} or {"status": 400, "error": "..."}."""
+    try:
+        data = request.get_json()
+        profiles = data.get('profiles') if isinstance(data, dict) else data
+        if not isinstance(profiles, list) or not profiles:
+            return jsonify({'error': 'A non-empty "profiles" array is required'}), 400
+        if len(profiles) > PLAN_BATCH_MAX_SIZE:
+            return jsonify({'error': f'At most {PLAN_BATCH_MAX_SIZE} profiles per batch'}), 400
+
+        cache_generation = plan_cache.generation
+        snapshot = park_model.snapshot
+        if not snapshot.rides:
+            return jsonify({'error': 'No rides available. Please add some rides first.'}), 400
+
+        # Validate every profile and answer what we can from the plan cache
+        item_bodies = [None] * len(profiles)
+        to_plan = []
+        for position, profile in enumerate(profiles):
+            try:
+                context = parse_plan_request(profile)
+            except PlanRequestError as pe:
+                item_bodies[position] = app.json.dumps({'status': 400, 'error': str(pe)})
+                continue
+            cached_body = plan_cache.get(context.cache_key(snapshot.plan_version))
+            if cached_body is not None:
+                item_bodies[position] = '{"status": 200, "plan": ' + cached_body + '}'
+            else:
+                to_plan.append((position, context))
+
+        # Keep each eligibility group together so filtering is shared, then plan in-process or fan out
+        to_plan.sort(key=lambda item: item[1].eligibility_key())
+        if PLAN_BATCH_PROCESSES > 0 and len(to_plan) >= PLAN_BATCH_PARALLEL_MIN:
+            chunk_size = -(-len(to_plan) // PLAN_BATCH_PROCESSES)
+            executor = _get_batch_executor(snapshot)
+            futures = [executor.submit(_plan_batch_chunk, to_plan[i:i + chunk_size])
+                       for i in range(0, len(to_plan), chunk_size)]
+            planned = [item for future in futures for item in future.result()]
+        else:
+            planned = _plan_profiles(snapshot, to_plan)
+
+        contexts = dict(to_plan)
+        for position, plan_data in planned:
+            body = app.json.dumps(plan_data)
+            context = contexts[position]
+            plan_cache.put(context.cache_key(snapshot.plan_version), body, context.cache_tags(plan_data), cache_generation)
+            item_bodies[position] = '{"status": 200, "plan": ' + body + '}'
+
+        body = '{"catalog_version": ' + str(snapshot.version) + ', "results": [' + ', '.join(item_bodies) + ']}'
+        return app.response_class(body, status=200, mimetype='application/json')
+    except Exception as e:
+        api_log.exception("Error in generate_plans endpoint: %s", e)
+        return jsonify({'error': f"Failed to generate plans: {str(e)}"}), 500
+
+@app.route('/api/generate_group_plan', methods=['POST'])
+def generate_group_plan():
+    """Plans one itinerary for a whole group.
+    Takes {"members": [{"user_age": ..., "user_weight": ...}, ...], "total_time": ...} plus the usual is_vip,
+    bad_weather, ride_preference and engine ("heap" or "knapsack"). The plan only uses rides every member may
+    take. With "split_time" the last split_time minutes are planned separately for the kids (kids rides) and
+    the adults (every other ride), returned under "split"."""
+    try:
+        data = request.get_json()
+        context, members, split_time = parse_group_plan_request(data)
+        cache_generation = plan_cache.generation
+        snapshot = park_model.snapshot
+
+        cache_key = ('group', context.cache_key(snapshot.plan_version), tuple(members), split_time)
+        cached_body = plan_cache.get(cache_key)
+        if cached_body is not None:
+            response = app.response_class(cached_body, status=200, mimetype='application/json')
+            response.headers['X-Plan-Cache'] = 'HIT'
+            return response
+
+        if not snapshot.rides:
+            return jsonify({'error': 'No rides available. Please add some rides first.'}), 400
+
+        plan_data = plan_group(context, snapshot, members, split_time)
+        body = app.json.dumps(plan_data)
+        plan_cache.put(cache_key, body, group_cache_tags(context, members, plan_data), cache_generation)
+        response = app.response_class(body, status=200, mimetype='application/json')
+        response.headers['X-Plan-Cache'] = 'MISS'
+        return response
+    except PlanRequestError as pe:
+        return jsonify({'error': str(pe)}), 400
+    except Exception as e:
+        api_log.exception("Error in generate_group_plan endpoint: %s", e)
+        return jsonify({'error': f"Failed to generate group plan: {str(e)}"}), 500
+
+@app.before_request
+def _initialize_park_model():
+    # Lazy model initialization: the first request (or initialize_app) connects, migrates and loads
+    park_model.ensure_initialized()
+    park_model.refresh_shared()
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _observe_request(response):
+    # Labelled by route pattern, not raw path, so cardinality stays bounded
+    started = g.get('request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, (route, request.method, str(response.status_code)))
+    return response
+
+@metrics.collector
+def _collect_component_stats():
+    # Cache and pool counters already kept by their owners, exported at scrape time
+    lines = ['# HELP thrill_safari_cache_lookups_total Response cache lookups by result.',
+             '# TYPE thrill_safari_cache_lookups_total counter']
+    for name, cache in (('plan', plan_cache), ('rides', rides_cache), ('token', token_cache),
+                        ('user', park_model.user_cache)):
+        stats = cache.stats()
+        lines.append(f'thrill_safari_cache_lookups_total{{cache="{name}",result="hit"}} {stats["hits"]}')
+        lines.append(f'thrill_safari_cache_lookups_total{{cache="{name}",result="miss"}} {stats["misses"]}')
+    feed = queue_feed.stats()
+    lines += ['# HELP thrill_safari_queue_updates_total Live queue-time updates received, by outcome.',
+              '# TYPE thrill_safari_queue_updates_total counter',
+              f'thrill_safari_queue_updates_total{{result="accepted"}} {feed["received"] - feed["stale"]}',
+              f'thrill_safari_queue_updates_total{{result="stale"}} {feed["stale"]}',
+              '# HELP thrill_safari_queue_updates_pending Live queue-time updates not yet applied or persisted.',
+              '# TYPE thrill_safari_queue_updates_pending gauge',
+              f'thrill_safari_queue_updates_pending{{stage="apply"}} {feed["pending"]}',
+              f'thrill_safari_queue_updates_pending{{stage="persist"}} {feed["unsaved"]}',
+              '# HELP thrill_safari_plan_cache_invalidations_total Cached plans dropped by live queue-time updates.',
+              '# TYPE thrill_safari_plan_cache_invalidations_total counter',
+              f'thrill_safari_plan_cache_invalidations_total {feed["plans_invalidated"]}']
+    lines += ['# HELP thrill_safari_catalog_rides Rides in the current catalog snapshot.',
+              '# TYPE thrill_safari_catalog_rides gauge',
+              f'thrill_safari_catalog_rides {park_model.ride_count}']
+    if park_model.db is not None:
+        pool = park_model.db.stats()
+        lines += ['# HELP thrill_safari_db_slow_queries_total Queries slower than DB_SLOW_QUERY_MS.',
+                  '# TYPE thrill_safari_db_slow_queries_total counter',
+                  f'thrill_safari_db_slow_queries_total {pool["slow_queries"]}',
+                  '# HELP thrill_safari_db_pool_checkout_timeouts_total Pool checkouts that timed out.',
+                  '# TYPE thrill_safari_db_pool_checkout_timeouts_total counter',
+                  f'thrill_safari_db_pool_checkout_timeouts_total {pool["checkout_timeouts"]}']
+    return lines
+
+# Prometheus scrape endpoint
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    return app.response_class(metrics.render(), status=200, mimetype='text/plain; version=0.0.4')
+
 # Health check endpoint to verify the API is running
 @app.route('/api/health', methods=['GET'])
 def health_check():
-    return jsonify({
+    return jsonify(health_report(park_model.db is not None and park_model.db.ping())), 200
+
+def health_report(db_connected):
+    # Component state shared by the Flask and ASGI health endpoints
+    return {
         'status': 'healthy',
         'message': 'Theme Park API is running',
         'rides_count': len(park_model.rides),
-        'db_connected': park_model.db_connection is not None and park_model.db_connection.is_connected()
-    }), 200
+        'db_connected': db_connected,
+        'db_pool': park_model.db.stats() if park_model.db else None,
+        'catalog_version': park_model.catalog_version,
+        'catalog_source': park_model.catalog_source,
+        'shared_catalog': park_model.shared.stats() if park_model.shared else None,
+        'catalog_changes': park_model.change_log_stats(),
+        'startup': park_model.startup_stats,
+        'plan_cache': plan_cache.stats(),
+        'rides_cache': rides_cache.stats(),
+        'queue_feed': queue_feed.stats(),
+        'auth': {'token_cache': token_cache.stats(), 'user_cache': park_model.user_cache.stats(),
+                 'password_verifier': password_verifier.stats()},
+        'log_records_dropped': sum(handler.dropped for handler in log.handlers if isinstance(handler, DroppingQueueHandler))
+    }
 
 # Application startup
 def initialize_app():
-    # Initializing with default data
+    # Initializing with default data; only seeds the in-memory catalog when the database is unreachable
     try:
+        park_model.ensure_initialized()
         park_model.add_default_rides()
-        park_model.add_default_admin_user()
-        print(f"{COLOR_GREEN}Application initialized successfully with {len(park_model.rides)} rides.{COLOR_RESET}")
+        log.info("Application initialized successfully with %d rides.", len(park_model.rides))
     except Exception as e:
-        print(f"{COLOR_RED}Error during application initialization: {e}{COLOR_RESET}")
+        log.exception("Error during application initialization: %s", e)
 
 # Main execution block
 if __name__ == '__main__':
     initialize_app()
     try:
-        print(f"{COLOR_CYAN}Starting Flask server on http://127.0.0.1:5000{COLOR_RESET}")
-        app.run(debug=True, port=5000, host='127.0.0.1')
+        log.info("Starting Flask server on http://127.0.0.1:5000")
+        app.run(debug=True, port=5000, host='127.0.0.1', threaded=True)
     except KeyboardInterrupt:
-        print(f"\n{COLOR_YELLOW}Server shutdown requested by user.{COLOR_RESET}")
+        log.warning("Server shutdown requested by user.")
     except Exception as e:
-        print(f"{COLOR_RED}Error starting server: {e}{COLOR_RESET}")
+        log.error("Error starting server: %s", e)
     finally:
-        if park_model and park_model.db_connection:
+        if park_model and park_model.db:
             park_model.close_db_connection()
\ No newline at end of file
@@ -0,0 +1,38 @@
+# Tests run against the in-memory SQLite stand-in with a throwaway catalog file, never a real database
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault('DB_BACKEND', 'sqlite')
+os.environ.setdefault('SQLITE_PATH', ':memory:')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ.setdefault('CATALOG_SNAPSHOT_PATH', os.path.join(tempfile.mkdtemp(prefix='thrill_safari_tests_'), 'catalog.bin'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def park(tmp_path, monkeypatch):
+    # A ParkModel on its own SQLite file, with no catalog file and no background change poller
+    import change_log
+    import db
+    import tapp
+    monkeypatch.setattr(db, 'SQLITE_PATH', str(tmp_path / 'park.db'))
+    monkeypatch.setattr(tapp, 'CATALOG_SNAPSHOT_PATH', '')
+    monkeypatch.setattr(change_log, 'CATALOG_CHANGE_POLL_INTERVAL', 0)
+    model = tapp.ParkModel()
+    model.ensure_initialized()
+    yield model
+    model.close_db_connection()
+
+
+@pytest.fixture
+def client(park, monkeypatch):
+    # A Flask test client serving `park`, and the headers of a signed-in admin
+    import tapp
+    monkeypatch.setattr(tapp, 'park_model', park)
+    client = tapp.app.test_client()
+    token = client.post('/api/login', json={'staff_id': 'admin', 'password': 'password123'}).get_json()['token']
+    return client, {'Authorization': f'Bearer {token}'}
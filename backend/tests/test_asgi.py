@@ -0,0 +1,79 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import tapp
+
+asgi = pytest.importorskip('asgi')
+
+
+async def call(app, method, path, body=None, headers=(), query=b''):
+    # One request through the ASGI callable; returns (status, headers, body)
+    raw = json.dumps(body).encode() if body is not None else b''
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'scheme': 'http',
+             'server': ('testserver', 80),
+             'headers': [(b'host', b'testserver')] + [(name.encode(), value.encode()) for name, value in headers]}
+
+    async def receive():
+        return {'type': 'http.request', 'body': raw, 'more_body': False}
+
+    response = {}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {name.decode(): value.decode() for name, value in message['headers']}
+        else:
+            response['body'] = message['body']
+
+    await app(scope, receive, send)
+    return response['status'], response['headers'], response['body']
+
+
+@pytest.fixture
+def app(park, monkeypatch):
+    monkeypatch.setattr(tapp, 'park_model', park)
+    app = asgi.ThrillSafariASGI()
+    yield app
+    for executor in (app.plan_executor, app.blocking_executor):
+        if executor is not None:
+            executor.shutdown()
+
+
+def test_rides_page_misses_render_off_the_loop(app, monkeypatch):
+    rendered_on = []
+    render = tapp.render_rides_page
+
+    def recording_render(*args):
+        rendered_on.append(threading.current_thread().name)
+        return render(*args)
+
+    monkeypatch.setattr(tapp, 'render_rides_page', recording_render)
+
+    async def scenario():
+        first = await call(app, 'GET', '/api/rides', query=b'limit=3')
+        second = await call(app, 'GET', '/api/rides', query=b'limit=3')
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first[0] == second[0] == 200 and first[2] == second[2]
+    assert len(rendered_on) == 1 and rendered_on[0].startswith('asgi-blocking')
+
+
+def test_adding_a_ride_stored_by_another_process_is_rejected(app, park):
+    ride = {'id': 'X1', 'name': 'Elsewhere', 'thrill': 5, 'duration': 4, 'queue_time': 10, 'fatigue': 3, 'type': 'land'}
+    park.db.execute(tapp.ride_insert_query('land_rides'), ('X1', 'Elsewhere', 5, 4, 10, 3, False, False, False, False,
+                                                            0, 200, 0, 100))
+
+    async def scenario():
+        _, _, body = await call(app, 'POST', '/api/login', {'staff_id': 'admin', 'password': 'password123'})
+        headers = [('authorization', f"Bearer {json.loads(body)['token']}")]
+        return await call(app, 'POST', '/api/add_ride', ride, headers)
+
+    status, _, body = asyncio.run(scenario())
+
+    assert status == 400 and 'already exists' in json.loads(body)['error']
+    assert not park.snapshot.has_ride('X1')
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+import tapp
+
+
+def test_timed_out_checks_keep_their_permit_until_they_finish(monkeypatch):
+    release = threading.Event()
+    finished = threading.Event()
+
+    def slow_check(password_hash, password):
+        release.wait(10)
+        finished.set()
+        return password == 'right'
+
+    monkeypatch.setattr(tapp.bcrypt, 'check_password_hash', slow_check)
+    verifier = tapp.PasswordVerifier(workers=1, max_pending=1, timeout=0.05)
+
+    with pytest.raises(TimeoutError):
+        verifier.verify('hash', 'right')
+    assert verifier.verify('hash', 'right') is None
+
+    release.set()
+    finished.wait(10)
+    for _ in range(100):
+        result = verifier.verify('hash', 'right')
+        if result is not None:
+            break
+        time.sleep(0.01)
+    assert result is True and verifier.rejected >= 1
+
+
+def test_verified_tokens_are_cached_until_they_expire(monkeypatch):
+    monkeypatch.setattr(tapp, 'token_cache', tapp.ResponseCache(16, 3600))
+    decode_calls = []
+    decode = tapp.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        decode_calls.append(args[0])
+        return decode(*args, **kwargs)
+    monkeypatch.setattr(tapp.jwt, 'decode', counting_decode)
+    token = tapp.jwt.encode({'staff_id': 'ops', 'role': 'admin', 'exp': int(time.time()) + 2},
+                            tapp.app.config['SECRET_KEY'], algorithm='HS256')
+
+    assert tapp.verify_token(token) == ('ops', 'admin')
+    assert tapp.verify_token(token) == ('ops', 'admin')
+    assert len(decode_calls) == 1
+    # The cache never outlives the token: its entry expires with the token, not after the cache TTL
+    (expires_at, _, _), = tapp.token_cache._entries.values()
+    assert expires_at <= time.monotonic() + 2
+
+
+def test_forged_and_expired_tokens_are_still_refused(client, park):
+    client, headers = client
+    ride_id = park.snapshot.catalog.ids[0]
+    assert client.patch(f'/api/rides/{ride_id}', json={'thrill': 3}, headers=headers).status_code == 200
+
+    forged = tapp.jwt.encode({'staff_id': 'admin', 'role': 'admin', 'exp': int(time.time()) + 60},
+                             'not-the-secret-key-of-this-server-at-all', algorithm='HS256')
+    expired = tapp.jwt.encode({'staff_id': 'admin', 'role': 'admin', 'exp': int(time.time()) - 5},
+                              tapp.app.config['SECRET_KEY'], algorithm='HS256')
+    for token, message in ((forged, 'Token is invalid!'), (expired, 'Token has expired!')):
+        response = client.patch(f'/api/rides/{ride_id}', json={'thrill': 4},
+                                headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 401 and response.get_json()['message'] == message
+
+
+def test_user_records_are_cached_until_invalidated(client, park, monkeypatch):
+    client, _ = client
+    lookups = []
+    fetchone = park.db.fetchone
+
+    def counting_fetchone(query, params=()):
+        if 'FROM users' in query:
+            lookups.append(params)
+        return fetchone(query, params)
+    monkeypatch.setattr(park.db, 'fetchone', counting_fetchone)
+    park.invalidate_user('admin')
+
+    def login(staff_id):
+        return client.post('/api/login', json={'staff_id': staff_id, 'password': 'password123'}).status_code
+
+    assert login('admin') == 200 and login('admin') == 200
+    assert len(lookups) == 1
+    park.invalidate_user('admin')
+    assert login('admin') == 200 and len(lookups) == 2
+
+    # Unknown staff IDs are looked up every time, so a user added later can log in at once
+    assert login('nobody') == 401 and login('nobody') == 401
+    assert len(lookups) == 4
@@ -0,0 +1,31 @@
+import json
+
+import tapp
+
+
+def test_process_pool_plans_match_in_process_plans(client, park, monkeypatch):
+    client, headers = client
+    profiles = [{'total_time': 120 + 30 * (n % 4), 'user_age': 10 + 5 * n, 'user_weight': 40 + n} for n in range(8)]
+
+    in_process = client.post('/api/generate_plans', json={'profiles': profiles}).get_json()
+    tapp.plan_cache.clear()
+    monkeypatch.setattr(tapp, 'PLAN_BATCH_PROCESSES', 2)
+    monkeypatch.setattr(tapp, 'PLAN_BATCH_PARALLEL_MIN', 2)
+    try:
+        pooled = client.post('/api/generate_plans', json={'profiles': profiles}).get_json()
+        executor = tapp._batch_executor
+        tapp.plan_cache.clear()
+        client.post('/api/generate_plans', json={'profiles': profiles})
+        assert tapp._batch_executor is executor and tapp._batch_snapshot is park.snapshot
+
+        park.add_ride('P1', 'Pooled', 5, 4, 10, 3, False, False, False, False, 'land')
+        tapp.plan_cache.clear()
+        client.post('/api/generate_plans', json={'profiles': profiles})
+        assert tapp._batch_executor is not executor and tapp._batch_snapshot is park.snapshot
+    finally:
+        if tapp._batch_executor is not None:
+            tapp._batch_executor.shutdown()
+        monkeypatch.setattr(tapp, '_batch_executor', None)
+        monkeypatch.setattr(tapp, '_batch_snapshot', None)
+
+    assert json.dumps(pooled['results'], sort_keys=True) == json.dumps(in_process['results'], sort_keys=True)
@@ -0,0 +1,28 @@
+import json
+
+import bench
+import planner
+import tapp
+
+
+def test_small_run_records_and_compares_a_baseline(park, monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(tapp, 'park_model', park)
+    baseline = str(tmp_path / 'baseline.json')
+    args = ['--sizes', '40', '--repeat', '1', '--baseline', baseline]
+
+    assert bench.main(args + ['--save-baseline']) == 0
+    with open(baseline) as baseline_file:
+        results = json.load(baseline_file)['results']
+    for engine in planner.PLANNING_ENGINES:
+        assert f'plan/size=40/engine={engine}/pref=dry_first/time=240/vip=1/weather=0' in results
+    assert {'mutate/size=40/update', 'route/size=40/rides/not_modified',
+            'route/size=40/generate_plan/engine=knapsack/pref=mixed/hit'} <= set(results)
+    assert all(result['p95_ms'] >= result['median_ms'] >= 0 for result in results.values())
+    assert park.ride_count == 40
+
+    # Against a near-zero baseline every case is a regression
+    capsys.readouterr()
+    with open(baseline, 'w') as baseline_file:
+        json.dump({'results': {name: {'median_ms': 1e-9, 'p95_ms': 1e-9} for name in results}}, baseline_file)
+    assert bench.main(args + ['--skip-routes', '--engines', 'heap', '--fail-on-regression']) == 1
+    assert 'REGRESSION' in capsys.readouterr().out
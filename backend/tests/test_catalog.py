@@ -0,0 +1,146 @@
+import json
+import random
+
+import pytest
+
+import bench
+import tapp
+from catalog import RideCatalog
+
+
+def catalog(size=500, seed=0):
+    return tapp.CatalogSnapshot.from_rows(1, bench.generate_catalog(size, seed))
+
+
+def test_ride_changes_leave_published_snapshot_untouched():
+    old = catalog()
+    deleted, updated = old.catalog.ids[5], old.catalog.ids[6]
+    before = old.ride_record(updated)
+    row = [before[field] for field in tapp.RIDE_FIELDS]
+    row[tapp.RIDE_FIELDS.index('thrill')] = 1
+
+    new = old.with_ride_changes([row], [deleted])
+
+    assert old.has_ride(deleted) and old.ride_record(updated) == before
+    assert old.ride_count == 500
+    assert not new.has_ride(deleted) and new.ride_record(updated)['thrill'] == 1
+    assert new.ride_count == 499
+
+
+def test_every_snapshot_keeps_its_own_view():
+    # Random upserts, deletes and re-adds; each snapshot must match the rides it was published with,
+    # including after the recent id mappings have been merged
+    rng = random.Random(3)
+    snapshot = catalog(200)
+    history = [(snapshot, {ride['id']: ride for ride in snapshot.listing()})]
+    removed = []
+    for _ in range(400):
+        live = list(history[-1][1])
+        action = rng.random()
+        if action < 0.2 and removed:
+            snapshot = snapshot.with_ride(tapp.Ride(*removed.pop()))
+        elif action < 0.4:
+            ride = history[-1][1][rng.choice(live)]
+            removed.append([ride[field] for field in tapp.RIDE_FIELDS])
+            snapshot = snapshot.with_ride_changes([], [ride['id']])
+        else:
+            row = [history[-1][1][rng.choice(live)][field] for field in tapp.RIDE_FIELDS]
+            row[tapp.RIDE_FIELDS.index('queue_time')] = rng.randint(0, 90)
+            snapshot = snapshot.with_ride_changes([row], [])
+        history.append((snapshot, {ride['id']: ride for ride in snapshot.listing()}))
+
+    every_id = set(history[0][1])
+    for published, rides in history:
+        assert published.ride_count == len(rides)
+        for ride_id in every_id:
+            assert published.ride_record(ride_id) == rides.get(ride_id)
+
+
+def test_cursor_pages_cover_the_listing_once():
+    snapshot = catalog(300, seed=4)
+    removed = [snapshot.catalog.ids[row] for row in (0, 7, 8, 150)]
+    updated = snapshot.ride_record(snapshot.catalog.ids[20])
+    updated['thrill'] = 2
+    snapshot = snapshot.with_ride_changes([[updated[field] for field in tapp.RIDE_FIELDS]], removed)
+    for ride_type in (None, 'water'):
+        seen, cursor = [], None
+        while True:
+            body, _, cursor = tapp.render_rides_page(snapshot, tapp.RIDE_FIELDS, ride_type, cursor, 17)
+            seen.extend(json.loads(body))
+            if cursor is None:
+                break
+        assert seen == snapshot.listing(ride_type)
+    stale = tapp._encode_cursor(removed[0])
+    with pytest.raises(ValueError):
+        tapp.render_rides_page(snapshot, tapp.RIDE_FIELDS, None, stale, 17)
+
+
+def test_catalog_file_round_trips_the_live_rides(tmp_path):
+    snapshot = catalog()
+    snapshot = snapshot.with_ride_changes(deletes=[snapshot.catalog.ids[3], snapshot.catalog.ids[40]])
+    path = str(tmp_path / 'catalog.bin')
+
+    tapp.write_catalog_file(path, snapshot, 7)
+    generation, _, loaded = tapp.read_catalog_file(path)
+
+    assert generation == 7 and loaded.size == snapshot.ride_count
+    assert tapp.CatalogSnapshot(2, loaded).live_rows() == snapshot.live_rows()
+    with open(path, 'r+b') as f:
+        f.seek(-1, 2)
+        last = f.read(1)
+        f.seek(-1, 2)
+        f.write(bytes([last[0] ^ 1]))
+    with pytest.raises(ValueError):
+        tapp.read_catalog_file(path)
+
+
+def test_columns_hold_the_rows_across_growth():
+    rows = bench.generate_catalog(RideCatalog.MIN_CAPACITY * 3 + 5, seed=2)
+    catalog = RideCatalog()
+    for start in range(0, len(rows), 50):
+        catalog.append(rows[start:start + 50])
+
+    assert catalog.size == len(rows) and catalog.capacity >= len(rows)
+    assert catalog.rows(catalog.size) == [list(row) for row in rows]
+    ride = catalog.ride(100)
+    assert [getattr(ride, field) for field in tapp.RIDE_FIELDS] == list(rows[100])
+    assert all(catalog.rows_by_id.get(row[0]) == position for position, row in enumerate(rows))
+
+    bad = list(rows[0])
+    bad[0], bad[tapp.RIDE_FIELDS.index('type')] = 'NEW1', 'space'
+    with pytest.raises(ValueError):
+        catalog.append([bad])
+    assert catalog.size == len(rows) and 'NEW1' not in catalog.rows_by_id
+
+
+def test_appends_share_the_tip_and_fork_behind_it():
+    base = catalog(100)
+    rows = bench.generate_catalog(102, seed=9)[100:]
+    first = base.with_rides([rows[0]])
+    assert first.catalog is base.catalog and base.size == 100 and not base.has_ride(rows[0][0])
+
+    # `base` is no longer the tip, so a second append from it must not disturb `first`
+    second = base.with_ride(tapp.Ride(*rows[1]))
+    assert second.catalog is not first.catalog
+    assert first.has_ride(rows[0][0]) and not first.has_ride(rows[1][0])
+    assert second.has_ride(rows[1][0]) and not second.has_ride(rows[0][0])
+    assert second.live_rows() == base.live_rows() + [list(rows[1])]
+
+
+def test_ride_costs_and_views_match_the_ride_objects():
+    snapshot = catalog(300, seed=5)
+    snapshot = snapshot.with_ride_changes(deletes=[snapshot.catalog.ids[1]])
+    rides = list(snapshot.rides)
+
+    assert len(rides) == len(snapshot.rides) == snapshot.ride_count == 299
+    live = [row for row in range(snapshot.size) if row not in snapshot.dead]
+    for is_vip in (False, True):
+        costs = snapshot.ride_costs(is_vip)
+        for row, ride in zip(live, rides):
+            queue_time = ride.queue_time // 2 if is_vip and ride.vip_access else ride.queue_time
+            assert costs[row] == ride.duration + queue_time
+    for ride_type in (None, 'kids'):
+        listing = snapshot.listing(ride_type)
+        for position, ride in enumerate(listing):
+            assert snapshot.listing_position(ride['id'], ride_type) == position
+    assert snapshot.listing_position(snapshot.catalog.ids[1]) is None
@@ -0,0 +1,83 @@
+import random
+
+import planner
+import tapp
+from catalog import CATALOG_INCREMENTAL_INDEX_MAX, EligibilityIndex
+
+BOUNDARY_AGES = [0, 1, 40, 41, 99, 100]
+BOUNDARY_WEIGHTS = [0, 1, 150, 299, 300]
+
+
+def ride_row(rng, ride_id):
+    min_age = rng.choice([0, 40, 41, rng.randint(0, 100)])
+    max_age = max(min_age, rng.choice([40, 41, 100, rng.randint(0, 100)]))
+    min_weight = rng.choice([0, 300, rng.randint(0, 300)])
+    max_weight = max(min_weight, rng.choice([0, 300, rng.randint(0, 300)]))
+    return [ride_id, f'Ride {ride_id}', rng.randint(1, 10), rng.randint(2, 8), rng.randint(0, 30), rng.randint(1, 5),
+            False, rng.random() < 0.1, rng.random() < 0.4, rng.random() < 0.3, rng.choice(tapp.RIDE_TYPES),
+            min_weight, max_weight, min_age, max_age]
+
+
+def reference(snapshot, user_age, user_weight, bad_weather, ride_preference):
+    # The per-ride filter over the snapshot's live rows, in dry_first order when asked for
+    column = snapshot.column
+    wet = column('type') == tapp.RIDE_TYPE_CODES['water']
+    rows = [row for row in range(snapshot.size) if row not in snapshot.dead
+            and not column('restricted')[row] and not (bad_weather and column('affected_by_weather')[row])
+            and column('min_age')[row] <= user_age <= column('max_age')[row]
+            and column('min_weight')[row] <= user_weight <= column('max_weight')[row]
+            and not (user_age > 40 and column('thrill')[row] > 6)
+            and not (ride_preference == 'dry_only' and wet[row]) and not (ride_preference == 'wet_only' and not wet[row])]
+    if ride_preference == 'dry_first':
+        rows.sort(key=lambda row: (wet[row], -column('thrill')[row]))
+    return rows
+
+
+def check(rng, snapshot):
+    for _ in range(25):
+        age = rng.choice(BOUNDARY_AGES + [rng.randint(0, 100)])
+        weight = rng.choice(BOUNDARY_WEIGHTS + [rng.randint(0, 300)])
+        bad_weather = rng.random() < 0.5
+        preference = rng.choice(['', 'dry_only', 'wet_only', 'dry_first'])
+        context = planner.PlanningContext(60, False, bad_weather, age, weight, preference)
+
+        eligible = planner.find_eligible_rides(context, snapshot)
+
+        assert eligible.tolist() == reference(snapshot, age, weight, bad_weather, preference)
+
+
+def test_index_matches_per_ride_filter():
+    rng = random.Random(2)
+    next_id = 0
+    for _ in range(5):
+        rows = []
+        for _ in range(rng.randint(1, 150)):
+            rows.append(ride_row(rng, f'R{next_id}'))
+            next_id += 1
+        snapshot = tapp.CatalogSnapshot.from_rows(1, rows)
+        check(rng, snapshot)
+        # Single appends wait in the index tail until TAIL_MAX of them are folded into the masks
+        for _ in range(EligibilityIndex.TAIL_MAX + 5):
+            snapshot = snapshot.with_ride(tapp.Ride(*ride_row(rng, f'R{next_id}')))
+            next_id += 1
+            if rng.random() < 0.2:
+                check(rng, snapshot)
+        check(rng, snapshot)
+        # Updates and deletes tombstone rows; a large batch is indexed in one extend
+        for batch in [3, CATALOG_INCREMENTAL_INDEX_MAX + 1]:
+            ids = [snapshot.catalog.ids[row] for row in range(snapshot.size) if row not in snapshot.dead]
+            upserts = [ride_row(rng, ride_id) for ride_id in rng.sample(ids, min(batch, len(ids)))]
+            deletes = rng.sample(ids, min(5, len(ids)))
+            snapshot = snapshot.with_ride_changes(upserts, deletes)
+            check(rng, snapshot)
+        snapshot = snapshot.with_rides([ride_row(rng, f'R{next_id + k}') for k in range(20)])
+        next_id += 20
+        check(rng, snapshot)
+
+
+def test_out_of_range_guest_matches_nothing():
+    snapshot = tapp.CatalogSnapshot.from_rows(1, [['A', 'A', 3, 3, 0, 1, False, False, False, False, 'land', 0, 300, 0, 100]])
+
+    assert snapshot.eligibility_index.eligible(101, 70, False) == 0
+    assert snapshot.eligibility_index.eligible(30, 301, False) == 0
+    assert snapshot.eligibility_index.eligible(100, 300, False) == 1
@@ -0,0 +1,35 @@
+import pytest
+
+import bench
+import planner
+import tapp
+
+
+def test_group_eligibility_is_the_members_intersection():
+    snapshot = tapp.CatalogSnapshot.from_rows(1, bench.generate_catalog(3000, 4))
+    members = [(8, 30), (35, 80), (45, 95), (35, 80), (70, 60)]
+    for bad_weather in (False, True):
+        for ride_preference in planner.RIDE_PREFERENCES:
+            context = planner.PlanningContext(120, False, bad_weather, None, None, ride_preference)
+            expected = None
+            for user_age, user_weight in members:
+                member = planner.PlanningContext(120, False, bad_weather, user_age, user_weight, ride_preference)
+                rows = set(planner.find_eligible_rides(member, snapshot).tolist())
+                expected = rows if expected is None else expected & rows
+
+            group = planner.find_group_eligible_rides(context, snapshot, members).tolist()
+
+            assert sorted(group) == sorted(expected)
+            if ride_preference == 'dry_first':
+                assert group == [row for row in planner.find_eligible_rides(
+                    planner.PlanningContext(120, False, bad_weather, 35, 80, ride_preference), snapshot).tolist()
+                    if row in expected]
+
+
+@pytest.mark.parametrize('ride_preference', ['mixed', 'DRY_ONLY', ['dry_only'], 3])
+def test_group_plans_reject_unknown_ride_preferences(client, ride_preference):
+    client, _ = client
+    response = client.post('/api/generate_group_plan', json={
+        'total_time': 120, 'members': [{'user_age': 30, 'user_weight': 70}], 'ride_preference': ride_preference})
+
+    assert response.status_code == 400 and 'ride_preference' in response.get_json()['error']
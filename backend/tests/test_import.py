@@ -0,0 +1,41 @@
+import sqlite3
+
+import db
+import tapp
+
+
+def ride(ride_id, **fields):
+    return {'id': ride_id, 'name': f'Ride {ride_id}', 'thrill': 5, 'duration': 4, 'queue_time': 10, 'fatigue': 3,
+            'type': 'land', **fields}
+
+
+def test_import_reports_bad_rows_and_indexes_the_rest(park):
+    before = park.snapshot.eligibility_index
+    records = enumerate([ride('I1'), ride('I2', thrill={'x': 1}), ride('I3', min_age=[4]), ride('I1'),
+                         'unreadable row', ride('I4', type='water')], start=1)
+
+    report = park.import_rides(records, chunk_size=2)
+
+    assert report['imported'] == 2 and report['failed'] == 4
+    assert [error['row'] for error in report['errors']] == [2, 3, 4, 5]
+    snapshot = park.snapshot
+    assert snapshot.has_ride('I1') and snapshot.has_ride('I4') and not snapshot.has_ride('I2')
+    index = snapshot.eligibility_index
+    assert index is not before
+    fresh = tapp.CatalogSnapshot.from_rows(1, snapshot.live_rows())
+    for profile in [(30, 70, False, ''), (8, 30, False, 'wet_only'), (50, 90, True, 'dry_only')]:
+        assert sorted(snapshot.catalog.ids[row] for row in index.indices(index.eligible(*profile)).tolist()) == \
+            sorted(fresh.catalog.ids[row] for row in fresh.eligibility_index.indices(fresh.eligibility_index.eligible(*profile)).tolist())
+
+
+def test_default_rides_skip_the_ones_already_stored(park):
+    connection = sqlite3.connect(db.SQLITE_PATH)
+    connection.execute("DELETE FROM kids_rides")
+    connection.commit()
+    park.snapshot = tapp.CatalogSnapshot.from_rows(park.snapshot.version + 1, [])
+
+    park.add_default_rides()
+
+    kids = [ride_data[0] for ride_data in tapp.DEFAULT_RIDES if ride_data[10] == 'kids']
+    assert park.ride_count == len(kids) and all(park.snapshot.has_ride(ride_id) for ride_id in kids)
+    assert connection.execute("SELECT COUNT(*) FROM kids_rides").fetchone()[0] == len(kids)
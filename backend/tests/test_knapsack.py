@@ -0,0 +1,90 @@
+import heapq
+import itertools
+import random
+
+import pytest
+
+import bench
+import planner
+import tapp
+
+PREFERENCES = ['', 'dry_only', 'wet_only', 'dry_first']
+
+
+def profile(rng, engine):
+    return planner.PlanningContext(rng.choice([15, 25, 40, 75, 120, 240]), rng.random() < 0.5, rng.random() < 0.3,
+                                rng.choice([8, 25, 45, 70]), rng.choice([30, 70, 120]), rng.choice(PREFERENCES), engine)
+
+
+def baseline_plan(context, rows):
+    # The original heap planner, over plain RIDE_FIELDS rows
+    rides = [dict(zip(tapp.RIDE_FIELDS, row)) for row in rows]
+    gap = 5 if context.total_time < 30 else 10
+    eligible = [(i, ride) for i, ride in enumerate(rides)
+                if not ride['restricted'] and not (context.bad_weather and ride['affected_by_weather'])
+                and ride['min_age'] <= context.user_age <= ride['max_age']
+                and ride['min_weight'] <= context.user_weight <= ride['max_weight']
+                and not (context.user_age > 40 and ride['thrill'] > 6)]
+    dry = [(i, ride) for i, ride in eligible if ride['type'] in ['land', 'kids']]
+    wet = [(i, ride) for i, ride in eligible if ride['type'] == 'water']
+    if context.ride_preference == 'dry_only':
+        order = dry
+    elif context.ride_preference == 'wet_only':
+        order = wet
+    elif context.ride_preference == 'dry_first':
+        order = sorted(dry, key=lambda x: x[1]['thrill'], reverse=True) + sorted(wet, key=lambda x: x[1]['thrill'], reverse=True)
+    else:
+        heap = [(-ride['thrill'], i) for i, ride in eligible]
+        heapq.heapify(heap)
+        order = [(i, rides[i]) for _, i in (heapq.heappop(heap) for _ in range(len(heap)))]
+    selected, thrill, remaining = [], 0, context.total_time
+    for i, ride in order:
+        if remaining <= 0:
+            break
+        queue = ride['queue_time'] // 2 if context.is_vip and ride['vip_access'] else ride['queue_time']
+        cost = ride['duration'] + queue + (gap if selected else 0)
+        if cost <= remaining:
+            selected.append(i)
+            thrill += ride['thrill']
+            remaining -= cost
+    return selected, thrill, remaining
+
+
+@pytest.mark.parametrize('size', [40, 6000])
+def test_heap_matches_baseline(size):
+    # 6000 rides take the chunked walk in _greedy_select
+    rng = random.Random(size)
+    rows = bench.generate_catalog(size, seed=1)
+    snapshot = tapp.CatalogSnapshot.from_rows(1, rows)
+    for _ in range(40):
+        context = profile(rng, 'heap')
+
+        plan = planner.generate_optimal_plan(context, snapshot)
+
+        assert plan.engine == 'heap'
+        assert (plan.selected_rides, plan.total_thrill, plan.remaining_time) == baseline_plan(context, rows)
+
+
+def test_knapsack_matches_brute_force():
+    rng = random.Random(1)
+    for seed in range(60):
+        snapshot = tapp.CatalogSnapshot.from_rows(1, bench.generate_catalog(rng.randint(1, 12), seed=seed))
+        context = profile(rng, 'knapsack')
+        gap = 5 if context.total_time < 30 else 10
+        costs, thrills = snapshot.ride_costs(context.is_vip), snapshot.column('thrill')
+        eligible = planner.find_eligible_rides(context, snapshot).tolist()
+        # (thrill, -minutes) of every subset that fits, the first ride without a gap
+        best = (0, 0)
+        for size in range(1, len(eligible) + 1):
+            for subset in itertools.combinations(eligible, size):
+                minutes = sum(int(costs[row]) for row in subset) + gap * (size - 1)
+                if minutes <= context.total_time:
+                    best = max(best, (sum(int(thrills[row]) for row in subset), -minutes))
+
+        plan = planner.generate_optimal_plan(context, snapshot)
+
+        rides = plan.selected_rides
+        minutes = sum(int(costs[row]) for row in rides) + gap * max(len(rides) - 1, 0)
+        assert plan.engine == 'knapsack' and set(rides) <= set(eligible) and len(set(rides)) == len(rides)
+        assert plan.total_thrill == sum(int(thrills[row]) for row in rides) == best[0]
+        assert plan.remaining_time == context.total_time - minutes == context.total_time + best[1]
@@ -0,0 +1,75 @@
+import argparse
+import itertools
+import json
+import time
+
+import pytest
+
+import loadtest
+import tapp
+
+
+def settings(**overrides):
+    values = {'rate': 0, 'duration': 30, 'requests': 0, 'concurrency': 1}
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def test_latency_counts_from_the_scheduled_send_time():
+    # One client, a 20 ms server and a request due every 5 ms: the queue behind the server shows up as latency
+    def sender_factory():
+        def send(method, path, body):
+            time.sleep(0.02)
+            return 200
+        return send
+    args = settings(rate=200, requests=8)
+    requests = itertools.repeat(('GET', '/api/rides?limit=5', None))
+
+    samples, elapsed = loadtest.run(args, requests, sender_factory)
+
+    assert len(samples) == 8 and {sample[0] for sample in samples} == {'/api/rides'}
+    last = samples[-1]
+    assert last[4] >= 7 * 12 and last[2] >= last[3] + last[4] - 1
+    assert loadtest.schedule_summary(args, samples, elapsed)['missed'] == 0
+
+
+def test_summary_counts_errors_and_transport_failures():
+    samples = [('/api/login', 200, 1.0, 1.0, 0.0), ('/api/login', 401, 2.0, 2.0, 0.0),
+               ('/api/rides', 0, 9.0, 9.0, 0.0), ('/api/rides', 200, 3.0, 3.0, 0.0)]
+
+    summary = loadtest.summarize(samples, 2.0)
+
+    assert summary['all']['requests'] == 4 and summary['all']['errors'] == 2 and summary['all']['max_ms'] == 9.0
+    assert summary['/api/login']['statuses'] == {'200': 1, '401': 1}
+    assert summary['/api/rides']['error_rate'] == 0.5 and summary['/api/rides']['throughput_rps'] == 1.0
+    assert loadtest.percentile([1, 2, 3, 4], 50) == 2 and loadtest.percentile([1, 2, 3, 4], 99) == 4
+
+
+def test_mix_file_replaces_tables_and_rejects_unknown_keys(tmp_path):
+    mix_path = tmp_path / 'mix.json'
+    mix_path.write_text(json.dumps({'endpoints': {'rides': 1}, 'rides_paths': ['/api/rides?type=kids']}))
+    requests = loadtest.synthetic_requests(loadtest.load_mix(str(mix_path)), 0, 'admin', 'password123')
+    assert {next(requests) for _ in range(20)} == {('GET', '/api/rides?type=kids', None)}
+
+    mix_path.write_text(json.dumps({'endpoint': {'rides': 1}}))
+    with pytest.raises(ValueError):
+        loadtest.load_mix(str(mix_path))
+
+
+def test_in_process_run_records_a_log_that_replays(park, monkeypatch, tmp_path, capsys):
+    monkeypatch.setattr(tapp, 'park_model', park)
+    record, output = str(tmp_path / 'day.ndjson'), str(tmp_path / 'run.json')
+
+    assert loadtest.main(['--in-process', '--rate', '0', '--requests', '40', '--concurrency', '2',
+                          '--record', record, '--output', output]) == 0
+    with open(output) as results_file:
+        results = json.load(results_file)
+    assert results['endpoints']['all']['requests'] == 40 and results['endpoints']['all']['errors'] == 0
+    assert '/api/generate_plan' in results['endpoints']
+    with open(record) as record_file:
+        assert len(record_file.readlines()) == 40
+
+    capsys.readouterr()
+    assert loadtest.main(['--in-process', '--rate', '0', '--requests', '10', '--replay', record,
+                          '--compare', output]) == 0
+    assert 'vs previous' in capsys.readouterr().out
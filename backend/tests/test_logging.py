@@ -0,0 +1,56 @@
+import json
+import logging
+import queue
+import sys
+
+import tapp
+
+
+def record(level=logging.INFO, message='Loaded %d rides', args=(3,), fields=None, exc_info=None):
+    entry = logging.LogRecord('thrill_safari.catalog', level, __file__, 1, message, args, exc_info)
+    if fields is not None:
+        entry.fields = fields
+    return entry
+
+
+def test_full_queue_drops_records_instead_of_blocking():
+    handler = tapp.DroppingQueueHandler(queue.Queue(2))
+    for _ in range(5):
+        handler.handle(record())
+
+    assert handler.queue.qsize() == 2 and handler.dropped == 3
+
+
+def test_json_lines_carry_fields_and_exceptions():
+    try:
+        raise ValueError('bad row')
+    except ValueError:
+        exc_info = sys.exc_info()
+    line = tapp.JsonLogFormatter().format(record(logging.ERROR, fields={'rides': 3, 'ms': 1.5}, exc_info=exc_info))
+
+    entry = json.loads(line)
+    assert entry['level'] == 'ERROR' and entry['logger'] == 'thrill_safari.catalog'
+    assert entry['message'] == 'Loaded 3 rides' and entry['rides'] == 3 and entry['ms'] == 1.5
+    assert 'ValueError: bad row' in entry['exception'] and entry['ts'].endswith('Z')
+
+
+def test_text_lines_append_fields_and_color_only_on_a_terminal():
+    plain = tapp.TextLogFormatter(color=False).format(record(fields={'rides': 3}))
+    colored = tapp.TextLogFormatter(color=True).format(record(logging.WARNING))
+
+    assert plain.endswith('INFO thrill_safari.catalog: Loaded 3 rides rides=3') and '\x1b' not in plain
+    assert colored.startswith(tapp.COLOR_YELLOW) and colored.endswith(tapp.COLOR_RESET)
+
+
+def test_sampler_thins_only_debug_records():
+    never, always = tapp.DebugSampler(0), tapp.DebugSampler(1)
+
+    assert not never.filter(record(logging.DEBUG)) and always.filter(record(logging.DEBUG))
+    assert never.filter(record(logging.INFO)) and never.filter(record(logging.ERROR))
+
+
+def test_setup_logging_installs_one_queue_handler():
+    root = tapp.setup_logging()
+
+    assert root is tapp.log and not root.propagate
+    assert sum(isinstance(handler, tapp.DroppingQueueHandler) for handler in root.handlers) == 1
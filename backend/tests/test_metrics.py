@@ -0,0 +1,74 @@
+import re
+
+import tapp
+from metrics import MetricsRegistry
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (\S+)$')
+
+
+def scrape(client):
+    # {(name, labels): value}, checking every sample follows the HELP and TYPE lines of its metric
+    response = client.get('/api/metrics')
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    samples, typed = {}, {}
+    for line in response.get_data(as_text=True).splitlines():
+        if line.startswith('# HELP '):
+            help_name = line.split()[2]
+        elif line.startswith('# TYPE '):
+            _, _, name, kind = line.split()
+            assert name == help_name and kind in ('counter', 'histogram', 'gauge')
+            typed[name] = kind
+        else:
+            name, labels, value = SAMPLE.match(line).groups()
+            family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in typed else name
+            assert family in typed
+            samples[name, labels or ''] = float(value)
+    return samples, typed
+
+
+def test_plan_request_moves_stage_and_db_metrics(client, park):
+    client, headers = client
+    tapp.plan_cache.clear()
+    before, _ = scrape(client)
+
+    # Plans are served from the catalog snapshot; the ride update is what reaches the database
+    ride_id = park.snapshot.catalog.ids[0]
+    assert client.patch(f'/api/rides/{ride_id}', json={'thrill': 2}, headers=headers).status_code == 200
+    response = client.post('/api/generate_plan', json={'total_time': 120, 'user_age': 30, 'user_weight': 70})
+    assert response.status_code == 200
+    after, typed = scrape(client)
+
+    def moved(name, labels):
+        return after.get((name, labels), 0) - before.get((name, labels), 0)
+    assert typed['thrill_safari_plan_stage_duration_seconds'] == 'histogram'
+    for stage in ('filter', 'select', 'build'):
+        assert moved('thrill_safari_plan_stage_duration_seconds_count', f'{{stage="{stage}"}}') == 1
+    assert moved('thrill_safari_plans_generated_total', '{engine="heap"}') == 1
+    assert moved('thrill_safari_plan_eligible_rides_total', '') > 0
+    assert moved('thrill_safari_db_query_duration_seconds_count', '{operation="update"}') >= 1
+    assert moved('thrill_safari_http_request_duration_seconds_count',
+                 '{route="/api/generate_plan",method="POST",status="200"}') == 1
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('latency_seconds', 'Latency.', ('stage',), buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(value, ('a',))
+
+    assert registry.render().splitlines() == [
+        '# HELP latency_seconds Latency.',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{stage="a",le="0.1"} 2',
+        'latency_seconds_bucket{stage="a",le="1"} 3',
+        'latency_seconds_bucket{stage="a",le="+Inf"} 4',
+        'latency_seconds_sum{stage="a"} 3.650000',
+        'latency_seconds_count{stage="a"} 4',
+    ]
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter('events_total', 'Events.', ('path',)).inc(labels=('a\\b"c"\nd',))
+
+    assert registry.render().splitlines()[-1] == 'events_total{path="a\\\\b\\"c\\"\\nd"} 1'
@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+import change_log
+import db
+import tapp
+
+
+def test_concurrent_migrations_apply_each_version_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'SQLITE_PATH', str(tmp_path / 'park.db'))
+    applied = []
+
+    def run():
+        database = db.Database('sqlite')
+        applied.append(tapp.migrate(database))
+        database.close()
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(applied) == [0, 0, 0, len(tapp.MIGRATIONS)]
+    database = db.Database('sqlite')
+    assert database.fetchone("SELECT COUNT(*) FROM schema_version")[0] == len(tapp.MIGRATIONS)
+    database.close()
+
+
+def test_model_is_not_initialized_until_migrations_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'SQLITE_PATH', str(tmp_path / 'missing' / 'park.db'))
+    monkeypatch.setattr(tapp, 'CATALOG_SNAPSHOT_PATH', '')
+    monkeypatch.setattr(tapp, 'CATALOG_RECONCILE_INTERVAL', 0.05)
+    monkeypatch.setattr(change_log, 'CATALOG_CHANGE_POLL_INTERVAL', 0)
+    model = tapp.ParkModel()
+
+    model.ensure_initialized()
+
+    assert model.db is None and not model._initialized
+    (tmp_path / 'missing').mkdir()
+    model._reconcile_thread.join(timeout=10)
+    assert model._initialized and model.catalog_source == 'database' and model.ride_count
+    model.close_db_connection()
+
+
+def test_failed_sqlite_migration_leaves_nothing_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'SQLITE_PATH', str(tmp_path / 'park.db'))
+
+    migrations = tapp.MIGRATIONS
+
+    def broken(tx):
+        raise tapp.Error(msg='boom')
+    monkeypatch.setattr(tapp, 'MIGRATIONS', migrations[:3] + [(4, 'broken', broken)])
+    database = db.Database('sqlite')
+    with pytest.raises(tapp.Error):
+        tapp.migrate(database)
+    monkeypatch.setattr(tapp, 'MIGRATIONS', migrations)
+
+    assert database.fetchone("SELECT name FROM sqlite_master WHERE name = 'land_rides'") is None
+    assert tapp.migrate(database) == len(tapp.MIGRATIONS)
+    database.close()
+
+
+def test_migrations_can_run_again(tmp_path, monkeypatch):
+    # A MySQL crash between a migration's DDL and its version row runs that migration again on the next start
+    monkeypatch.setattr(db, 'SQLITE_PATH', str(tmp_path / 'park.db'))
+    database = db.Database('sqlite')
+    tapp.migrate(database)
+    counts = [database.fetchone(f"SELECT COUNT(*) FROM {table}")[0] for table in ('land_rides', 'water_rides', 'users')]
+
+    database.execute("DELETE FROM schema_version")
+
+    assert tapp.migrate(database) == len(tapp.MIGRATIONS)
+    assert [database.fetchone(f"SELECT COUNT(*) FROM {table}")[0]
+            for table in ('land_rides', 'water_rides', 'users')] == counts
+    database.close()
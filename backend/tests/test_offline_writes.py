@@ -0,0 +1,30 @@
+import sqlite3
+
+import db
+
+
+def ride(ride_id, ride_type='land', thrill=5):
+    return (ride_id, f'Ride {ride_id}', thrill, 4, 10, 3, False, False, False, False, ride_type, 0, 200, 0, 100)
+
+
+def test_writes_made_during_an_outage_survive_the_reload(park):
+    stored = park.snapshot.catalog.ids[:2]
+    database = park.db
+    park.db = None
+    park.add_ride(*ride('O1'))
+    park.add_rides([ride('O2', 'water')])
+    park.update_ride(ride(stored[0], 'kids', thrill=9))
+    park.delete_ride(stored[1])
+    park.db = database
+
+    assert park.load_rides_from_db()
+
+    snapshot = park.snapshot
+    assert snapshot.has_ride('O1') and snapshot.has_ride('O2') and not snapshot.has_ride(stored[1])
+    assert snapshot.ride_record(stored[0])['thrill'] == 9 and snapshot.ride_record(stored[0])['type'] == 'kids'
+    rows = sqlite3.connect(db.SQLITE_PATH).execute(
+        "SELECT id, 'land' FROM land_rides UNION ALL SELECT id, 'water' FROM water_rides "
+        "UNION ALL SELECT id, 'kids' FROM kids_rides").fetchall()
+    assert ('O1', 'land') in rows and ('O2', 'water') in rows and (stored[0], 'kids') in rows
+    assert [ride_id for ride_id, _ in rows].count(stored[0]) == 1 and stored[1] not in [ride_id for ride_id, _ in rows]
+    assert not park._offline_writes
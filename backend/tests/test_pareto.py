@@ -0,0 +1,89 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+import planner
+import tapp
+
+
+def catalog(rng, count):
+    # Few distinct values, so many rides tie or dominate each other
+    rows = []
+    for position in range(count):
+        rows.append([f'P{position}', f'Ride {position}', rng.randint(1, 6), rng.randint(2, 8), rng.randint(0, 12),
+                     rng.randint(1, 4), False, False, rng.random() < 0.5, False, rng.choice(['land', 'water', 'kids']),
+                     0, 300, 0, 100])
+    return tapp.CatalogSnapshot.from_rows(1, rows)
+
+
+def exhaustive_front(snapshot, context):
+    # {fatigue: (thrill, fewest minutes)} for the front points: every fatigue total that buys more thrill than
+    # any plan with less fatigue
+    gap = 5 if context.total_time < 30 else 10
+    costs = snapshot.ride_costs(context.is_vip)
+    thrills, fatigues = snapshot.column('thrill'), snapshot.column('fatigue')
+    rows = planner.find_eligible_rides(context, snapshot).tolist()
+    best = {}
+    for size in range(1, len(rows) + 1):
+        for subset in itertools.combinations(rows, size):
+            minutes = sum(int(costs[row]) for row in subset) + gap * (size - 1)
+            fatigue = sum(int(fatigues[row]) for row in subset)
+            if minutes > context.total_time or (context.max_fatigue is not None and fatigue > context.max_fatigue):
+                continue
+            thrill = sum(int(thrills[row]) for row in subset)
+            if fatigue not in best or (-best[fatigue][0], best[fatigue][1]) > (-thrill, minutes):
+                best[fatigue] = (thrill, minutes)
+    front = {}
+    for fatigue in sorted(best):
+        if not front or best[fatigue][0] > max(thrill for thrill, _ in front.values()):
+            front[fatigue] = best[fatigue]
+    return front
+
+
+@pytest.mark.parametrize('max_fatigue', [None, 6, 12])
+def test_alternatives_are_the_exhaustive_front(max_fatigue):
+    rng = random.Random(23)
+    for _ in range(12):
+        snapshot = catalog(rng, rng.randint(4, 13))
+        context = planner.PlanningContext(rng.choice([25, 45, 70, 100]), rng.random() < 0.5, False, 30, 70, '', 'pareto',
+                                       alternatives=planner.PARETO_MAX_ALTERNATIVES, max_fatigue=max_fatigue)
+        front = exhaustive_front(snapshot, context)
+
+        plan = planner.generate_optimal_plan(context, snapshot)
+
+        costs = snapshot.ride_costs(context.is_vip)
+        gap = 5 if context.total_time < 30 else 10
+        found = {}
+        for alternative in plan.alternatives:
+            rides = alternative.selected_rides
+            minutes = sum(int(costs[row]) for row in rides) + gap * max(len(rides) - 1, 0)
+            assert alternative.remaining_time == context.total_time - minutes >= 0
+            assert alternative.total_fatigue == sum(int(snapshot.column('fatigue')[row]) for row in rides)
+            found[alternative.total_fatigue] = (alternative.total_thrill, minutes)
+        assert found == front or (not front and [plan.selected_rides for plan in plan.alternatives] == [[]])
+        if front:
+            assert plan.alternatives[0] is plan and plan.total_thrill == max(thrill for thrill, _ in front.values())
+
+
+def test_pruning_matches_pairwise_dominance():
+    # A ride is dropped only when max_rides others match or beat it on every axis; identical rides count the
+    # earlier ones as dominating, so exactly max_rides copies survive
+    rng = random.Random(5)
+    for _ in range(200):
+        count, budget = rng.randint(1, 30), rng.randint(5, 40)
+        thrills = np.array([rng.randint(1, 4) for _ in range(count)])
+        fatigues = np.array([rng.randint(0, 3) for _ in range(count)])
+        costs = np.array([rng.randint(1, budget) for _ in range(count)])
+        max_rides = rng.randint(1, 5)
+
+        keep = planner._pareto_candidates(thrills, fatigues, costs, budget, max_rides)
+
+        expected = []
+        for i in range(count):
+            dominating = sum(1 for j in range(count) if j != i and thrills[j] >= thrills[i]
+                             and fatigues[j] <= fatigues[i] and costs[j] <= costs[i]
+                             and (j < i or (thrills[j], -fatigues[j], -costs[j]) != (thrills[i], -fatigues[i], -costs[i])))
+            expected.append(dominating < max_rides)
+        assert keep.tolist() == expected
@@ -0,0 +1,27 @@
+import pytest
+
+import tapp
+
+
+def test_missing_and_empty_ride_preferences_share_a_cache_entry(client):
+    client, _ = client
+    tapp.plan_cache.clear()
+    guest = {'total_time': 180, 'user_age': 30, 'user_weight': 70}
+
+    first = client.post('/api/generate_plan', json={**guest, 'ride_preference': None})
+    second = client.post('/api/generate_plan', json={**guest, 'ride_preference': ''})
+    third = client.post('/api/generate_plan', json=guest)
+
+    assert [response.headers['X-Plan-Cache'] for response in (first, second, third)] == ['MISS', 'HIT', 'HIT']
+    assert first.get_json()['ride_preference_used'] == '' and first.data == second.data == third.data
+
+
+@pytest.mark.parametrize('ride_preference', ['mixed', 'DRY_ONLY', ['dry_only'], 3])
+def test_unknown_ride_preferences_are_rejected(client, ride_preference):
+    client, _ = client
+    tapp.plan_cache.clear()
+
+    response = client.post('/api/generate_plan', json={'total_time': 180, 'user_age': 30, 'user_weight': 70,
+                                                       'ride_preference': ride_preference})
+
+    assert response.status_code == 400 and 'ride_preference' in response.get_json()['error']
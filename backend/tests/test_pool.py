@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, 'SQLITE_PATH', str(tmp_path / 'pool.db'))
+    database = db.Database('sqlite', pool_size=2, checkout_timeout=0.05, ping_interval=3600)
+    database.execute("CREATE TABLE t (x INT)")
+    database.execute("INSERT INTO t VALUES (1)")
+    yield database
+    database.close()
+
+
+def idle_connections(database):
+    return [connection for connection, _ in list(database.pool._idle.queue)]
+
+
+def test_checkout_times_out_with_a_pool_error(database):
+    held = [database.pool.acquire(), database.pool.acquire()]
+
+    with pytest.raises(db.PoolError):
+        database.fetchone("SELECT x FROM t")
+
+    assert database.pool.checkout_timeouts == 1
+    for connection in held:
+        database.pool.release(connection)
+    assert database.fetchone("SELECT x FROM t") == (1,)
+
+
+def test_killed_idle_connection_is_replaced_on_checkout(database):
+    database.pool.ping_interval = 0
+    for connection in idle_connections(database):
+        connection.close()
+
+    assert database.fetchone("SELECT x FROM t") == (1,)
+    assert database.pool.reconnects == 1
+
+
+def test_read_on_a_connection_killed_within_the_ping_interval_is_retried(database):
+    opened = database.pool.opened
+    for connection in idle_connections(database):
+        connection.close()
+
+    assert database.fetchall("SELECT x FROM t") == [(1,)]
+    assert database.pool.reconnects == 1 and database.pool.opened == opened + 1
+
+
+def test_broken_connection_is_discarded_on_error(database):
+    with pytest.raises(db.Error) as raised:
+        with database.transaction() as tx:
+            broken = tx._cursor.connection
+            broken.close()
+            tx.execute("INSERT INTO t VALUES (2)")
+
+    assert raised.value.connection_lost
+    assert broken not in idle_connections(database) and database.pool.reconnects == 1
+    with pytest.raises(db.Error):
+        # Writes are not retried
+        with database.transaction() as tx:
+            tx._cursor.connection.close()
+            tx.execute("INSERT INTO t VALUES (3)")
+    assert database.fetchall("SELECT x FROM t") == [(1,)]
+
+
+def test_concurrent_checkouts_never_share_a_connection(database):
+    database.pool.checkout_timeout = 5
+    barrier = threading.Barrier(2)
+    seen = []
+
+    def checkout():
+        with database.transaction() as tx:
+            seen.append(tx._cursor.connection)
+            barrier.wait(5)
+
+    threads = [threading.Thread(target=checkout) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seen) == 2 and seen[0] is not seen[1]
@@ -0,0 +1,28 @@
+import live_queue
+import tapp
+
+
+def test_bad_ride_ids_are_rejected(client, park):
+    client, headers = client
+    ride_id = park.snapshot.catalog.ids[0]
+
+    for ride_ids in ([['a']], [{'id': ride_id}], [True], [['a'], 'nope']):
+        response = client.post('/api/queue_times', json=[[bad, 5] for bad in ride_ids], headers=headers)
+        assert response.status_code == 400 and response.get_json()['rejected'] == len(ride_ids)
+
+    response = client.post('/api/queue_times', json=[[['a'], 5], [ride_id, 5]], headers=headers)
+    assert response.status_code == 202 and response.get_json()['accepted'] == 1
+
+
+def test_unsaved_queue_times_survive_a_reload(park):
+    feed = live_queue.LiveQueueFeed(park, tapp.ResponseCache(16, 60), 3600, 3600)
+    ride_id = park.snapshot.catalog.ids[0]
+    queue_time = park.snapshot.ride_record(ride_id)['queue_time'] + 17
+    feed.record([(ride_id, queue_time, 1.0)])
+    feed.apply_pending()
+
+    assert park.load_rides_from_db()
+
+    assert park.snapshot.ride_record(ride_id)['queue_time'] == queue_time
+    assert feed.persist_pending() == 1
+    assert park.load_rides_from_db() and park.snapshot.ride_record(ride_id)['queue_time'] == queue_time
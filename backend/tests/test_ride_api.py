@@ -0,0 +1,44 @@
+import pytest
+
+
+def test_unknown_rides_are_not_found(client):
+    client, headers = client
+
+    assert client.patch('/api/rides/NOPE', json={'thrill': 3}, headers=headers).status_code == 404
+    assert client.put('/api/rides/NOPE', json={'thrill': 3}, headers=headers).status_code == 404
+    assert client.delete('/api/rides/NOPE', headers=headers).status_code == 404
+
+
+@pytest.mark.parametrize('body', [{'thrill': {'level': 3}}, {'min_age': [4]}, {'thrill': 20}, {'duration': 'long'},
+                                  {'type': 'air'}, {'id': 'OTHER'}, ['thrill', 3]])
+def test_bad_patches_are_rejected_and_change_nothing(client, park, body):
+    client, headers = client
+    ride_id = park.snapshot.catalog.ids[0]
+    before = park.snapshot.ride_record(ride_id)
+
+    response = client.patch(f'/api/rides/{ride_id}', json=body, headers=headers)
+
+    assert response.status_code == 400 and 'error' in response.get_json()
+    assert park.snapshot.ride_record(ride_id) == before
+
+
+def test_patch_and_delete_update_the_catalog(client, park):
+    client, headers = client
+    ride_id = park.snapshot.catalog.ids[0]
+
+    response = client.patch(f'/api/rides/{ride_id}', json={'thrill': 2, 'name': 'Patched'}, headers=headers)
+    assert response.status_code == 200 and response.get_json()['ride']['name'] == 'Patched'
+    assert park.snapshot.ride_record(ride_id)['thrill'] == 2
+
+    assert client.delete(f'/api/rides/{ride_id}', headers=headers).status_code == 200
+    assert not park.snapshot.has_ride(ride_id)
+    assert client.get(f'/api/rides/{ride_id}').status_code == 404
+
+
+@pytest.mark.parametrize('query', ['limit=abc', 'limit=1.5', 'limit=0', 'type=air', 'fields=thrill,colour'])
+def test_bad_listing_queries_are_rejected(client, query):
+    client, _ = client
+
+    response = client.get(f'/api/rides?{query}')
+
+    assert response.status_code == 400 and 'error' in response.get_json()
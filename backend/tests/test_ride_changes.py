@@ -0,0 +1,105 @@
+import sqlite3
+
+import bench
+import change_log
+import db
+import tapp
+
+
+def connect(park):
+    return sqlite3.connect(db.SQLITE_PATH)
+
+
+def thrill(park, ride_id):
+    return park.snapshot.ride_record(ride_id)['thrill']
+
+
+def test_late_commit_below_the_read_position_is_applied(park):
+    db = connect(park)
+    first, second = [row[0] for row in db.execute("SELECT id FROM land_rides ORDER BY id LIMIT 2")]
+    db.execute("UPDATE land_rides SET thrill = 1 WHERE id = ?", (first,))
+    db.execute("UPDATE land_rides SET thrill = 2 WHERE id = ?", (second,))
+    db.commit()
+    # The first change's transaction has not committed yet when the poller reads the second one
+    early_seq = db.execute("SELECT MIN(seq) FROM ride_changes WHERE seq > ?", (park.change_seq,)).fetchone()[0]
+    db.execute("DELETE FROM ride_changes WHERE seq = ?", (early_seq,))
+    db.commit()
+
+    assert park.apply_ride_changes() == 1
+    assert thrill(park, second) == 2 and thrill(park, first) != 1
+    assert early_seq in park.change_gaps
+
+    db.execute("INSERT INTO ride_changes (seq, ride_id) VALUES (?, ?)", (early_seq, first))
+    db.commit()
+    assert park.apply_ride_changes() == 1
+    assert thrill(park, first) == 1
+    assert not park.change_gaps and park.change_stats['late_changes'] == 1
+
+
+def test_gaps_of_rolled_back_transactions_expire(park, monkeypatch):
+    db = connect(park)
+    ride_id = db.execute("SELECT id FROM water_rides LIMIT 1").fetchone()[0]
+    db.execute("INSERT INTO ride_changes (seq, ride_id) VALUES (?, ?)", (park.change_seq + 3, ride_id))
+    db.commit()
+    park.apply_ride_changes()
+    assert len(park.change_gaps) == 2
+
+    monkeypatch.setattr(change_log, 'CATALOG_CHANGE_GAP_TIMEOUT', 0)
+    park.apply_ride_changes()
+    assert not park.change_gaps and park.change_stats['gaps_expired'] == 2
+
+
+def test_prune_keeps_unread_and_recent_rows(park, monkeypatch):
+    db = connect(park)
+    for thrill_value in (3, 4, 5):
+        db.execute("UPDATE kids_rides SET thrill = ?", (thrill_value,))
+        db.commit()
+    park.apply_ride_changes()
+    db.execute("UPDATE ride_changes SET changed_at = '2000-01-01 00:00:00'")
+    db.execute("UPDATE kids_rides SET thrill = 1")  # logged now, and not applied yet
+    db.commit()
+
+    pruned = park.prune_ride_changes()
+    assert pruned > 0
+    remaining = [seq for seq, in db.execute("SELECT seq FROM ride_changes")]
+    assert remaining and min(remaining) == park.change_seq + 1
+
+    park.apply_ride_changes()
+    assert {ride['thrill'] for ride in park.snapshot.listing('kids')} == {1}
+
+
+def test_process_behind_a_pruned_log_reloads(park, monkeypatch):
+    other = tapp.ParkModel()
+    other.ensure_initialized()
+    db = connect(park)
+    for thrill_value in (3, 4):
+        db.execute("UPDATE kids_rides SET thrill = ?", (thrill_value,))
+        db.commit()
+    db.execute("UPDATE ride_changes SET changed_at = '2000-01-01 00:00:00'")
+    db.commit()
+    other.apply_ride_changes()
+    assert other.prune_ride_changes() > 0
+
+    park.prune_ride_changes()  # finds the rows it never read gone
+    assert {ride['thrill'] for ride in park.snapshot.listing('kids')} == {4}
+    other.close_db_connection()
+
+
+def test_large_batches_are_indexed_without_a_rebuild():
+    snapshot = tapp.CatalogSnapshot.from_rows(1, bench.generate_catalog(3000))
+    rows = snapshot.live_rows()
+    upserts = []
+    for row in rows[:500]:
+        row = list(row)
+        row[tapp.RIDE_FIELDS.index('min_age')] += 5
+        upserts.append(row)
+    changed = snapshot.with_ride_changes(upserts, [row[0] for row in rows[500:700]])
+    rebuilt = tapp.CatalogSnapshot(changed.version, changed.catalog, changed.size, dead=changed.dead)
+
+    for age in (5, 12, 30, 55):
+        for weight in (20, 70, 130):
+            for bad_weather in (False, True):
+                for preference in ('', 'dry_only', 'wet_only'):
+                    arguments = (age, weight, bad_weather, preference)
+                    assert changed.eligibility_index.eligible(*arguments) == \
+                        rebuilt.eligibility_index.eligible(*arguments)
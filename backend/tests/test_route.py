@@ -0,0 +1,111 @@
+import random
+
+import numpy as np
+import pytest
+
+import bench
+import planner
+import tapp
+
+GRID = 6
+
+
+def grid_layout(ride_ids, placed_share=0.8, seed=3):
+    rng = random.Random(seed)
+    nodes = [(f'n{i}_{j}', i * 50, j * 50) for i in range(GRID) for j in range(GRID)]
+    walkways = [(f'n{i}_{j}', f'n{i + 1}_{j}', 3) for i in range(GRID - 1) for j in range(GRID)]
+    walkways += [(f'n{i}_{j}', f'n{i}_{j + 1}', 3) for i in range(GRID) for j in range(GRID - 1)]
+    rides = {ride_id: f'n{rng.randrange(GRID)}_{rng.randrange(GRID)}' for ride_id in ride_ids
+             if rng.random() < placed_share}
+    return tapp.ParkLayout(nodes, walkways, rides, 'n0_0')
+
+
+@pytest.fixture(scope='module')
+def mapped():
+    rows = bench.generate_catalog(60, 5)
+    layout = grid_layout([row[0] for row in rows])
+    return tapp.CatalogSnapshot.from_rows(1, rows, layout=layout)
+
+
+def plans(snapshot):
+    for engine in ('heap', 'knapsack'):
+        for total_time in (20, 60, 120, 300):
+            for ride_preference in ('', 'dry_first'):
+                for is_vip in (False, True):
+                    context = planner.PlanningContext(total_time, is_vip, False, 30, 70, ride_preference, engine)
+                    yield context, planner.generate_optimal_plan(context, snapshot)
+
+
+def test_remaining_time_accounts_for_rides_and_walks(mapped):
+    costs = mapped.ride_costs(False), mapped.ride_costs(True)
+    for context, plan in plans(mapped):
+        used = sum(int(costs[context.is_vip][row]) for row in plan.selected_rides) + sum(plan.walks)
+        assert plan.remaining_time == context.total_time - used >= 0
+        assert len(plan.walks) == len(plan.selected_rides) == len(set(plan.selected_rides))
+        assert plan.total_thrill == sum(int(mapped.column('thrill')[row]) for row in plan.selected_rides)
+
+
+def test_dry_rides_still_come_first(mapped):
+    water = tapp.RIDE_TYPE_CODES['water']
+    for context, plan in plans(mapped):
+        if context.ride_preference == 'dry_first':
+            wet = [mapped.column('type')[row] == water for row in plan.selected_rides]
+            assert wet == sorted(wet)
+
+
+def test_unplaced_rides_use_the_flat_gap(mapped):
+    layout = mapped.layout
+    for context, plan in plans(mapped):
+        gap = 5 if context.total_time < 30 else 10
+        previous = None
+        for row, minutes in zip(plan.selected_rides, plan.walks):
+            ride_id = mapped.catalog.ids[row]
+            if ride_id not in layout.ride_nodes:
+                assert minutes == (0 if previous is None else gap)
+            elif previous is not None and previous not in layout.ride_nodes:
+                assert minutes == gap
+            else:
+                start = layout.entrance_node if previous is None else layout.ride_nodes[previous]
+                assert minutes == layout.walk[start, layout.ride_nodes[ride_id]]
+            previous = ride_id
+
+
+def test_improvement_stops_at_the_deadline(mapped, monkeypatch):
+    unmapped = tapp.CatalogSnapshot(2, mapped.catalog)
+    monkeypatch.setattr(planner, 'ROUTE_SOLVER_DEADLINE_MS', 0)
+    for context, plan in plans(mapped):
+        # Past the deadline only the repair runs: no insertions, no 2-opt reversals
+        selected = planner.generate_optimal_plan(context, unmapped).selected_rides
+        assert set(plan.selected_rides) <= set(selected)
+        walk = mapped.layout.stops_matrix([mapped.catalog.ids[row] for row in plan.selected_rides],
+                                          5 if context.total_time < 30 else 10).tolist()
+        groups = [0] * (len(plan.selected_rides) + 1)
+        if context.ride_preference == 'dry_first':
+            groups = [0] + [int(mapped.column('type')[row] == tapp.RIDE_TYPE_CODES['water'])
+                            for row in plan.selected_rides]
+        route = list(range(1, len(plan.selected_rides) + 1))
+        planner._two_opt(walk, route, groups, float('inf'))
+        assert sum(plan.walks) >= sum(walk[a][b] for a, b in zip([0] + route, route))
+
+
+@pytest.mark.parametrize('nodes, walkways, rides, entrance', [
+    ([('a', 0, 0), ('a', 1, 1)], [], {}, 'a'),
+    ([('a', 0, 0), ('b', 1, 1)], [('a', 'c', 1)], {}, 'a'),
+    ([('a', 0, 0), ('b', 1, 1)], [('a', 'b', -1)], {}, 'a'),
+    ([('a', 0, 0), ('b', 1, 1)], [('a', 'b', 1), ('b', 'a', 2)], {}, 'a'),
+    ([('a', 0, 0), ('b', 1, 1)], [('a', 'b', 1)], {'R1': 'c'}, 'a'),
+    ([('a', 0, 0), ('b', 1, 1), ('c', 2, 2)], [('a', 'b', 1)], {'R1': 'c'}, 'a'),
+    ([('a', 0, 0)], [], {}, 'z'),
+])
+def test_layout_rejects_inconsistent_maps(nodes, walkways, rides, entrance):
+    with pytest.raises(ValueError):
+        tapp.ParkLayout(nodes, walkways, rides, entrance)
+
+
+def test_layout_walking_times_are_shortest_paths():
+    layout = tapp.ParkLayout([('a', 0, 0), ('b', 0, 1), ('c', 1, 1)], [('a', 'b', 2), ('b', 'c', 2), ('a', 'c', 7)],
+                             {'R1': 'c'}, 'a')
+
+    assert layout.walk.tolist() == [[0, 2, 4], [2, 0, 2], [4, 2, 0]]
+    assert layout.stops_matrix(['R1', 'R2'], 9).tolist() == [[0, 4, 0], [4, 0, 9], [0, 9, 0]]
+    assert np.array_equal(layout.without_rides(['R1']).walk, layout.walk) and not layout.without_rides(['R1'])
@@ -0,0 +1,69 @@
+import functools
+import random
+
+import numpy as np
+
+import planner
+import tapp
+
+
+def instance(rng, count):
+    end = rng.randint(30, 150)
+    slots = end // tapp.QUEUE_SLOT_MINUTES + 2
+    cost_table = np.array([[rng.randint(3, 40) for _ in range(slots)] for _ in range(count)], dtype=np.int64)
+    thrills = np.array([rng.randint(1, 10) for _ in range(count)], dtype=np.int64)
+    wet = np.array([rng.random() < 0.4 for _ in range(count)])
+    first = rng.randint(0, tapp.QUEUE_SLOT_MINUTES - 1)
+    slot_of = (first + np.arange(end + 1)) // tapp.QUEUE_SLOT_MINUTES
+    return cost_table, thrills, wet, slot_of, end
+
+
+def brute_force(cost_table, thrills, wet, dry_first, slot_of, end):
+    # Every (minute, rides taken) state: wait a minute or take any ride not taken yet
+    @functools.lru_cache(maxsize=None)
+    def best(t, used, went_wet):
+        value = best(t + 1, used, went_wet) if t < end else 0
+        for k in range(len(thrills)):
+            if used >> k & 1 or (dry_first and went_wet and not wet[k]):
+                continue
+            done = t + int(cost_table[k, slot_of[t]])
+            if done <= end:
+                value = max(value, int(thrills[k]) + best(done, used | 1 << k, went_wet or bool(wet[k])))
+        return value
+    return best(0, 0, False)
+
+
+def replay(steps, cost_table, wet, dry_first, slot_of, end):
+    t, went_wet, taken = 0, False, set()
+    for start, k in steps:
+        assert start >= t and k not in taken
+        assert not (dry_first and went_wet and not wet[k])
+        t = start + int(cost_table[k, slot_of[start]])
+        went_wet |= bool(wet[k])
+        taken.add(k)
+    assert t <= end
+    return t
+
+
+def test_exact_schedule_matches_brute_force():
+    rng = random.Random(16)
+    for _ in range(300):
+        count = rng.randint(1, 6)
+        cost_table, thrills, wet, slot_of, end = instance(rng, count)
+        dry_first = rng.random() < 0.5
+        steps, finish = planner._schedule_exact(cost_table, thrills, wet, dry_first, slot_of, end)
+
+        assert sum(int(thrills[k]) for _, k in steps) == brute_force(cost_table, thrills, wet, dry_first, slot_of, end)
+        assert replay(steps, cost_table, wet, dry_first, slot_of, end) == finish
+
+
+def test_label_schedule_stays_feasible():
+    rng = random.Random(17)
+    for _ in range(100):
+        cost_table, thrills, wet, slot_of, end = instance(rng, rng.randint(1, 8))
+        dry_first = rng.random() < 0.5
+        steps, finish = planner._schedule_labels(cost_table, thrills, wet, dry_first, slot_of.tolist(), end)
+        exact, _ = planner._schedule_exact(cost_table, thrills, wet, dry_first, slot_of, end)
+
+        assert replay(steps, cost_table, wet, dry_first, slot_of, end) <= finish
+        assert sum(int(thrills[k]) for _, k in steps) <= sum(int(thrills[k]) for _, k in exact)
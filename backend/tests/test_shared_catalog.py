@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+import bench
+import shared_catalog
+import tapp
+from shared_catalog import SharedCatalog, SharedEligibilityIndex
+
+pytest.importorskip('fcntl')
+
+PROFILES = [(30, 70, False, ''), (50, 80, True, 'dry_only'), (10, 30, False, 'wet_only'), (45, 100, False, '')]
+
+
+def eligible_ids(snapshot, profile):
+    index = snapshot.eligibility_index
+    return sorted(snapshot.catalog.ids[row] for row in index.indices(index.eligible(*profile)).tolist())
+
+
+def assert_matches_fresh_build(snapshot):
+    fresh = tapp.CatalogSnapshot.from_rows(1, snapshot.live_rows())
+    for profile in PROFILES:
+        assert eligible_ids(snapshot, profile) == eligible_ids(fresh, profile)
+    rows_by_id = dict(snapshot.catalog.rows_by_id.items())
+    assert len(rows_by_id) == snapshot.ride_count
+    assert all(snapshot.catalog.ids[row] == ride_id for ride_id, row in rows_by_id.items())
+
+
+@pytest.fixture
+def shared(tmp_path):
+    catalog = SharedCatalog(str(tmp_path / 'catalog'))
+    snapshot = tapp.CatalogSnapshot.from_rows(1, bench.generate_catalog(2000, 0))
+    with catalog.locked():
+        catalog.publish(snapshot)
+    return catalog, catalog.attach(snapshot)
+
+
+def test_changes_to_a_mapped_catalog_match_a_fresh_build(shared):
+    catalog, mapped = shared
+    updated = mapped.ride_record(mapped.catalog.ids[10])
+    updated['name'] = 'Renamed'
+    removed = mapped.catalog.ids[20]
+    added = [[f'B{position}', 'Batch'] + list(row[2:]) for position, row in enumerate(bench.generate_catalog(100, 9))]
+
+    for upserts in ([], added[:3], added):
+        changed = mapped.with_ride_changes([[updated[field] for field in tapp.RIDE_FIELDS]] + upserts, [removed])
+        assert_matches_fresh_build(changed)
+    with catalog.locked():
+        catalog.publish(changed)
+    published = catalog.attach(mapped)
+
+    assert_matches_fresh_build(published)
+    assert published.ride_record(updated['id'])['name'] == 'Renamed'
+    assert not published.has_ride(removed) and published.has_ride('B99')
+    assert mapped.ride_record(updated['id'])['name'] != 'Renamed' and mapped.has_ride(removed)
+
+
+def test_queue_times_are_appended_to_the_mapped_segment(shared, tmp_path):
+    catalog, mapped = shared
+    reader = SharedCatalog(catalog.path)
+    first = reader.attach(mapped)
+    rows = np.array([0, 5, 5])
+    with catalog.locked():
+        updated = mapped.with_queue_times(rows[:2], np.array([77, 2]))
+        assert catalog.append_queue_times(updated, rows, np.array([77, 66, 2]))
+
+    version, segment, deltas = catalog.state()
+    assert (version, segment, deltas) == (updated.version, mapped.version, 3)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['catalog', f'catalog.{mapped.version}']
+    latest = reader.attach(first)
+    assert latest.version == updated.version
+    assert latest.column('queue_time')[[0, 5]].tolist() == [77, 2]
+    assert latest.catalog.columns['thrill'] is first.catalog.columns['thrill']
+    assert first.column('queue_time')[[0, 5]].tolist() == mapped.column('queue_time')[[0, 5]].tolist()
+
+
+def test_full_delta_area_falls_back_to_a_new_segment(shared, monkeypatch):
+    catalog, mapped = shared
+    monkeypatch.setattr(shared_catalog, 'CATALOG_SHARED_QUEUE_DELTAS', 2)
+    with catalog.locked():
+        catalog.publish(mapped.with_ride_changes(deletes=[mapped.catalog.ids[0]]))
+    small = catalog.attach(mapped)
+    rows = np.array([1, 2, 3])
+    with catalog.locked():
+        assert not catalog.append_queue_times(small.with_queue_times(rows, 1), rows, np.ones(3))
+    assert catalog.state() == (small.version, small.version, 0)
+
+
+def test_update_and_delete_keep_the_mapped_index(shared):
+    _, mapped = shared
+    updated = mapped.ride_record(mapped.catalog.ids[10])
+    updated['thrill'] = 1
+
+    changed = mapped.with_ride_changes([[updated[field] for field in tapp.RIDE_FIELDS]], [mapped.catalog.ids[20]])
+
+    assert isinstance(changed.eligibility_index, SharedEligibilityIndex)
+    assert changed.eligibility_index.masks is mapped.eligibility_index.masks
+    assert_matches_fresh_build(changed)
@@ -0,0 +1,61 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+import bench
+import planner
+import tapp
+
+
+def contexts():
+    # One guest per combination of engine, preference, VIP and weather, with varied ages and weights
+    guests = itertools.cycle([(8, 30), (25, 70), (45, 90), (70, 60)])
+    return [planner.PlanningContext(240, is_vip, bad_weather, *next(guests), ride_preference, engine)
+            for engine in ('heap', 'knapsack') for ride_preference in planner.RIDE_PREFERENCES
+            for is_vip in (False, True) for bad_weather in (False, True)]
+
+
+def plan_data(context, snapshot):
+    return tapp.build_plan_data(context, snapshot, planner.generate_optimal_plan(context, snapshot))
+
+
+def test_concurrent_plans_match_serial_ones():
+    snapshot = tapp.CatalogSnapshot.from_rows(1, bench.generate_catalog(2000, seed=6))
+    requests = contexts()
+    serial = [plan_data(context, snapshot) for context in requests]
+
+    with ThreadPoolExecutor(8) as pool:
+        concurrent = list(pool.map(lambda context: plan_data(context, snapshot), requests * 4))
+
+    assert concurrent == serial * 4
+
+
+def test_plans_against_a_snapshot_ignore_later_writes(park):
+    snapshot = park.snapshot
+    context = planner.PlanningContext(300, False, False, 30, 70)
+    before = plan_data(context, snapshot)
+    chosen = [ride['id'] for ride in before['selected_rides']]
+
+    park.delete_ride(chosen[0])
+    changed = snapshot.ride_record(chosen[1])
+    changed['thrill'] = 1
+    park.update_ride(tuple(changed[field] for field in tapp.RIDE_FIELDS))
+    park.add_ride('TOP1', 'Top Thrill', 10, 1, 0, 1, False, False, False, False, 'land')
+
+    assert park.snapshot is not snapshot and park.snapshot.version > snapshot.version
+    assert plan_data(context, snapshot) == before
+    latest = [ride['id'] for ride in plan_data(context, park.snapshot)['selected_rides']]
+    assert 'TOP1' in latest and chosen[0] not in latest
+
+
+def test_plan_requests_leave_the_model_untouched(client, park):
+    client, _ = client
+    snapshot, state = park.snapshot, dict(vars(park))
+
+    for context in contexts()[:8]:
+        payload = {'total_time': context.total_time, 'is_vip': context.is_vip, 'bad_weather': context.bad_weather,
+                   'user_age': context.user_age, 'user_weight': context.user_weight,
+                   'ride_preference': context.ride_preference, 'engine': context.engine}
+        assert client.post('/api/generate_plan', json=payload).status_code == 200
+
+    assert park.snapshot is snapshot and vars(park).keys() == state.keys()
+    assert all(vars(park)[name] is value for name, value in state.items())